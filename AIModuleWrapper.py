@@ -1,8 +1,19 @@
 import importlib
 import importlib.util
+import ast
+import hashlib
+import json
+import pathlib
 from Game.Game import Game
 from Game.Game import Player
 
+# Every hook an AI module can define. Look at attachToPlayer to see what they do
+HOOK_NAMES = ("Setup", "Reset", "PostGame", "PostRound", "PostTurn", "PostEvent", "PlayCard", "ChooseRow", "PlayCardBatch", "ChooseRowBatch")
+# The manifest lives next to the AI modules, and remembers what's in each one so we don't have to import them to find out
+MANIFEST_NAME = "manifest.json"
+# An AI module that sets this at the top level runs the other AI modules itself, so it changes whenever any of them do
+USES_OTHER_AIS = "USES_OTHER_AIS"
+
 class MissingHookException(Exception):
     def __init__(self, hookName):
         super().__init__("Missing Hook \"" + hookName + "\"")
@@ -19,6 +30,13 @@ class AiModuleWrapper:
         self.path = path
         self.aiName = path.stem
         self.isLoaded = False
+        # What the manifest knows about the module, if we came from discoverAIs
+        self.sourceHash = None
+        self.functions = None
+        # The hooks the loaded module actually has, so attaching doesn't have to look them up every time
+        self.hooks = set()
+        # The wrappers of the other modules it runs, if it sets USES_OTHER_AIS. discoverAIs fills them in
+        self.dependencies = []
 
     def load(self):
         """Does the actual loading. Make sure to only do this on AI modules 
@@ -37,41 +55,58 @@ class AiModuleWrapper:
         if not self.isLoaded:
             self.load()
 
+        self.hooks = {hookName for hookName in HOOK_NAMES if hookName in dir(self.module)}
+
         # These are the mandatory hooks
         # look at attachToPlayer to see all of the hooks
-        if not "PlayCard" in dir(self.module):
+        if not "PlayCard" in self.hooks:
             raise MissingHookException("TurnCallback")
-        if not "ChooseRow" in dir(self.module):
+        if not "ChooseRow" in self.hooks:
             raise MissingHookException("TurnCallback")
 
-    def attachToPlayer(self, player : Player):
-        """Attach the AI module hooks to the player object callbacks"""
+    def attachToPlayer(self, player : Player, wrapHook=None):
+        """Attach the AI module hooks to the player object callbacks.
+        wrapHook is optionally called with (AI name, hook name, hook function) for every hook, and returns what to attach instead, for measuring the hooks"""
         if not self.isLoaded:
             self.load()
 
+        def hook(hookName):
+            if wrapHook is None:
+                return getattr(self.module, hookName)
+            return wrapHook(self.aiName, hookName, getattr(self.module, hookName))
+
         # Setup()
         #   Used to initialize an AI state required later. Optional.
         # Takes arguments:
         #   Number of players
         # Returns optionally an object containing the AI's state
-        if "Setup" in dir(self.module):
-            player.setSetupCallback(self.module.Setup)
+        if "Setup" in self.hooks:
+            player.setSetupCallback(hook("Setup"))
+
+        # Reset()
+        #   Used to get an AI state from the last game at the same table ready for a new game, instead of calling Setup again. Optional.
+        #   Handy if your Setup is expensive. Tournaments reuse tables, so it gets called a lot.
+        # Takes arguments:
+        #   The player AI object, or None if no such object was created
+        # Returns optionally a replacement AI state object. If nothing is returned the same object is kept
+        if "Reset" in self.hooks:
+            player.setResetCallback(hook("Reset"))
 
         # PostGame()
         #   Used to present results, or to use results to train machine learning models, etc. Optional.
         # Takes arguments:
         #   The player AI object, or None if no such object was created
         #   A list of the players scores in player order formatted as a tuple (name, score) starting with the current player
-        if "PostGame" in dir(self.module):
-            player.setEndGameCallback(self.module.PostGame)
+        if "PostGame" in self.hooks:
+            player.setEndGameCallback(hook("PostGame"))
 
         # PostRound()
         #   Used notify that a round is over, and that the cards will be reshuffled and dealt out again. Useful if you're trying to count cards. Optional.
         # Takes arguments:
         #   The player AI object, or None if no such object was created
         #   A list of the players scores in player order formatted as a tuple (name, score) starting with the current player
-        if "PostRound" in dir(self.module):
-            player.setEndRoundCallback(self.module.PostRound)
+        if "PostRound" in self.hooks:
+            player.setEndRoundCallback(hook("PostRound"))
             
         # PostTurn()
         #   Used notify that a turn is over, and which cards everyone has played. Useful if you're trying to count cards. Optional.
@@ -79,8 +114,16 @@ class AiModuleWrapper:
         #   The player AI object, or None if no such object was created
         #   A list of the players cards in player order starting with the current player
         #   A list of the players scores in player order formatted as a tuple (name, score) starting with the current player
-        if "PostTurn" in dir(self.module):
-            player.setEndTurnCallback(self.module.PostTurn)
+        if "PostTurn" in self.hooks:
+            player.setEndTurnCallback(hook("PostTurn"))
+
+        # PostEvent()
+        #   Used to hear about everything that happens at the table as it happens, so you can keep a model up to date bit by bit. Optional.
+        # Takes arguments:
+        #   The player AI object, or None if no such object was created
+        #   An event tuple, starting with one of the kinds in Game.Game.Event. Seats are counted from the current player
+        if "PostEvent" in self.hooks:
+            player.setEventCallback(hook("PostEvent"))
 
         # PlayCard()
         #   Determines which card from the player's hand they should play
@@ -90,7 +133,7 @@ class AiModuleWrapper:
         #   A list of lists representing the current state of the card rows
         #   A list of the players scores in player order formatted as a tuple (name, score) starting with the current player
         # Returns a card in the player's hand that they intend to play
-        player.setTurnCallback(self.module.PlayCard)
+        player.setTurnCallback(hook("PlayCard"))
 
         # ChooseRow()
         #   If the player plays a card lower than the lowest of the cards on row ends, this function is called to choose which row
@@ -102,7 +145,188 @@ class AiModuleWrapper:
         #   A list of all of the card played this turn
         #   A list of the players scores in player order formatted as a tuple (name, score) starting with the current player
         # Returns the index of the row the player has chosen
-        player.setBreakCallback(self.module.ChooseRow)
+        player.setBreakCallback(hook("ChooseRow"))
+
+        # PlayCardBatch()
+        #   The same as PlayCard, but for lots of tables at once, so it can be vectorized. Only used when games are run by the BatchRunner. Optional.
+        # Takes arguments, each a list with one entry per table:
+        #   The player AI objects
+        #   The player's hands
+        #   The rows
+        #   The score lists
+        # Returns a list of the cards to play, one per table
+        if "PlayCardBatch" in self.hooks:
+            player.setTurnBatchCallback(hook("PlayCardBatch"))
+
+        # ChooseRowBatch()
+        #   The same as ChooseRow, but for lots of tables at once. Only used when games are run by the BatchRunner. Optional.
+        # Takes arguments, each a list with one entry per table:
+        #   The player AI objects
+        #   The cards the player played
+        #   The player's hands
+        #   The rows
+        #   The cards played this turn
+        #   The score lists
+        # Returns a list of the row indices to claim, one per table
+        if "ChooseRowBatch" in self.hooks:
+            player.setBreakBatchCallback(hook("ChooseRowBatch"))
+
+    def getName(self):
+        return self.aiName
+
+    def getOwnSourceHash(self):
+        """A hash of the module's own source code"""
+        if self.sourceHash is None:
+            self.sourceHash = hashlib.sha1(self.path.read_bytes()).hexdigest()
+        return self.sourceHash
+
+    def getSourceHash(self):
+        """A hash of the module's source code, and the source of every module it runs, so we can tell when any of it has changed"""
+        if len(self.dependencies) == 0:
+            return self.getOwnSourceHash()
+        sources = [self.getOwnSourceHash()] + sorted(dependency.getOwnSourceHash() for dependency in self.dependencies)
+        return hashlib.sha1(json.dumps(sources).encode()).hexdigest()
+
+    def usesOtherAIs(self):
+        if self.functions is None:
+            self.functions = set(_scanFunctions(self.path.read_bytes()))
+        return USES_OTHER_AIS in self.functions
+
+    def hasHook(self, hookName):
+        """Checks for a hook without importing the module, if the manifest already told us what's in it"""
+        if self.isLoaded:
+            return hookName in self.hooks
+        if self.functions is None:
+            self.functions = set(_scanFunctions(self.path.read_bytes()))
+        return hookName in self.functions
+
+    def getHooks(self):
+        return [hookName for hookName in HOOK_NAMES if self.hasHook(hookName)]
+
+    def hasBatchHooks(self):
+        return self.hasHook("PlayCardBatch") or self.hasHook("ChooseRowBatch")
+
+class AiVariant:
+    """An AI module with some of its PARAMETERS changed, which only exists in memory, so tuning doesn't mean copying files into the AIs folder.
+    A tunable module has a PARAMETERS dictionary of defaults, and keeps the settings it plays by in its AI state's parameters attribute.
+    Variants share the loaded module with the original, so any number of them can sit at the same table"""
+
+    def __init__(self, base : AiModuleWrapper, name, parameters):
+        self.base = base
+        self.aiName = name
+        self.parameters = dict(parameters)
+
+    @property
+    def module(self):
+        return self.base.module
 
     def getName(self):
-        return self.aiName
\ No newline at end of file
+        return self.aiName
+
+    def getSourceHash(self):
+        """Changes whenever the original's source or the variant's settings do"""
+        settings = json.dumps(self.parameters, sort_keys=True)
+        return hashlib.sha1((self.base.getSourceHash() + settings).encode()).hexdigest()
+
+    def hasHook(self, hookName):
+        return self.base.hasHook(hookName)
+
+    def getHooks(self):
+        return self.base.getHooks()
+
+    def hasBatchHooks(self):
+        return self.base.hasBatchHooks()
+
+    def getSettings(self):
+        """The full set of parameters the variant plays by"""
+        if not self.base.isLoaded:
+            self.base.load()
+        defaults = getattr(self.base.module, "PARAMETERS", None)
+        if defaults is None:
+            raise ValueError(self.base.getName() + " doesn't have any PARAMETERS to change")
+        for name in self.parameters:
+            if not name in defaults:
+                raise ValueError(self.base.getName() + " doesn't have a parameter called " + name)
+        return {**defaults, **self.parameters}
+
+    def attachToPlayer(self, player : Player, wrapHook=None):
+        """Attaches the original module, then makes sure every AI state it makes plays by the variant's settings"""
+        if not wrapHook is None:
+            # Measure the variant under its own name
+            baseWrapHook = wrapHook
+            wrapHook = lambda aiName, hookName, hook: baseWrapHook(self.aiName, hookName, hook)
+        self.base.attachToPlayer(player, wrapHook)
+        settings = self.getSettings()
+
+        def applySettings(state):
+            if not state is None:
+                state.parameters = settings
+            return state
+
+        setup = player.setupCallback
+        if setup is None:
+            raise ValueError(self.base.getName() + " needs a Setup to make an AI state for its parameters")
+        player.setSetupCallback(lambda playerCount: applySettings(setup(playerCount)))
+        reset = player.resetCallback
+        if not reset is None:
+            player.setResetCallback(lambda state: applySettings(reset(state)))
+
+def _scanFunctions(source):
+    """Lists the top level names defined in some python source, by parsing it rather than running it.
+    That's functions mostly, but hooks could just as well be assigned or imported from somewhere else"""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return []
+    names = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            names.append(node.name)
+        elif isinstance(node, ast.Assign):
+            names += [target.id for target in node.targets if isinstance(target, ast.Name)]
+        elif isinstance(node, ast.ImportFrom):
+            names += [alias.asname or alias.name for alias in node.names]
+    return names
+
+def discoverAIs(path=pathlib.Path("AIs")):
+    """Finds every potential AI module in the folder, without importing any of them.
+    What's in each module is cached in the folder's manifest, keyed by a hash of its source, so this stays cheap however many modules there are.
+    Returns a dictionary of AI name to AiModuleWrapper, sorted by name"""
+    manifestPath = path / MANIFEST_NAME
+    try:
+        manifest = json.loads(manifestPath.read_text())
+    except (OSError, ValueError):
+        manifest = {}
+
+    ais = {}
+    updatedManifest = {}
+    # Try to treat everything in the AIs folder as something that could 
+    #   potentially be an AI module, except the __init__ of course
+    for aiModule in sorted(filter(lambda x: x.stem != "__init__", path.glob("*.py"))):
+        wrapper = AiModuleWrapper(aiModule)
+        stat = aiModule.stat()
+        entry = manifest.get(aiModule.name)
+        if entry is None or entry.get("mtime") != stat.st_mtime_ns or entry.get("size") != stat.st_size:
+            # The file has been touched, so check whether it actually changed
+            source = aiModule.read_bytes()
+            sourceHash = hashlib.sha1(source).hexdigest()
+            if entry is None or entry.get("hash") != sourceHash:
+                entry = {"hash": sourceHash, "functions": _scanFunctions(source)}
+            entry["mtime"] = stat.st_mtime_ns
+            entry["size"] = stat.st_size
+        wrapper.sourceHash = entry["hash"]
+        wrapper.functions = set(entry["functions"])
+        updatedManifest[aiModule.name] = entry
+        ais[wrapper.getName()] = wrapper
+
+    for wrapper in ais.values():
+        if wrapper.usesOtherAIs():
+            wrapper.dependencies = [other for other in ais.values() if not other is wrapper]
+
+    if updatedManifest != manifest:
+        try:
+            manifestPath.write_text(json.dumps(updatedManifest, indent=1, sort_keys=True))
+        except OSError:
+            # Not being able to cache is no reason to stop
+            pass
+    return ais
\ No newline at end of file
@@ -1,38 +1,118 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
 # BestBot.py
 # An AI module that is simply the best
 # By Tyler Howe
 import copy
+import functools
+import itertools
+import operator
 from Game.Game import Game
-import numpy
+from Game.CardMask import CardMask
 from enum import Enum
 
+try:
+    import numpy as np
+except ImportError:
+    # BestBot plays just the same without numpy, it just weighs its hand one card at a time
+    np = None
+
+# The knobs that decide how BestBot plays. Tournament.registerVariant can make copies with different settings, for tuning them
+PARAMETERS = {
+    # Cards with an expected penalty under this count as safe. We play the riskiest of the safe cards, unless we're playing safe
+    "safeWeight": 0.5,
+    # How close to the target score we start playing safe
+    "safetyMargin": 10,
+    # How much more giving points away counts than taking them, when we're playing aggressively
+    "aggression": 1.25,
+}
+
+# The points on each card, by card number, for each deck size we've played with. See cardPoints
+_card_points = {}
+
+def cardPoints(num_cards: int):
+    """The points on each card of a deck of num_cards, by card number, as a list and a numpy array (or None without numpy)"""
+    points = _card_points.get(num_cards)
+    if points is None:
+        points_list = [0] + [Game.cardToPoints(card) for card in range(1, num_cards + 1)]
+        points = (points_list, None if np is None else np.array(points_list, dtype=np.int64))
+        _card_points[num_cards] = points
+    return points
+
+# How many break chances to remember. That's most of them for the real game, but bigger variants have far more than is worth keeping
+BREAK_CHANCE_CACHE_SIZE = 1 << 16
+
+@functools.lru_cache(maxsize=BREAK_CHANCE_CACHE_SIZE)
+def breakChance(cards_in_gap: int, cards_remaining: int, slots_left: int, player_count: int) -> float:
+    """The chance that the other players fill a row's last slots before our card gets there, if everyone plays at random.
+    That's the chance of slots_left cards all coming from the cards_in_gap cards between the row and our card,
+    out of the cards_remaining we haven't seen. There's no chance at all with enough slots for everyone"""
+    if slots_left >= player_count or cards_in_gap < slots_left or cards_in_gap == 0:
+        return 0.0
+    chance = 1.0
+    for i in range(slots_left):
+        chance = chance * ((cards_in_gap - i) / (cards_remaining - i))
+    return chance
+
 class CardCounter:
     """Helper class for counting cards"""
 
     NUM_BUCKETS = int(Game.NUM_CARDS / Game.HAND_SIZE)
 
-    def __init__(self, playerCount):
+    def __init__(self, playerCount, rules=Game.RULES):
         self.player_count = playerCount
+        self.rules = rules
         self.reset()
 
     def reset(self) -> None:
         """Reset to inital state"""
-        self.cards_remaining = list(range(1, Game.NUM_CARDS + 1))
+        # CardMask of the cards we haven't counted yet
+        self.cards_remaining = CardMask.full(self.rules.numCards)
+        # Running totals of how many cards are left, and the points on them, up to and including each card.
+        # They're worked out again the first time they're needed after the counts change, which is about once a turn
+        self.prefix_mask = None
+        self.prefix_counts = None
+        self.prefix_points = None
 
     def countCard(self, card: int) -> None:
-        """Count the given card"""
+        """Count the given card. Counting a card twice is harmless"""
+        self.cards_remaining = CardMask.remove(self.cards_remaining, card)
 
-        try:
-            self.cards_remaining.remove(card)
-        except ValueError:
-            pass # Already counted
+    def countCards(self, mask: int) -> None:
+        """Count every card in the given CardMask"""
+        self.cards_remaining &= ~mask
 
     def getCardsInRange(self, first: int, last: int) -> list[int]:
+        """Get the cards left in the given range (inclusive)"""
+        return CardMask.toCards(self.cards_remaining & CardMask.rangeMask(first, last))
+
+    def countCardsInRange(self, first: int, last: int) -> int:
         """Get the number of cards left in the given range (inclusive)"""
-        return [x for x in self.cards_remaining if x >= first and x <= last]
+        return CardMask.countInRange(self.cards_remaining, first, last)
 
     def getNumberOfCardsRemaining(self) -> int:
-        return len(self.cards_remaining)
+        return CardMask.count(self.cards_remaining)
+
+    def getPrefixes(self):
+        """The running totals of the cards left, and their points, up to and including each card"""
+        if self.prefix_mask != self.cards_remaining:
+            remaining = self.cards_remaining
+            # Whether each card is left, starting from a card 0 that never is
+            left = [0] + [int(bit) for bit in reversed(format(remaining, "0" + str(self.rules.numCards) + "b"))]
+            self.prefix_mask = remaining
+            self.prefix_counts = list(itertools.accumulate(left))
+            self.prefix_points = list(itertools.accumulate(map(operator.mul, left, cardPoints(self.rules.numCards)[0])))
+        return self.prefix_counts, self.prefix_points
+
+    def countAndPointsInRange(self, first: int, last: int) -> tuple[int, int]:
+        """Get the number of cards left in the given range (inclusive), and the points on them, with a couple of lookups"""
+        counts, points = self.getPrefixes()
+        first = max(first, 1)
+        last = min(last, self.rules.numCards)
+        if last < first:
+            return 0, 0
+        return counts[last] - counts[first - 1], points[last] - points[first - 1]
         
 class RowInfo:
     """Helper class to characterize a row"""
@@ -48,29 +128,28 @@ class RowInfo:
             self.value = max(row)
             self.points = Game.getTotalPoints(row)
             self.count = len(row)
-            self.slots_left = Game.ROW_SIZE - self.count
-            self.max_value = Game.NUM_CARDS
-            self.possible_cards = counter.getCardsInRange(self.value, self.max_value)
+            self.row_size = counter.rules.rowSize
+            self.slots_left = self.row_size - self.count
+            self.max_value = counter.rules.numCards
         else:
             self.value = 0
             self.points = 0
             self.count = 0
+            self.row_size = 0
             self.slots_left = 0
             self.max_value = 0
-            self.possible_cards = []
 
     def __copy__(self):
         ret = RowInfo()
         ret.value = self.value
         ret.points = self.points
         ret.count = self.count
+        ret.row_size = self.row_size
         ret.slots_left = self.slots_left
         ret.max_value = self.max_value
-        ret.possible_cards = self.possible_cards
 
     def linkToRow(self, other, counter: CardCounter):
         self.max_value = other.value - 1
-        self.possible_cards = counter.getCardsInRange(self.value, self.max_value)
 
     def resolveCard(self, card: int, force_break: bool) -> int:
         """Resolve the given card to this row. Returns amount of points taken"""
@@ -82,7 +161,7 @@ class RowInfo:
             pts_taken = self.points
             self.points = card_pts
             self.count = 1
-            self.slots_left = Game.ROW_SIZE - self.count
+            self.slots_left = self.row_size - self.count
             return pts_taken
         else:
             # Not broken
@@ -100,7 +179,7 @@ class RowInfo:
             next_row = sorted_rows[i + 1]
             row.linkToRow(next_row, card_counter)
 
-        sorted_rows[-1].max_value = Game.NUM_CARDS
+        sorted_rows[-1].max_value = card_counter.rules.numCards
 
     @staticmethod
     def CreateFromRowList(rows: list[list[int]], card_counter: CardCounter):        
@@ -128,7 +207,10 @@ class Strategy(Enum):
 class BestBotState:
     def __init__(self, playerCount: int):
         self.player_count = playerCount
-        self.card_counter = CardCounter(playerCount)
+        # The rules of the game we're playing, which we find out from the hand we're dealt
+        self.rules = Game.RULES
+        self.card_counter = CardCounter(playerCount, self.rules)
+        self.parameters = PARAMETERS
         self.reset()
         
     def reset(self):
@@ -143,6 +225,11 @@ class BestBotState:
     def prepareTurn(self, hand: list[int], rows: list[list[int]]):
         if self.turns_left == 0:
             # Start the round
+            rules = getattr(hand, "rules", Game.RULES)
+            if rules != self.rules:
+                # A variant with a different deck, so there's a different set of cards to count
+                self.rules = rules
+                self.card_counter = CardCounter(self.player_count, rules)
             self.countCards(hand)
             for r in rows:
                 self.countCards(r)
@@ -150,7 +237,7 @@ class BestBotState:
         self.turns_left = len(hand)
 
         # Decide how safe or aggressive we can play
-        if (self.our_score > Game.TARGET_SCORE - 10):
+        if (self.our_score > self.rules.targetScore - self.parameters["safetyMargin"]):
             self.strategy = Strategy.SAFE
         elif (self.our_score == self.min_score) and (self.our_score < 20):
             self.strategy = Strategy.AGGRESSIVE
@@ -159,8 +246,7 @@ class BestBotState:
 
 
     def countCards(self, cards: list[int]):
-        for c in cards:
-            self.card_counter.countCard(c)
+        self.card_counter.countCards(CardMask.fromCards(cards))
 
     def playTurn(self, hand: list[int], rows: list[list[int]], scores: list[tuple[str, int]]):
         """PLay the turn and select the best card"""
@@ -169,9 +255,12 @@ class BestBotState:
 
         # Cards are in ascending order
         weights = [self._weighCard(c, row_infos) for c in hand]
+        return self._chooseCard(hand, weights)
 
+    def _chooseCard(self, hand: list[int], weights: list[float]) -> int:
+        """Pick a card, given each card's weight"""
         # Choose a safe weight, but not too safe, if possible
-        safe_weights = [x for x in weights if x < 0.5 and x > 0]
+        safe_weights = [x for x in weights if x < self.parameters["safeWeight"] and x > 0]
 
         if (len(safe_weights) > 0) and (self.strategy != Strategy.SAFE):
             min_weight = max(safe_weights)
@@ -195,6 +284,62 @@ class BestBotState:
             return min_cards[0]
 
 
+    @staticmethod
+    def playTurns(states: list[BestBotState], hands: list[list[int]], rows: list[list[list[int]]]) -> list[int]:
+        """The same as playTurn for lots of tables at once. Every card at every table is weighed in one go with numpy,
+        as a (table, card in hand) grid against each table's rows. Every step is the same arithmetic in the same order
+        as _weighCard, so the weights, and the cards picked, come out exactly the same. Every table has to have the same rules"""
+        table_count = len(states)
+        num_cards = states[0].rules.numCards
+        row_size = states[0].rules.rowSize
+        card_points = cardPoints(num_cards)[1]
+        hand_size = max(len(hand) for hand in hands)
+        # Short hands are padded out with card 1. Whatever it weighs, it gets cut off again at the end
+        cards = np.ones((table_count, hand_size), dtype=np.int64)
+        for table, hand in enumerate(hands):
+            cards[table, :len(hand)] = hand
+        # Every row's cards, padded out with 0s, which are worth nothing
+        row_cards = np.array([row + [0] * (row_size - len(row)) for table_rows in rows for row in table_rows], dtype=np.int64)
+        row_cards = row_cards.reshape(table_count, -1, row_size)
+        tails = row_cards.max(axis=2)
+        row_points = card_points[row_cards].sum(axis=2)
+        slots_left = (row_cards == 0).sum(axis=2)
+        player_counts = np.array([state.player_count for state in states], dtype=np.int64)[:, None]
+
+        # Each table's running totals of the cards left and their points, like CardCounter.getPrefixes
+        byte_count = (num_cards + 7) // 8
+        masks = b"".join(state.card_counter.cards_remaining.to_bytes(byte_count, "little") for state in states)
+        left = np.zeros((table_count, num_cards + 1), dtype=np.int64)
+        left[:, 1:] = np.unpackbits(np.frombuffer(masks, dtype=np.uint8).reshape(table_count, byte_count), axis=1, bitorder="little")[:, :num_cards]
+        counts = np.cumsum(left, axis=1)
+        points = np.cumsum(left * card_points, axis=1)
+
+        # Each card goes to the row with the highest end below it. Cards below every row go nowhere, and have to take one
+        below_card = tails[:, None, :] < cards[:, :, None]
+        is_below = ~below_card.any(axis=2)
+        played_row = np.where(below_card, tails[:, None, :], -1).argmax(axis=2)
+        row_ends = np.take_along_axis(tails, played_row, axis=1)
+        slots = np.take_along_axis(slots_left, played_row, axis=1)
+
+        # See _weighCardForRow
+        cards_in_gap = np.take_along_axis(counts, cards, axis=1) - np.take_along_axis(counts, row_ends - 1, axis=1)
+        gap_points = np.take_along_axis(points, cards, axis=1) - np.take_along_axis(points, row_ends - 1, axis=1)
+        total_cards_remaining = counts[:, -1:]
+        break_chance = np.ones(cards.shape)
+        for i in range(row_size):
+            # Keep the divisor away from zero where the step doesn't count anyway
+            step = (cards_in_gap - i) / np.maximum(total_cards_remaining - i, 1)
+            break_chance = np.where(i < slots, break_chance * step, break_chance)
+        no_chance = (slots >= player_counts) | (cards_in_gap < slots) | (cards_in_gap == 0)
+        avg_possible_pts = gap_points / np.maximum(cards_in_gap, 1)
+        row_weights = np.where(no_chance, 0.0, break_chance * (np.take_along_axis(row_points, played_row, axis=1) + avg_possible_pts * slots))
+
+        # See _weighCardForBreak
+        cards_below_this = np.take_along_axis(counts, cards, axis=1)
+        break_weights = (1.0 - cards_below_this / total_cards_remaining) * row_points.min(axis=1)[:, None]
+        weights = np.where(is_below, break_weights, row_weights).tolist()
+        return [state._chooseCard(hand, table_weights[:len(hand)]) for state, hand, table_weights in zip(states, hands, weights)]
+
     def _weighCard(self, card: int, rows: list[RowInfo]) -> float:
         """Get the expected points for the given card. Lower is better"""
 
@@ -214,41 +359,29 @@ class BestBotState:
     def _weighCardForRow(self, card: int, row: RowInfo):
         """Give the expected points of playing this card to this row"""
         
-        # How many cards are between this row and our card?
-        possible_cards = self.card_counter.getCardsInRange(row.value, card)
+        # How many cards are between this row and our card, and what are they worth?
+        cards_in_gap, gap_points = self.card_counter.countAndPointsInRange(row.value, card)
         
         # This is an attempt to estimate how likely a player would play
         # one of the remaining cards.
         total_cards_remaining = self.card_counter.getNumberOfCardsRemaining()
 
-        if row.slots_left >= self.player_count:
-            # No chance of it breaking if things go smoothly.
-            # As long as we are close to this card, we should be okay
+        # TODO: this is assuming all players are playing randomly...
+        # Probably not correct. Need to take into account other rows, etc.
+        break_chance = breakChance(cards_in_gap, total_cards_remaining, row.slots_left, self.player_count)
+        if break_chance == 0.0:
+            # Either there's room for everyone, or not enough cards to fill the row before ours
             return 0.0
-        else:
-
-            if len(possible_cards) < row.slots_left or len(possible_cards) == 0:
-                # Short-circuit - no possible cards!
-                return 0.0
-
-            # How many points would this row be worth?
-            avg_possible_pts = Game.getTotalPoints(possible_cards) / len(possible_cards)
-            est_pts_left = avg_possible_pts * row.slots_left
-
 
-            # TODO: this is assuming all players are playing randomly...
-            # Probably not correct. Need to take into account other rows, etc.
-            break_chance = 1.0
+        # How many points would this row be worth?
+        avg_possible_pts = gap_points / cards_in_gap
+        est_pts_left = avg_possible_pts * row.slots_left
 
-            for i in range(row.slots_left):
-                chance_card_is_played = (len(possible_cards) - i) / (total_cards_remaining - i)
-                break_chance = break_chance * chance_card_is_played
-
-            return break_chance * (row.points + est_pts_left)
+        return break_chance * (row.points + est_pts_left)
 
     def _weighCardForBreak(self, card: int, rows: list[RowInfo]):
         """Give the expected points of this card for breaking (taking a row)"""
-        cards_below_this = len(self.card_counter.getCardsInRange(1, card))
+        cards_below_this, _ = self.card_counter.countAndPointsInRange(1, card)
         cards_remaining = self.card_counter.getNumberOfCardsRemaining()
 
         # Ratio of remaining cards below our card
@@ -261,33 +394,39 @@ class BestBotState:
         break_chance = (1.0 - ratio_below_this)
         return break_chance * min_row_score
 
-    def chooseRow(self, card: int, rows: list[list[int]], cardsPlayed: list[int]) -> int:
-        row_infos = RowInfo.CreateFromRowList(rows, self.card_counter)
-        cards_left = [c for c in cardsPlayed if c > card]
+    def chooseRow(self, card: int, rows: list[list[int]], cardsPlayed: list[int], preview=None) -> int:
+        if preview is None:
+            row_infos = RowInfo.CreateFromRowList(rows, self.card_counter)
+            cards_left = [c for c in cardsPlayed if c > card]
 
         row_to_take = 0
         row_rating = 0
 
         for i in range(len(rows)):
-            # If we were to take this row, where would the other cards resolve?
-            hypothetical_rows = copy.deepcopy(row_infos)
-            cur_row = hypothetical_rows[i]
-            cur_pts_taken = cur_row.resolveCard(card, True)
-            cur_pts_given = 0            
-
-            RowInfo.UpdateRows(hypothetical_rows, self.card_counter)
+            if not preview is None:
+                # The game's already played the rest of the turn out for every row
+                cur_pts_taken = preview[i][0]
+                cur_pts_given = sum(preview[i][1:])
+            else:
+                # If we were to take this row, where would the other cards resolve?
+                hypothetical_rows = copy.deepcopy(row_infos)
+                cur_row = hypothetical_rows[i]
+                cur_pts_taken = cur_row.resolveCard(card, True)
+                cur_pts_given = 0
 
-            for c in cards_left:
-                row = ResolveRow(c, hypothetical_rows)
-                cur_pts_given += row.resolveCard(c, False)
                 RowInfo.UpdateRows(hypothetical_rows, self.card_counter)
 
+                for c in cards_left:
+                    row = ResolveRow(c, hypothetical_rows)
+                    cur_pts_given += row.resolveCard(c, False)
+                    RowInfo.UpdateRows(hypothetical_rows, self.card_counter)
+
             # Evaluate the rows based on amount of points given vs. taken.
             # Add a little bit of fudge so we weight fewer points taken as a higher number
 
             # In aggressive mode, weigh giving points more heavily
             if (self.strategy == Strategy.AGGRESSIVE):
-                cur_pts_given = cur_pts_given * 1.25
+                cur_pts_given = cur_pts_given * self.parameters["aggression"]
 
             cur_rating = (cur_pts_given + 0.001) / cur_pts_taken
 
@@ -306,6 +445,14 @@ class BestBotState:
 def Setup(playerCount: int):
     return BestBotState(playerCount)
 
+# Reset()
+#   Used to get the AI state from the last game at this table ready for a new one, instead of calling Setup again. Optional.
+# Takes arguments:
+#   The player AI object, or None if no such object was created
+# Returns optionally a replacement AI state object
+def Reset(ai: BestBotState):
+    ai.reset()
+
 # PostRound()
 #   Used notify that a round is over, and that the cards will be reshuffled and dealt out again. Useful if you're trying to count cards. Optional.
 # Takes arguments:
@@ -338,6 +485,21 @@ def PlayCard(ai: BestBotState, hand: list[int], rows: list[list[int]], scores: l
     ai.prepareTurn(hand, rows)
     return ai.playTurn(hand, rows, scores)
 
+# PlayCardBatch()
+#   The same as PlayCard, but for lots of tables at once, so it can be vectorized. Only used when games are run by the BatchRunner. Optional.
+# Takes arguments, each a list with one entry per table:
+#   The player AI objects
+#   The player's hands
+#   The rows
+#   The score lists
+# Returns a list of the cards to play, one per table
+def PlayCardBatch(ais: list[BestBotState], hands: list[list[int]], rows: list[list[list[int]]], scores: list[list[tuple[str, int]]]):
+    for ai, hand, table_rows in zip(ais, hands, rows):
+        ai.prepareTurn(hand, table_rows)
+    if np is None or any(ai.rules != ais[0].rules for ai in ais):
+        return [ai.playTurn(hand, table_rows, table_scores) for ai, hand, table_rows, table_scores in zip(ais, hands, rows, scores)]
+    return BestBotState.playTurns(ais, hands, rows)
+
 # ChooseRow()
 #   If the player plays a card lower than the lowest of the cards on row ends, this function is called to choose which row
 # Takes arguments:
@@ -352,4 +514,4 @@ def ChooseRow(ai, card: int, hand: list[int], rows: list[list[int]], cardsPlayed
     ai.countCards(cardsPlayed)
 
     # TODO: we could weigh scores here and be more vindictive if we were winning
-    return ai.chooseRow(card, rows, cardsPlayed)
+    return ai.chooseRow(card, rows, cardsPlayed, getattr(hand, "preview", None))
@@ -9,9 +9,11 @@ import copy
 import Game.Game
 import pathlib
 import random
-from AIModuleWrapper import AiModuleWrapper
+from AIModuleWrapper import discoverAIs
 
 AI_BLACKLIST = {"userInput", "DemocracyBot"}
+# Every other AI gets a vote, so editing any of them changes how we play. This tells --cache not to reuse our old results
+USES_OTHER_AIS = True
 
 # Setup()
 #   Used to initialize an AI state required later. Optional.
@@ -19,22 +21,26 @@ AI_BLACKLIST = {"userInput", "DemocracyBot"}
 #   Number of players
 # Returns optionally an object containing the AI's state
 def Setup(playerCount: int):
-    path = pathlib.Path("AIs")
-    ais = {}
-    for aiModule in filter(lambda x: x.stem != "__init__", path.glob("*.py")):
-        # Try to treat everything in the AIs folder as something that could 
-        #   potentially be an AI module, except the __init__ of course
-        # Yeah, executing strange code outside a sandbox is a massive security 
-        #   hole, but it's a toy project, so I'm not going to worry about it
-        tmp_module = AiModuleWrapper(aiModule)
-        ais[tmp_module.getName()] = tmp_module
-        tmp_module.load()
-
+    ais = discoverAIs(pathlib.Path("AIs"))
+    # Drop the blacklisted ones before loading anything, so we don't pay to import modules we're never going to use
     for aiName in AI_BLACKLIST:
         if aiName in ais:
             del ais[aiName]
+    for ai in ais.values():
+        # Yeah, executing strange code outside a sandbox is a massive security 
+        #   hole, but it's a toy project, so I'm not going to worry about it
+        ai.load()
     return StateOfDemocracy(ais, playerCount)
 
+# Reset()
+#   Used to get the AI state from the last game at this table ready for a new one, instead of calling Setup again. Optional.
+# Takes arguments:
+#   The player AI object, or None if no such object was created
+# Returns optionally a replacement AI state object
+def Reset(ai: StateOfDemocracy):
+    # Setting up means loading every other AI module, so we'd much rather not do it every game
+    ai.Reset()
+
 # PostGame()
 #   Used to present results, or to use results to train machine learning models, etc. Optional.
 # Takes arguments:
@@ -63,6 +69,15 @@ def PostRound(ai: StateOfDemocracy, scores: list[tuple[string, int]]):
 def PostTurn(ai: StateOfDemocracy, playedCards: list[int], scores: list[tuple[string, int]]):
     ai.PostTurn(playedCards, scores)
 
+# PostEvent()
+#   Used to hear about everything that happens at the table as it happens. Optional.
+# Takes arguments:
+#   The player AI object, or None if no such object was created
+#   An event tuple, starting with one of the kinds in Game.Game.Event. Seats are counted from the current player
+
+def PostEvent(ai: StateOfDemocracy, event: tuple):
+    ai.PostEvent(event)
+
 # PlayCard()
 #   Determines which card from the player's hand they should play
 # Takes arguments:
@@ -93,28 +108,44 @@ def ChooseRow(ai: StateOfDemocracy, card: int, hand: list[int], rows: list[list[
 class StateOfDemocracy:
     def __init__(self, citizens : dict, playerCount : int):
         self.citizens = citizens
+        self.playerCount = playerCount
         self.aiState = {}
         for name, ai in self.citizens.items():
-            if "Setup" in dir(ai.module):
+            if ai.hasHook("Setup"):
                 self.aiState[name] = ai.module.Setup(playerCount)
             else:
                 self.aiState[name] = None
 
+    def Reset(self):
+        for name, ai in self.citizens.items():
+            if ai.hasHook("Reset"):
+                newState = ai.module.Reset(self.aiState[name])
+                if not newState is None:
+                    self.aiState[name] = newState
+            elif ai.hasHook("Setup"):
+                self.aiState[name] = ai.module.Setup(self.playerCount)
+
     def PostGame(self, scores: list[tuple[string, int]]):
         for name, ai in self.citizens.items():
-            if "PostGame" in dir(ai.module):
+            if ai.hasHook("PostGame"):
                 ai.module.PostGame(self.aiState[name], copy.deepcopy(scores))
 
     def PostRound(self, scores: list[tuple[string, int]]):
         for name, ai in self.citizens.items():
-            if "PostRound" in dir(ai.module):
+            if ai.hasHook("PostRound"):
                 ai.module.PostRound(self.aiState[name], copy.deepcopy(scores))
 
     def PostTurn(self, playedCards: list[int], scores: list[tuple[string, int]]):
         for name, ai in self.citizens.items():
-            if "PostTurn" in dir(ai.module):
+            if ai.hasHook("PostTurn"):
                 ai.module.PostTurn(self.aiState[name], copy.copy(playedCards), copy.deepcopy(scores))
 
+    def PostEvent(self, event: tuple):
+        # Events are immutable, so everyone can share the same one
+        for name, ai in self.citizens.items():
+            if ai.hasHook("PostEvent"):
+                ai.module.PostEvent(self.aiState[name], event)
+
     def PlayCard(self, hand: list[int], rows: list[list[int]], scores: list[tuple[string, int]]):
         votes = dict()
         for name, ai in self.citizens.items():
@@ -145,7 +176,7 @@ class StateOfDemocracy:
         votes = dict()
         for name, ai in self.citizens.items():
             vote = ai.module.ChooseRow(self.aiState[name], card, copy.copy(hand), copy.deepcopy(rows), copy.deepcopy(cardsPlayed), copy.deepcopy(scores))
-            if vote in range(0, 4):
+            if vote in range(len(rows)):
                 # Ignore votes for invalid moves
                 if vote in votes:
                     # Increment the tally of votes for this card
@@ -162,6 +193,6 @@ class StateOfDemocracy:
                 winners.clear()
                 winners.add(card)
         if len(winners) == 0:
-            # Nobody voted for a valid option
-            return random.choice(hand)
+            # Nobody voted for a valid option. Our hand can be empty by now, so pick any row
+            return random.randrange(len(rows))
         return random.choice(list(winners))
\ No newline at end of file
@@ -7,6 +7,18 @@ from __future__ import annotations
 # By Thomas Albertine
 import copy
 import Game.Game
+from Game.CardMask import CardMask
+
+# The knobs that decide how ThomasBot plays. Tournament.registerVariant can make copies with different settings, for tuning them
+PARAMETERS = {
+    # How far above the end of a row a card can be before we reckon it'll break the row, when the row has 1, 2, 3 or 4 slots left
+    "breakGap1": 5,
+    "breakGap2": 10,
+    "breakGap3": 20,
+    "breakGap4": 30,
+    # How cheap the cheapest row has to be before we'll take it on purpose
+    "chaosMaxCost": 3,
+}
 
 # Setup()
 #   Used to initialize an AI state required later. Optional.
@@ -16,6 +28,14 @@ import Game.Game
 def Setup(playerCount):
     return ThomasAIState()
 
+# Reset()
+#   Used to get the AI state from the last game at this table ready for a new one, instead of calling Setup again. Optional.
+# Takes arguments:
+#   The player AI object, or None if no such object was created
+# Returns optionally a replacement AI state object
+def Reset(ai):
+    ai.reset()
+
 # PostGame()
 #   Used to present results, or to use results to train machine learning models, etc. Optional.
 # Takes arguments:
@@ -44,6 +64,18 @@ def PostTurn(ai, playedCards, _):
     for card in playedCards:
         ai.seeCard(card)
 
+# PostEvent()
+#   Used to hear about everything that happens at the table as it happens. Optional.
+# Takes arguments:
+#   The player AI object, or None if no such object was created
+#   An event tuple, starting with one of the kinds in Game.Game.Event. Seats are counted from the current player
+
+def PostEvent(ai, event):
+    if event[0] == Game.Game.Event.ROUND_DEALT:
+        # Count the deal as soon as it happens, rather than waiting for our first turn to notice it
+        _, startingCards, hand = event
+        ai.seeStartingCards(startingCards, hand)
+
 # PlayCard()
 #   Determines which card from the player's hand they should play
 # Takes arguments:
@@ -54,18 +86,17 @@ def PostTurn(ai, playedCards, _):
 # Returns a card in the player's hand that they intend to play
 def PlayCard(ai, hand : list[int], rows, scores):
     if not ai.sawStartingCards:
-        # We haven't counted the starting cards yet
-        for row in rows:
-            ai.seeCard(row[0])
-        ai.sawStartingCards = True
-
-        # While we're at it, we know no one else will play cards from our hand
-        for card in hand:
-            ai.seeCard(card, True)
+        # Nobody told us about the deal, so count the starting cards now
+        ai.seeStartingCards([row[0] for row in rows], hand)
 
     handBackup = copy.copy(hand)
+    # The game works out where every card would land once per turn. Use it if it's there
+    board = getattr(hand, "board", None)
+    # Variants can have bigger decks and rows, so go by the game's rules rather than the real game's
+    rules = getattr(hand, "rules", Game.Game.Game.RULES)
+    ai.setNumCards(rules.numCards)
     # break the hand into cards below the lowest end card and cards above it
-    lowestEndCard = 105
+    lowestEndCard = rules.numCards + 1
     for row in rows:
         if lowestEndCard > row[-1]:
             lowestEndCard = row[-1]
@@ -79,7 +110,7 @@ def PlayCard(ai, hand : list[int], rows, scores):
 
     # Is there an opportunity to sow some chaos for cheap?
     if len(lowCards) > 0:
-        chaosPlay, indexToClaim = sowChaos(rows, lowCards, len(scores))
+        chaosPlay, indexToClaim = sowChaos(rows, lowCards, len(scores), board, ai.parameters, rules.rowSize)
         if not chaosPlay is None:
             ai.queueAttack(indexToClaim)
             return chaosPlay
@@ -90,7 +121,7 @@ def PlayCard(ai, hand : list[int], rows, scores):
         willBreak = []
         wontbreak = []
         for card in highCards:
-            if willItBreak(rows, card, len(scores)):
+            if willItBreak(rows, card, len(scores), board, ai.parameters, rules.rowSize):
                 willBreak.append(card)
             else:
                 wontbreak.append(card)
@@ -98,11 +129,11 @@ def PlayCard(ai, hand : list[int], rows, scores):
             # We can play a card that we don't think will break a row
             # We want to play the one that has the fewest unseen cards between it and the end of the row it's going to
             # That way we minimize surprises
-            return playItSafe(rows, wontbreak, ai)
+            return playItSafe(rows, wontbreak, ai, board)
         if len(willBreak) > 0:
             # We can't play a card that we feel safe about. Go for the Hail Mary, and just try to put as much space between us and the end of the row
             # in the hopes that some poor sap will play there first and bail us out
-            return hailMary(rows, willBreak, ai)
+            return hailMary(rows, willBreak, ai, board)
     
     # If we get here, we have no good moves. Our cards are all lower than the lowest row, but it's not cheap enough to try to sow chaos, so just play low. 
     # Maybe the value won't spike too much
@@ -130,8 +161,7 @@ def ChooseRow(ai, card, hand, rows, cardPlayed, scores):
     cheapestCost = 100
     cheapestIndex = -1
 
-    for i, row in enumerate(rows):
-        cost = Game.Game.Game.getTotalPoints(row)
+    for i, cost in enumerate(rowCosts(rows, getattr(hand, "board", None))):
         if cost < cheapestCost:
             cheapestCost = cost
             cheapestIndex = i
@@ -142,25 +172,41 @@ def ChooseRow(ai, card, hand, rows, cardPlayed, scores):
 class ThomasAIState:
 
     def __init__(self):
+        self.parameters = PARAMETERS
+        # How many cards are in the deck. We find out if it's a variant on our first turn
+        self.numCards = Game.Game.Game.NUM_CARDS
         self.reset()
 
     def seeCard(self, card, isHandCard=False):
-        self.playedCards.add(card)
+        self.playedCards = CardMask.add(self.playedCards, card)
         if not isHandCard:
             self.cardsUnaccountedFor -= 1
 
+    def seeStartingCards(self, startingCards, hand):
+        for card in startingCards:
+            self.seeCard(card)
+        # While we're at it, we know no one else will play cards from our hand
+        for card in hand:
+            self.seeCard(card, True)
+        self.sawStartingCards = True
+
     def reset(self):
         self.isAttackQueued = False
-        self.playedCards = set()
+        # A CardMask of every card we've seen this round
+        self.playedCards = 0
         self.sawStartingCards = False
-        self.cardsUnaccountedFor = Game.Game.Game.NUM_CARDS
+        self.cardsUnaccountedFor = self.numCards
+
+    def setNumCards(self, numCards):
+        if numCards != self.numCards:
+            # Anything we've already seen this round still counts against the bigger (or smaller) deck
+            self.cardsUnaccountedFor += numCards - self.numCards
+            self.numCards = numCards
 
     def numUnseenCardsBetweenPair(self, lowCard, highCard):
-        cardCount = 0
-        for card in range(lowCard + 1, highCard):
-            if not card in self.playedCards:
-                cardCount += 1
-        return cardCount
+        if highCard - lowCard < 2:
+            return 0
+        return (highCard - lowCard - 1) - CardMask.countInRange(self.playedCards, lowCard + 1, highCard - 1)
 
     def queueAttack(self, rowToClaim):
         self.isAttackQueued = True
@@ -172,9 +218,17 @@ class ThomasAIState:
             return self.queuedAttack
         return None
 
-def predictRow(rows, card):
+def rowCosts(rows, board=None):
+    if not board is None:
+        return board.penalties
+    return [Game.Game.Game.getTotalPoints(row) for row in rows]
+
+def predictRow(rows, card, board=None):
+    if not board is None:
+        return board.destination(card)
     foundRow = -1
-    distance = 104
+    # Nothing can be further below the card than that
+    distance = card
     for i, row in enumerate(rows):
         if card < row[-1]:
             # It can't go in this row
@@ -185,9 +239,9 @@ def predictRow(rows, card):
             foundRow = i
     return foundRow
 
-def willItBreak(rows, card, numPlayers):
-    dest = predictRow(rows, card)
-    slots = Game.Game.Game.ROW_SIZE - len(rows[dest])
+def willItBreak(rows, card, numPlayers, board=None, parameters=PARAMETERS, rowSize=Game.Game.Game.ROW_SIZE):
+    dest = predictRow(rows, card, board)
+    slots = rowSize - len(rows[dest])
     if slots >= numPlayers:
         # There aren't enough cards to make this row break
         return False
@@ -196,22 +250,21 @@ def willItBreak(rows, card, numPlayers):
         # This row will always break
         return True
     if slots == 1:
-        return card - rows[dest][-1] > 5
+        return card - rows[dest][-1] > parameters["breakGap1"]
     if slots == 2:
-        return card - rows[dest][-1] > 10
+        return card - rows[dest][-1] > parameters["breakGap2"]
     if slots == 3:
-        return card - rows[dest][-1] > 20
+        return card - rows[dest][-1] > parameters["breakGap3"]
     if slots == 4: 
-        return card - rows[dest][-1] > 30
+        return card - rows[dest][-1] > parameters["breakGap4"]
     # shouldn't ever get here, but oh well
     return False
 
-def sowChaos(rows, lowCards, numPlayers):
+def sowChaos(rows, lowCards, numPlayers, board=None, parameters=PARAMETERS, rowSize=Game.Game.Game.ROW_SIZE):
     cheapestCost = 100
     cheapestIndices = {}
 
-    for i, row in enumerate(rows):
-        cost = Game.Game.Game.getTotalPoints(row)
+    for i, cost in enumerate(rowCosts(rows, board)):
         if cost < cheapestCost:
             cheapestCost = cost
             cheapestIndices = {i}
@@ -221,24 +274,24 @@ def sowChaos(rows, lowCards, numPlayers):
     # If we take the cheapest row, cards going to it will go to the highest row below it. We need to make sure that one's a risky play
     for cheapestIndex in cheapestIndices:
         # Find out which row cards will end up in
-        targetindex = predictRow(rows, rows[cheapestIndex][-1] - 1)
+        targetindex = predictRow(rows, rows[cheapestIndex][-1] - 1, board)
         # If there is a valid target row, 
         if targetindex != -1:
-            slots = Game.Game.Game.ROW_SIZE - len(rows[targetindex])
+            slots = rowSize - len(rows[targetindex])
             # and it's volatile, meaning there's enough players that it's risky to play on.
             # and the row we want to take is fairly cheap itself
-            if slots * 2 <= numPlayers - 1 and cheapestCost < 3:
+            if slots * 2 <= numPlayers - 1 and cheapestCost < parameters["chaosMaxCost"]:
                 # go ahead and play low. We'll take the cheap row and force other players to the expensive one
                 lowCards.sort()
                 return lowCards[0], cheapestIndex
     # Not the time to sow chaos
     return None, None
 
-def playItSafe(rows, wontbreak, ai):
-    distance = 104
+def playItSafe(rows, wontbreak, ai, board=None):
+    distance = ai.numCards
     shortCard = {}
     for card in wontbreak:
-        rowIndex = predictRow(rows, card)
+        rowIndex = predictRow(rows, card, board)
         newDist = ai.numUnseenCardsBetweenPair(rows[rowIndex][-1], card)
         if newDist < distance:
             distance = newDist
@@ -250,11 +303,11 @@ def playItSafe(rows, wontbreak, ai):
     # all else being equal, play the lower card first. It's slightly harder to have another opportunity for that.
     return shortCard[0]
 
-def hailMary(rows, willbreak, ai):
+def hailMary(rows, willbreak, ai, board=None):
     distance = 0
     longCard = set()
     for card in willbreak:
-        rowIndex = predictRow(rows, card)
+        rowIndex = predictRow(rows, card, board)
         newDist = ai.numUnseenCardsBetweenPair(rows[rowIndex][-1], card)
         if newDist > distance:
             distance = newDist
@@ -28,4 +28,28 @@ def ChooseRow(ai, card, hand, rows, cardPlayed, scores):
     rowScores = [Game.getTotalPoints(r) for r in rows]
     minRow = rowScores.index(min(rowScores))
     return minRow
+
+# PlayCardBatch()
+#   The same as PlayCard, but for lots of tables at once. Optional.
+# Takes arguments, each a list with one entry per table:
+#   The player AI objects
+#   The player's hands, sorted in ascending order
+#   The rows
+#   The score lists
+# Returns a list of the cards to play, one per table
+def PlayCardBatch(ais, hands, rows, scores):
+    return [hand[-1] for hand in hands]
+
+# ChooseRowBatch()
+#   The same as ChooseRow, but for lots of tables at once. Optional.
+# Takes arguments, each a list with one entry per table:
+#   The player AI objects
+#   The cards the player played
+#   The player's hands
+#   The rows
+#   The cards played this turn
+#   The score lists
+# Returns a list of the row indices to claim, one per table
+def ChooseRowBatch(ais, cards, hands, rows, cardsPlayed, scores):
+    return [ChooseRow(None, None, None, tableRows, None, None) for tableRows in rows]
     
\ No newline at end of file
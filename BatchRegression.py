@@ -0,0 +1,96 @@
+# BatchRegression.py
+# Checks that AIs' PlayCardBatch hooks pick exactly the same cards as their PlayCard hooks, and the same ones as last time
+# Batch hooks are a second copy of an AI's logic, usually vectorized, and nothing in a tournament notices if the copies drift
+# apart, since the BatchRunner just uses whichever it has. So this asks both hooks about a corpus of made up positions from
+# Benchmark.SyntheticPosition, which are the same every time for the same seeds, and compares every answer with the answers
+# recorded in BatchRegression.json. Run it after touching an AI's PlayCard or PlayCardBatch:
+#   python BatchRegression.py [AI ...]
+# and if the AI is meant to play differently now, record the new answers with --record.
+
+import argparse
+import json
+import pathlib
+import sys
+
+import Benchmark
+import Tournament
+from Game.CardMask import CardMask
+
+EXPECTED_PATH = pathlib.Path(__file__).parent / "BatchRegression.json"
+# How many positions the corpus has, and the seed of the first
+CORPUS_SIZE = 5000
+CORPUS_SEED = 0
+
+def makeCorpus(count=CORPUS_SIZE, seed=CORPUS_SEED):
+    """PlayCard positions seeded seed, seed + 1 and so on, with the difficulty going round from 0 to 1 so there's every kind"""
+    return [Benchmark.SyntheticPosition(seed + index, (index % 5) / 4, Benchmark.PLAY_CARD) for index in range(count)]
+
+def prepareState(module, position):
+    """Sets the AI up as if it had watched the game so far, so card counting AIs have something to count"""
+    state = module.Setup(position.playerCount) if hasattr(module, "Setup") else None
+    if hasattr(module, "PostTurn"):
+        module.PostTurn(state, CardMask.toCards(position.seenMask & ~position.handMask), list(position.scores))
+    return state
+
+def playOneAtATime(module, positions):
+    return [module.PlayCard(*position.arguments(prepareState(module, position))) for position in positions]
+
+def playInBatches(module, positions, batchSize=Tournament.BATCH_TABLES):
+    answers = []
+    for start in range(0, len(positions), batchSize):
+        batch = [position.arguments(prepareState(module, position)) for position in positions[start:start + batchSize]]
+        answers += module.PlayCardBatch(*[list(column) for column in zip(*batch)])
+    return answers
+
+def checkAI(module, positions, expected=None):
+    """Asks both hooks about every position. Returns (one at a time answers, batch answers, mismatches),
+    where a mismatch is (position, expected answer or None, one at a time answer, batch answer)"""
+    single = playOneAtATime(module, positions)
+    batch = playInBatches(module, positions)
+    if expected is None:
+        expected = single
+    mismatches = [(position, want, one, many) for position, want, one, many in zip(positions, expected, single, batch) if not want == one == many]
+    return single, batch, mismatches
+
+def main():
+    ais = Tournament.getAIs()
+    batchAINames = [name for name, ai in ais.items() if ai.hasHook("PlayCardBatch")]
+    parser = argparse.ArgumentParser(description="Check that AIs' PlayCardBatch answers match their PlayCard answers, and the recorded ones")
+    parser.add_argument("ais", help="the AIs to check (every AI with a PlayCardBatch hook by default)", nargs="*", metavar="AI")
+    parser.add_argument("--record", help="record the PlayCard answers as the expected ones, once both hooks agree", action="store_true")
+    args = parser.parse_args()
+    unknown = [name for name in args.ais if not name in batchAINames]
+    if len(unknown) > 0:
+        parser.error(", ".join(unknown) + " isn't an AI with a PlayCardBatch hook. Try " + ", ".join(batchAINames))
+
+    try:
+        recorded = json.loads(EXPECTED_PATH.read_text())
+    except (OSError, ValueError):
+        recorded = {}
+    positions = makeCorpus()
+    isBroken = False
+    for name in args.ais or batchAINames:
+        ai = ais[name]
+        ai.load()
+        entry = recorded.get(name)
+        expected = None
+        if not args.record and not entry is None and entry["seed"] == CORPUS_SEED and len(entry["answers"]) == len(positions):
+            expected = entry["answers"]
+        single, batch, mismatches = checkAI(ai.module, positions, expected)
+        source = "PlayCard" if expected is None else "the recorded answers"
+        print(f"{name}: {len(positions) - len(mismatches)} of {len(positions)} positions match {source}")
+        for position, want, one, many in mismatches[:10]:
+            print(f"\texpected {want}, PlayCard {one}, PlayCardBatch {many}\t{position.describe()}")
+        if len(mismatches) > 0:
+            isBroken = True
+        elif args.record:
+            recorded[name] = {"seed": CORPUS_SEED, "answers": single}
+        elif expected is None:
+            print(f"\tNothing recorded for {name} yet. Run with --record to keep these answers")
+    if args.record and not isBroken:
+        EXPECTED_PATH.write_text(json.dumps(recorded, sort_keys=True) + "\n")
+        print("Wrote " + str(EXPECTED_PATH))
+    sys.exit(1 if isBroken else 0)
+
+if __name__ == "__main__":
+    main()
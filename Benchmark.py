@@ -0,0 +1,242 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# Benchmark.py
+# Times AI decisions on made up positions, rather than whole games, and catches any that crash or answer with something illegal
+# Whole games hide which decisions are expensive. ChooseRow only comes up when someone plays under every row, so an AI's worst case
+# there can go unnoticed for thousands of games. Here every position is built to order, from a seed, so the slow or broken ones
+# can be made again exactly. Positions are legal ones: the rows only hold as many cards as have been played so far, and the
+# hand, the rows and the cards already played never overlap.
+# Difficulty goes from 0 to 1. The higher it is, the fuller the rows, the more of the hand sits under every row, and the closer
+# everyone's scores are to the end of the game.
+
+import random
+import time
+import traceback
+
+from Game.Game import Game, Hand, Player, Event, Rules
+from Game.CardMask import CardMask
+from Game.BoardAnalysis import BoardAnalysis
+
+PLAY_CARD = "PlayCard"
+CHOOSE_ROW = "ChooseRow"
+
+class SyntheticPosition:
+    """One made up decision. Everything an AI hook is handed is built in advance, so only the AI's own time gets measured"""
+
+    def __init__(self, seed, difficulty=0.5, hookName=PLAY_CARD, playerCount=None, turn=None):
+        rng = random.Random(seed)
+        self.seed = seed
+        self.difficulty = difficulty
+        self.hookName = hookName
+        self.playerCount = rng.randint(2, 10) if playerCount is None else playerCount
+        # Turns are counted from 0
+        self.turn = rng.randrange(Game.HAND_SIZE) if turn is None else turn
+        # Every card on the table past the first in each row was played on an earlier turn
+        cardsPlayedSoFar = self.turn * self.playerCount
+        while True:
+            deck = list(range(1, Game.NUM_CARDS + 1))
+            rng.shuffle(deck)
+            rowLengths = [1 + sum(rng.random() < 0.2 + 0.75 * difficulty for _ in range(Game.ROW_SIZE - 1)) for _ in range(Game.NUM_ROWS)]
+            while sum(rowLengths) - Game.NUM_ROWS > cardsPlayedSoFar:
+                rowLengths[rowLengths.index(max(rowLengths))] -= 1
+            self.rows = []
+            for length in rowLengths:
+                self.rows.append(sorted(deck[:length]))
+                deck = deck[length:]
+            lowestTail = min(row[-1] for row in self.rows)
+            # ChooseRow needs a card under every row. Every so often the rows leave none, so deal again
+            if hookName == PLAY_CARD or any(card < lowestTail for card in deck):
+                break
+
+        handSize = Game.HAND_SIZE - self.turn
+        if hookName == CHOOSE_ROW:
+            # We've already played a card under every row, and it's gone from our hand
+            self.card = rng.choice([card for card in deck if card < lowestTail])
+            deck.remove(self.card)
+            handSize -= 1
+        else:
+            self.card = None
+        hand = []
+        for _ in range(handSize):
+            lowCards = [card for card in deck if card < lowestTail]
+            if len(lowCards) > 0 and rng.random() < difficulty:
+                card = rng.choice(lowCards)
+            else:
+                card = rng.choice(deck)
+            deck.remove(card)
+            hand.append(card)
+
+        # The rest of the cards played on earlier turns, ours included
+        rowCards = [card for row in self.rows for card in row]
+        earlier = deck[:max(0, cardsPlayedSoFar - (len(rowCards) - Game.NUM_ROWS))]
+        deck = deck[len(earlier):]
+        # Some of ours may be sitting in the rows
+        ownEarlier = (earlier + [card for row in self.rows for card in row[1:]])[:self.turn]
+        if hookName == CHOOSE_ROW:
+            # Everyone else's card this turn is higher than ours, or ours wouldn't be the one taking a row
+            others = [card for card in deck if card > self.card][:self.playerCount - 1]
+            self.playedCards = sorted([self.card] + others)
+            # What the game would work out for each row, with the other cards coming from the seats after ours in order
+            game = Game(self.playerCount)
+            game.rows = [list(row) for row in self.rows]
+            game.indexTails()
+            self.preview = game.previewRowChoices([(card, None, None, seat) for seat, card in enumerate([self.card] + others)])
+        else:
+            self.playedCards = None
+            self.preview = None
+
+        tableSeen = CardMask.fromCards(rowCards + earlier)
+        handMask = CardMask.fromCards(hand)
+        self.board = BoardAnalysis.fromRows(self.rows, tableSeen)
+        self.hand = sorted(hand)
+        self.handMask = handMask
+        self.seenMask = tableSeen | handMask | (0 if self.card is None else CardMask.fromCards([self.card]))
+        self.startingCards = tuple(row[0] for row in self.rows)
+        self.dealtHand = tuple(sorted(hand + ownEarlier + ([] if self.card is None else [self.card])))
+
+        scoreCeiling = int(Game.TARGET_SCORE * (0.2 + 0.8 * difficulty))
+        self.scores = [("Player " + str(seat), rng.randint(0, scoreCeiling)) for seat in range(self.playerCount)]
+
+    def arguments(self, state):
+        """Fresh copies of what the hook is handed, the same way the game hands them over"""
+        hand = Hand(self.hand, self.handMask, self.seenMask, self.board, self.preview)
+        rows = [list(row) for row in self.rows]
+        scores = list(self.scores)
+        if self.hookName == PLAY_CARD:
+            return (state, hand, rows, scores)
+        return (state, self.card, hand, rows, list(self.playedCards), scores)
+
+    def isLegal(self, answer):
+        if isinstance(answer, bool) or not isinstance(answer, int):
+            return False
+        if self.hookName == PLAY_CARD:
+            return CardMask.contains(self.handMask, answer)
+        return 0 <= answer < Game.NUM_ROWS
+
+    def describe(self):
+        description = f"seed {self.seed}, {self.playerCount} players, turn {self.turn + 1}, rows {self.rows}, hand {self.hand}"
+        if self.hookName == CHOOSE_ROW:
+            description += f", played {self.card} of {self.playedCards}"
+        return description
+
+def makePositions(count, seed=0, difficulty=0.5, chooseRowShare=0.5, playerCount=None):
+    """count positions, seeded seed, seed + 1 and so on. About chooseRowShare of them are for ChooseRow, so its worst cases get a fair look"""
+    positions = []
+    for index in range(count):
+        hookName = CHOOSE_ROW if random.Random(-1 - seed - index).random() < chooseRowShare else PLAY_CARD
+        positions.append(SyntheticPosition(seed + index, difficulty, hookName, playerCount))
+    return positions
+
+class BenchmarkResult:
+    """How one AI got on with one hook. Times are in seconds.
+    slowest is a list of (time, position) from the slowest down, and failures a list of (position, what went wrong)"""
+
+    def __init__(self, aiName, hookName):
+        self.aiName = aiName
+        self.hookName = hookName
+        self.times = []
+        self.slowest = []
+        self.failures = []
+        self.illegalAnswers = 0
+        self.exceptions = 0
+
+    def percentile(self, fraction):
+        if len(self.times) == 0:
+            return 0.0
+        ordered = sorted(self.times)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        """(calls, mean, median, 90th percentile, 99th percentile, slowest, illegal answers, exceptions)"""
+        mean = sum(self.times) / len(self.times) if len(self.times) > 0 else 0.0
+        return (len(self.times), mean, self.percentile(0.5), self.percentile(0.9), self.percentile(0.99),
+                max(self.times, default=0.0), self.illegalAnswers, self.exceptions)
+
+def benchmarkAI(ai, positions, keepSlowest=5, keepFailures=5):
+    """Runs the AI's PlayCard and ChooseRow on every position, setting up (or resetting) the AI state before each one, as if a new round had been dealt.
+    ai is anything with attachToPlayer, like an AiModuleWrapper or AiVariant.
+    Returns a dictionary of hook name: BenchmarkResult"""
+    player = Player()
+    ai.attachToPlayer(player)
+    callbacks = {PLAY_CARD: player.turnCallback, CHOOSE_ROW: player.breakCallback}
+    results = {hookName: BenchmarkResult(ai.getName(), hookName) for hookName in callbacks}
+    for position in positions:
+        result = results[position.hookName]
+        # Setting up isn't what we're timing, but an AI that can't even do that counts as a failure
+        try:
+            player.pregameSetup(position.playerCount)
+            if player.wantsEvents():
+                player.notifyEvent((Event.ROUND_DEALT, position.startingCards, position.dealtHand))
+            arguments = position.arguments(player.aiState)
+        except Exception:
+            result.exceptions += 1
+            if len(result.failures) < keepFailures:
+                result.failures.append((position, "setting up: " + traceback.format_exc(limit=-1).strip().splitlines()[-1]))
+            continue
+        callback = callbacks[position.hookName]
+        try:
+            start = time.perf_counter()
+            answer = callback(*arguments)
+            elapsed = time.perf_counter() - start
+        except Exception:
+            result.exceptions += 1
+            if len(result.failures) < keepFailures:
+                result.failures.append((position, traceback.format_exc(limit=-1).strip().splitlines()[-1]))
+            continue
+        result.times.append(elapsed)
+        if not position.isLegal(answer):
+            result.illegalAnswers += 1
+            if len(result.failures) < keepFailures:
+                result.failures.append((position, "answered " + repr(answer)))
+        result.slowest.append((elapsed, position))
+        if len(result.slowest) > keepSlowest * 4:
+            result.slowest.sort(key=lambda entry: entry[0], reverse=True)
+            del result.slowest[keepSlowest:]
+    for result in results.values():
+        result.slowest.sort(key=lambda entry: entry[0], reverse=True)
+        del result.slowest[keepSlowest:]
+    return results
+
+# Bigger and bigger games, for seeing how the engine's cost per turn grows with the deck, the rows and the table.
+# Each step has about 2.5 times the cards of the one before, with the rows and players to match
+SCALING_LADDER = (
+    (Rules(), 4),
+    (Rules(numCards=250, numRows=8), 10),
+    (Rules(numCards=500, numRows=12), 25),
+    (Rules(numCards=1000, numRows=20), 50),
+)
+# Real AIs get seated on the ladder too, going round the seats, to check they cope with the bigger games and see what they cost there
+SCALING_AIS = ("BestBot", "ThomasBot", "DemocracyBot")
+
+def _playLowest(state, hand, rows, scores):
+    return hand[0]
+
+def _takeFirst(state, card, hand, rows, playedCards, scores):
+    return 0
+
+def timeEngine(rules, playerCount, games=5, seed=0):
+    """Plays games with rules, where every seat plays its lowest card and takes the first row, so nearly all the time is the engine's own.
+    Returns (turns played, seconds per turn, seconds per card played)"""
+    game = Game(playerCount, seed, rules=rules)
+    for player in game.getPlayers():
+        player.setTurnCallback(_playLowest)
+        player.setBreakCallback(_takeFirst)
+    turns = 0
+    elapsed = 0.0
+    for _ in range(games):
+        start = time.perf_counter()
+        game.playGame()
+        elapsed += time.perf_counter() - start
+        turns += game.turnsPlayed
+    return (turns, elapsed / turns, elapsed / (turns * playerCount))
+
+def timeAIs(aiNames, rules, playerCount, games=5, seed=0):
+    """Plays games with rules, with the AIs taking turns round the seats, the way a tournament would, so batch hooks get used too.
+    An AI that still assumes the real game's numbers will crash here. Returns seconds per game"""
+    import Tournament
+    seats = [aiNames[seat % len(aiNames)] for seat in range(playerCount)]
+    playerNames = [aiName + "_" + str(seat) for seat, aiName in enumerate(seats)]
+    start = time.perf_counter()
+    Tournament.playGames(seats, playerNames, list(range(seed, seed + games)), rules)
+    return (time.perf_counter() - start) / games
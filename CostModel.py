@@ -0,0 +1,121 @@
+# CostModel.py
+# Learns how long tournament games take, so the work can be shared out evenly between worker processes and sized to a deadline
+# A game's cost depends hugely on who's sitting at the table: a table of lowestCards is over in a blink, while a table of
+# DemocracyBots takes ages. So every game played at a tournament table is timed, hook call by hook call, and the model keeps the
+# average seconds per game spent in each AI for each table size, plus the engine's own time for each table size. A lineup's cost
+# is then the engine's plus every seat's.
+# Worker processes measure their own games and send what they've learnt back with their results, the same as the memory and
+# profile measurements. The model can be saved and loaded, so the next run starts out already knowing what everything costs.
+
+import json
+import os
+import pathlib
+
+class CostModel:
+    """Seconds per game, for each AI at each table size and for the engine at each table size"""
+
+    VERSION = 1
+    # Averages stop counting games past this many, so newer games always have some pull, and the model keeps up when an AI gets faster or slower
+    MAX_WEIGHT = 64
+    # What a seat, and the engine for each player, are guessed to cost when nothing like them has been measured yet
+    DEFAULT_SEAT = 0.001
+    DEFAULT_ENGINE = 0.001
+
+    def __init__(self):
+        # (AI name, player count): [average seconds per game, weight]
+        self.seats = dict()
+        # player count: [average seconds per game, weight]
+        self.engine = dict()
+        # (AI name or None for the engine, player count): [total seconds, games] measured since the last drain
+        self.unsent = dict()
+
+    def addGame(self, aiNames, seatSeconds, engineSeconds=None):
+        """Takes in one game's measurements: the seconds spent in each seat's AI, and the engine's time if it's known.
+        Games interleaved by the BatchRunner share their wall time, so the engine can't be timed in them"""
+        playerCount = len(aiNames)
+        for aiName, seconds in zip(aiNames, seatSeconds):
+            self._add(aiName, playerCount, seconds, 1)
+        if not engineSeconds is None:
+            self._add(None, playerCount, engineSeconds, 1)
+
+    def _add(self, aiName, playerCount, total, games):
+        table, key = (self.engine, playerCount) if aiName is None else (self.seats, (aiName, playerCount))
+        estimate = table.setdefault(key, [0.0, 0])
+        weight = min(estimate[1] + games, CostModel.MAX_WEIGHT)
+        estimate[0] += (total / games - estimate[0]) * min(1.0, games / weight)
+        estimate[1] = weight
+        sent = self.unsent.setdefault((aiName, playerCount), [0.0, 0])
+        sent[0] += total
+        sent[1] += games
+
+    def drain(self):
+        """Everything measured since last time, to merge into another process's model"""
+        unsent = self.unsent
+        self.unsent = dict()
+        return unsent
+
+    def merge(self, drained):
+        for (aiName, playerCount), (total, games) in drained.items():
+            self._add(aiName, playerCount, total, games)
+
+    @staticmethod
+    def _nearest(estimates, playerCount):
+        """The estimate for the closest table size to playerCount, scaled up or down to its size, or None.
+        Bigger tables mean more cards to think about every turn, but fewer rounds before someone's out, so it's only a rough guess"""
+        if playerCount in estimates:
+            return estimates[playerCount]
+        if len(estimates) == 0:
+            return None
+        nearest = min(estimates, key=lambda count: (abs(count - playerCount), count))
+        return estimates[nearest] * playerCount / nearest
+
+    def seatCost(self, aiName, playerCount) -> float:
+        """Seconds per game spent in the AI, sat at a table of playerCount. AIs that have never been measured are guessed
+        from what the other AIs cost at that table size"""
+        estimate = CostModel._nearest({count: seconds for (name, count), (seconds, _) in self.seats.items() if name == aiName}, playerCount)
+        if estimate is None:
+            others = sorted(CostModel._nearest({count: seconds}, playerCount) for (_, count), (seconds, _) in self.seats.items())
+            estimate = CostModel.DEFAULT_SEAT if len(others) == 0 else others[len(others) // 2]
+        return estimate
+
+    def engineCost(self, playerCount) -> float:
+        estimate = CostModel._nearest({count: seconds for count, (seconds, _) in self.engine.items()}, playerCount)
+        return CostModel.DEFAULT_ENGINE * playerCount if estimate is None else estimate
+
+    def gameCost(self, aiNames) -> float:
+        """Predicted seconds for one game with the lineup"""
+        return self.engineCost(len(aiNames)) + sum(self.seatCost(aiName, len(aiNames)) for aiName in aiNames)
+
+    def isKnown(self, aiName) -> bool:
+        """Whether the AI has been measured at any table size"""
+        return any(name == aiName for name, _ in self.seats)
+
+    def save(self, path):
+        # Write it alongside and swap it in, so an interrupted run can't leave half a file behind
+        path = pathlib.Path(path)
+        temporaryPath = path.with_name(path.name + ".tmp")
+        contents = {"version": CostModel.VERSION,
+                    "seats": [[aiName, playerCount, seconds, weight] for (aiName, playerCount), (seconds, weight) in self.seats.items()],
+                    "engine": [[playerCount, seconds, weight] for playerCount, (seconds, weight) in self.engine.items()]}
+        try:
+            temporaryPath.write_text(json.dumps(contents))
+            os.replace(temporaryPath, path)
+        except OSError:
+            # Not being able to save is no reason to stop
+            pass
+
+    @staticmethod
+    def load(path):
+        """Reads a saved model back in. A missing or unreadable file just gives an empty model"""
+        model = CostModel()
+        try:
+            contents = json.loads(pathlib.Path(path).read_text())
+        except (OSError, ValueError):
+            return model
+        if contents.get("version") != CostModel.VERSION:
+            return model
+        for aiName, playerCount, seconds, weight in contents.get("seats", []):
+            model.seats[(aiName, playerCount)] = [seconds, weight]
+        for playerCount, seconds, weight in contents.get("engine", []):
+            model.engine[playerCount] = [seconds, weight]
+        return model
@@ -0,0 +1,211 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# DatasetExport.py
+# Writes every decision made in a tournament out as training data, for learning policies offline from millions of games
+# A game's decisions are held on to until the game is over, since what they cost isn't known until then. Then they're copied
+# into a fixed size buffer of numpy columns, and every time that fills up it's written out as a shard, an .npz file with one array
+# per column. So memory stays bounded however long the run is, and the games only pay for a few list appends per decision.
+# Each process writes its own shards, named after its process id and a token made up for the run, so worker processes never
+# have to coordinate, and a later run into the same directory adds to it rather than writing over shards that reused the process id.
+# It needs numpy, which the game itself doesn't, so it's only imported once an export has been asked for.
+#
+# The columns, one entry per decision:
+#   game            which game it came from, counting from 0 in each process. loadDataset adds a process column to tell them apart
+#   round, turn     counting from 0. ChooseRow decisions share the turn of the card that caused them
+#   seat            the seat that decided, and players how many seats there were
+#   kind            PLAY_CARD or CHOOSE_ROW
+#   rows            the rows as the decider saw them, padded with 0s to (rows, row size)
+#   hand, seen      CardMasks of the decider's hand and every card they'd seen by the start of the turn, as little endian bytes (np.unpackbits with
+#                   bitorder="little" turns them back into one column per card, card n being column n - 1)
+#   scores          every score, starting with the decider's, padded with -1s
+#   card            the card played (for ChooseRow, the card that was too low for every row)
+#   action          what was decided, which is the card for PlayCard and the row's index for ChooseRow
+#   roundPenalty    the points the decider took from this decision to the end of the round
+#   finalPenalty    the points the decider took from this decision to the end of the game
+
+import os
+import pathlib
+import uuid
+import numpy as np
+
+PLAY_CARD = 0
+CHOOSE_ROW = 1
+
+class DatasetWriter:
+    """Collects decisions from any number of games at once, and writes them to shards in directory. Set it as a game's recorder.
+    Call flush to write out whatever's buffered, which has to happen before the process exits, or it's lost"""
+
+    def __init__(self, directory, game, shardSize : int = 65536):
+        """game is any game with the rules the decisions will be played under, for sizing the columns"""
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.shardSize = shardSize
+        self.numRows = game.NUM_ROWS
+        self.rowSize = game.ROW_SIZE
+        self.maskBytes = (game.NUM_CARDS + 7) // 8
+        self.maxPlayers = (game.NUM_CARDS - game.NUM_ROWS) // game.HAND_SIZE
+        self.columns = {
+            "game": np.zeros(shardSize, dtype=np.int64),
+            "round": np.zeros(shardSize, dtype=np.int16),
+            "turn": np.zeros(shardSize, dtype=np.int16),
+            "seat": np.zeros(shardSize, dtype=np.int8),
+            "players": np.zeros(shardSize, dtype=np.int8),
+            "kind": np.zeros(shardSize, dtype=np.int8),
+            "rows": np.zeros((shardSize, self.numRows, self.rowSize), dtype=np.int16),
+            "hand": np.zeros((shardSize, self.maskBytes), dtype=np.uint8),
+            "seen": np.zeros((shardSize, self.maskBytes), dtype=np.uint8),
+            "scores": np.zeros((shardSize, self.maxPlayers), dtype=np.int16),
+            "card": np.zeros(shardSize, dtype=np.int16),
+            "action": np.zeros(shardSize, dtype=np.int16),
+            "roundPenalty": np.zeros(shardSize, dtype=np.int16),
+            "finalPenalty": np.zeros(shardSize, dtype=np.int16),
+        }
+        self.count = 0
+        # Process ids get reused, by the next run if not sooner, so shard names have this as well
+        self.runToken = uuid.uuid4().hex[:12]
+        self.shardsWritten = 0
+        self.gamesStarted = 0
+        self.recordsWritten = 0
+        # Everything about the games that are still going, by id(game). BatchRunner plays lots of them at once
+        self.pending = dict()
+
+    def startGame(self, game):
+        self.pending[id(game)] = _GameDecisions(self.gamesStarted)
+        self.gamesStarted += 1
+
+    def recordCards(self, game, requests, cardsPlayed):
+        decisions = self.pending[id(game)]
+        players = game.players
+        playerCount = len(players)
+        # Everyone sees the same rows and scores, so they're only kept once a turn
+        decisions.startTurn(game, self.rowSize)
+        decisions.turns.extend([len(decisions.turnRows) - 1] * playerCount)
+        decisions.seats.extend(range(playerCount))
+        decisions.kinds.extend([PLAY_CARD] * playerCount)
+        # The cards are already out of their hands, but they were in them when they chose
+        decisions.hands.extend([player.handMask | (1 << (card - 1)) for player, card in zip(players, cardsPlayed)])
+        decisions.seens.extend([player.seenMask for player in players])
+        decisions.cards.extend(cardsPlayed)
+        decisions.actions.extend(cardsPlayed)
+
+    def recordRow(self, game, seat, card, row, scores):
+        decisions = self.pending[id(game)]
+        player = game.players[seat]
+        # Nothing's changed since everyone played their cards, so it shares their turn
+        decisions.turns.append(len(decisions.turnRows) - 1)
+        decisions.seats.append(seat)
+        decisions.kinds.append(CHOOSE_ROW)
+        decisions.hands.append(player.handMask)
+        decisions.seens.append(player.seenMask)
+        decisions.cards.append(card)
+        decisions.actions.append(row)
+
+    def endRound(self, game):
+        decisions = self.pending[id(game)]
+        decisions.roundScores.append([player.getScore() for player in game.players])
+        decisions.round += 1
+
+    def endGame(self, game):
+        decisions = self.pending.pop(id(game))
+        if len(decisions.seats) == 0:
+            return
+        # Everything's known now, so work the columns out all at once
+        turns = np.array(decisions.turns)
+        seats = np.array(decisions.seats, dtype=np.int64)
+        playerCount = len(game.players)
+        turnScores = np.array(decisions.turnScores)
+        roundScores = np.array(decisions.roundScores)
+        scoresThen = turnScores[turns, seats]
+        rounds = np.array(decisions.turnRounds)[turns]
+        # Everyone's scores, starting with the decider's
+        order = (seats[:, None] + np.arange(playerCount)) % playerCount
+        values = {
+            "round": rounds,
+            "turn": np.array(decisions.turnNumbers)[turns],
+            "seat": seats,
+            "kind": decisions.kinds,
+            "rows": np.array(decisions.turnRows)[turns],
+            "hand": self._maskBytes(decisions.hands),
+            "seen": self._maskBytes(decisions.seens),
+            "scores": turnScores[turns[:, None], order],
+            "card": decisions.cards,
+            "action": decisions.actions,
+            "roundPenalty": roundScores[rounds, seats] - scoresThen,
+            "finalPenalty": roundScores[-1, seats] - scoresThen,
+        }
+        values = {name: np.asarray(value) for name, value in values.items()}
+        start = 0
+        while start < len(seats):
+            count = min(len(seats) - start, self.shardSize - self.count)
+            first = self.count
+            last = first + count
+            self.columns["game"][first:last] = decisions.number
+            self.columns["players"][first:last] = playerCount
+            self.columns["scores"][first:last] = -1
+            self.columns["scores"][first:last, :playerCount] = values["scores"][start:start + count]
+            for name, value in values.items():
+                if name != "scores":
+                    self.columns[name][first:last] = value[start:start + count]
+            self.count = last
+            start += count
+            if self.count == self.shardSize:
+                self.flush()
+
+    def _maskBytes(self, masks):
+        packed = b"".join(mask.to_bytes(self.maskBytes, "little") for mask in masks)
+        return np.frombuffer(packed, dtype=np.uint8).reshape(-1, self.maskBytes)
+
+    def flush(self):
+        """Writes out whatever's buffered as a shard, if there's anything. Games still going aren't included until they finish"""
+        if self.count == 0:
+            return
+        path = self.directory / f"decisions-{os.getpid()}-{self.runToken}-{self.shardsWritten:05d}.npz"
+        np.savez(path, **{name: column[:self.count] for name, column in self.columns.items()})
+        self.shardsWritten += 1
+        self.recordsWritten += self.count
+        self.count = 0
+
+class _GameDecisions:
+    """Every decision from one game so far, a column at a time"""
+
+    def __init__(self, number):
+        self.number = number
+        self.round = 0
+        # For each turn, the round, the turn within the round, the rows padded out, and everyone's scores, in seat order
+        self.turnRounds = []
+        self.turnNumbers = []
+        self.turnRows = []
+        self.turnScores = []
+        # For each decision, which turn it was made on, then the rest of the columns
+        self.turns = []
+        self.seats = []
+        self.kinds = []
+        self.hands = []
+        self.seens = []
+        self.cards = []
+        self.actions = []
+        # Everyone's scores at the end of each round
+        self.roundScores = []
+
+    def startTurn(self, game, rowSize):
+        self.turnRounds.append(self.round)
+        self.turnNumbers.append(game.turnsPlayed % game.HAND_SIZE)
+        self.turnRows.append([row + [0] * (rowSize - len(row)) for row in game.rows])
+        self.turnScores.append([player.getScore() for player in game.players])
+
+def loadDataset(directory) -> dict:
+    """Reads every shard in directory back in, joined end to end. Returns a dictionary of column name: array.
+    Game numbers are only unique within the process that wrote them, so a process column is added, from the shards' names.
+    It numbers the writers from 0, in the order of their shards' names"""
+    shards = sorted(pathlib.Path(directory).glob("decisions-*.npz"))
+    columns = dict()
+    # (process id, run token): process number. Shards from before there were tokens just have the process id
+    writers = dict()
+    for path in shards:
+        process = writers.setdefault(tuple(path.stem.split("-")[1:-1]), len(writers))
+        with np.load(path) as shard:
+            for name in shard.files:
+                columns.setdefault(name, []).append(shard[name])
+            columns.setdefault("process", []).append(np.full(len(shard["game"]), process, dtype=np.int64))
+    return {name: np.concatenate(parts) for name, parts in columns.items()}
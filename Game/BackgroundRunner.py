@@ -0,0 +1,51 @@
+# BackgroundRunner.py
+# Plays a game with people at the table, working out the AI seats' cards in the background while the people are still deciding
+# Everyone picks their card at the same time, so nothing an AI needs to pick its card depends on what anyone else picks.
+# Rather than have the AI seats wait their turn behind someone typing, they're asked on a background thread as soon as the turn starts,
+# and their cards are only taken out of their hands once the people have answered, in the usual seat order.
+# Rows are only ever picked by one player at a time, after the cards are down, so those are asked the ordinary way.
+
+import concurrent.futures
+from Game.Game import Decision
+
+class BackgroundRunner:
+    """Runs a game where the foreground players (the people) get asked on the main thread, and everyone else in the background.
+    Players should already be attached to their AIs"""
+
+    def __init__(self, foregroundPlayers):
+        self.foregroundPlayers = list(foregroundPlayers)
+
+    def isForeground(self, player):
+        return any(player is foreground for foreground in self.foregroundPlayers)
+
+    def run(self, game):
+        """Plays the whole game. Returns the final score list"""
+        # One thread is plenty. It's the waiting for people that we're hiding, and the AIs would only fight over the GIL anyway
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as background:
+            steps = game.playGameSteps()
+            try:
+                requests = next(steps)
+                while True:
+                    requests = steps.send(self.answer(requests, background))
+            except StopIteration as finished:
+                return finished.value
+
+    def answer(self, requests, background):
+        if len(requests) == 1 or requests[0][0] != Decision.PLAY_CARD:
+            return [Decision.ask(request) for request in requests]
+        # Start every AI on its card before asking anyone in the foreground
+        pending = dict()
+        for index, request in enumerate(requests):
+            if not self.isForeground(request[1]):
+                _, player, rows, scores, board = request
+                pending[index] = background.submit(player.chooseCard, rows, scores, board)
+        answers = [None] * len(requests)
+        for index, request in enumerate(requests):
+            if not index in pending:
+                answers[index] = Decision.ask(request)
+        # Everyone's answered, so now the AIs' cards can be played for real
+        for index, future in pending.items():
+            card = future.result()
+            requests[index][1].commitCard(card)
+            answers[index] = card
+        return answers
@@ -0,0 +1,133 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# BatchRunner.py
+# Plays lots of games at once, interleaved, so that AIs with batch hooks can answer for many tables in a single call
+# A vectorized AI doesn't gain much from being asked about one table at a time, however fast the game engine is.
+# So we keep a bunch of games on the go, collect every decision they're waiting on, group them by AI, and hand each group over in one go.
+# AIs without batch hooks are just asked one at a time, like normal.
+
+import copy
+import time
+from Game.Game import Decision
+
+class BatchRunner:
+    """Runs many games side by side. Players should already be attached to their AIs"""
+
+    def __init__(self, maxConcurrentGames=64):
+        self.maxConcurrentGames = maxConcurrentGames
+
+    def run(self, games, finished=None):
+        """Plays every game in the iterable, keeping up to maxConcurrentGames going at once.
+        Games are only taken from the iterable as there's room for them, so it can be a generator.
+        finished is optionally called with each game as soon as it's over, before any more games are taken.
+        Returns the final score lists, in the same order as the games"""
+        games = iter(games)
+        results = []
+        # Each active table is [index into results, game steps, requests it's waiting on, game]
+        active = []
+        nextIndex = 0
+        while True:
+            while len(active) < self.maxConcurrentGames:
+                game = next(games, None)
+                if game is None:
+                    break
+                results.append(None)
+                steps = game.playGameSteps()
+                active.append([nextIndex, steps, next(steps), game])
+                nextIndex += 1
+            if len(active) == 0:
+                return results
+
+            answers = [[None] * len(table[2]) for table in active]
+            # Anyone without a batch hook gets asked straight away. Everyone else is grouped by their batch hook
+            groups = dict()
+            for tableIndex, table in enumerate(active):
+                for requestIndex, request in enumerate(table[2]):
+                    callback = BatchRunner.getBatchCallback(request)
+                    if callback is None:
+                        answers[tableIndex][requestIndex] = Decision.ask(request)
+                    else:
+                        groups.setdefault((request[0], callback), []).append((tableIndex, requestIndex, request))
+            for (kind, callback), entries in groups.items():
+                requests = [entry[2] for entry in entries]
+                trace = requests[0][1].trace
+                isTimed = requests[0][1].isTimed
+                start = 0 if trace is None and not isTimed else time.perf_counter_ns()
+                if kind == Decision.PLAY_CARD:
+                    choices = BatchRunner.askPlayCardBatch(callback, requests)
+                else:
+                    choices = BatchRunner.askChooseRowBatch(callback, requests)
+                if not trace is None or isTimed:
+                    end = time.perf_counter_ns()
+                    name = "PlayCardBatch" if kind == Decision.PLAY_CARD else "ChooseRowBatch"
+                    for request in requests:
+                        if isTimed:
+                            # The call answered for every seat in it, so they share what it cost
+                            request[1].hookTime += (end - start) // len(requests)
+                        if not trace is None:
+                            # Every seat in the batch waited on the whole call
+                            trace.span(request[1].traceTrack, request[1].traceSeat, name, start, end)
+                for (tableIndex, requestIndex, _), choice in zip(entries, choices):
+                    answers[tableIndex][requestIndex] = choice
+
+            stillActive = []
+            for table, tableAnswers in zip(active, answers):
+                try:
+                    table[2] = table[1].send(tableAnswers)
+                    stillActive.append(table)
+                except StopIteration as gameOver:
+                    results[table[0]] = gameOver.value
+                    if not finished is None:
+                        finished(table[3])
+            active = stillActive
+
+    @staticmethod
+    def getBatchCallback(request):
+        player = request[1]
+        if request[0] == Decision.PLAY_CARD:
+            return player.turnBatchCallback
+        return player.breakBatchCallback
+
+    @staticmethod
+    def askPlayCardBatch(callback, requests):
+        """Asks for a whole group of cards in one call. Any invalid answer gets asked again on its own"""
+        players = [request[1] for request in requests]
+        choices = callback([player.aiState for player in players],
+                           [player.getHand(request[4]) for player, request in zip(players, requests)],
+                           [[list(row) for row in request[2]] for request in requests],
+                           [list(request[3]) for request in requests])
+        cards = []
+        for request, player, choice in zip(requests, players, choices):
+            card = BatchRunner._toInt(choice)
+            if card is None or not player.hasCard(card):
+                card = Decision.ask(request)
+            else:
+                player.commitCard(card)
+            cards.append(card)
+        return cards
+
+    @staticmethod
+    def askChooseRowBatch(callback, requests):
+        """Asks for a whole group of rows in one call. Any invalid answer gets asked again on its own"""
+        players = [request[1] for request in requests]
+        choices = callback([player.aiState for player in players],
+                           [request[2] for request in requests],
+                           [player.getHand(request[6], request[7]) for player, request in zip(players, requests)],
+                           [[list(row) for row in request[3]] for request in requests],
+                           [copy.copy(request[4]) for request in requests],
+                           [copy.copy(request[5]) for request in requests])
+        rows = []
+        for request, player, choice in zip(requests, players, choices):
+            row = BatchRunner._toInt(choice)
+            if row is None or not player.isValidRow(row):
+                row = Decision.ask(request)
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _toInt(choice):
+        try:
+            return int(choice)
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,108 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# BeliefState.py
+# Keeps track of what the other players could be holding, so AIs that play out possible futures can deal themselves plausible
+# opponent hands without working everything out again every decision.
+# Every unseen card is in someone else's hand or still in the deck, and everyone's hands shrink by one card a turn. Hands are
+# dealt at random, so with nothing else to go on every way of sharing the unseen cards out is equally likely, and a fair sample
+# is just a shuffle of them. Anything else an AI believes about a player (say, that they always play their lowest card, so
+# nothing below the card they just played can be in their hand) can be added with exclude.
+# Updates only touch the cards that were played, so it's cheap to keep up to date from PostEvent and PostTurn.
+
+import random
+from Game.Game import Game
+from Game.CardMask import CardMask
+
+class BeliefState:
+    """What one player knows about everyone else's hands over a round. Seats are counted from that player, the same as in PostTurn,
+    so seat 0 is the player themselves and seats 1 and up are their opponents.
+    Call startRound when the round is dealt (PostEvent's ROUND_DEALT event has everything it needs), and seeTurn from PostTurn"""
+
+    def __init__(self, playerCount : int, numCards : int = Game.NUM_CARDS, handSize : int = Game.HAND_SIZE):
+        self.playerCount = playerCount
+        self.numCards = numCards
+        self.handSize = handSize
+        self.startRound([], [])
+
+    def startRound(self, startingCards, hand):
+        """Forgets the last round, and starts again from the cards at the start of the rows and our own hand"""
+        self.unseenMask = CardMask.full(self.numCards) & ~CardMask.fromCards(list(startingCards) + list(hand))
+        # The same cards as a list, with where each one sits in it, so a card can be taken out without searching for it
+        self.unseenCards = CardMask.toCards(self.unseenMask)
+        self.positions = {card: index for index, card in enumerate(self.unseenCards)}
+        # Everyone's hand is the same size, since everyone plays one card a turn
+        self.handCount = self.handSize
+        # Cards each seat is known not to have, on top of the ones everybody's seen
+        self.exclusions = [0] * self.playerCount
+
+    def _forget(self, card : int):
+        index = self.positions.pop(card, None)
+        if index is None:
+            # Already accounted for
+            return
+        # Fill its place with the last card, rather than shuffle everything after it along
+        last = self.unseenCards.pop()
+        if last != card:
+            self.unseenCards[index] = last
+            self.positions[last] = index
+        self.unseenMask = CardMask.remove(self.unseenMask, card)
+
+    def seeTurn(self, playedCards):
+        """Takes in a turn's played cards, in seat order starting with ours, the same as PostTurn gets them"""
+        for card in playedCards[1:]:
+            self._forget(card)
+        self.handCount -= 1
+
+    def exclude(self, seat : int, mask : int):
+        """Rules out the cards in mask for the seat. They stay unseen, so they can still turn up in anybody else's hand, or the deck"""
+        self.exclusions[seat] |= mask
+
+    def unseenCount(self) -> int:
+        return len(self.unseenCards)
+
+    def undealtCount(self) -> int:
+        """How many of the unseen cards are in nobody's hand"""
+        return len(self.unseenCards) - self.handCount * (self.playerCount - 1)
+
+    def possibleMask(self, seat : int) -> int:
+        """Every card the seat could be holding"""
+        return self.unseenMask & ~self.exclusions[seat]
+
+    def chanceHeld(self, seat : int, card : int) -> float:
+        """The chance the seat is holding the card. It's exact until something's been excluded. After that it's only an estimate,
+        since it treats the seat's possible cards as equally likely, so count up sampleHands if it needs to be right"""
+        if not CardMask.contains(self.possibleMask(seat), card):
+            return 0.0
+        if self.exclusions[seat] == 0:
+            return self.handCount / len(self.unseenCards)
+        return min(1.0, self.handCount / CardMask.count(self.possibleMask(seat)))
+
+    def sampleHands(self, rng=random, attempts : int = 100) -> list[list[int]]:
+        """Deals everyone else a hand that fits everything we know. Returns a list of hands, seat 1's first.
+        With nothing excluded, every possible deal is as likely as every other, and it only costs as much as the cards it deals.
+        Seats with exclusions are dealt first, most restricted first, and from only the cards they could have, which gets close
+        to fair without being exact. If that paints itself into a corner it tries again, up to attempts times, and then gives up with a ValueError"""
+        opponents = range(1, self.playerCount)
+        restricted = sorted((seat for seat in opponents if self.exclusions[seat] != 0), key=lambda seat: CardMask.count(self.possibleMask(seat)))
+        if len(restricted) == 0:
+            dealt = rng.sample(self.unseenCards, self.handCount * (self.playerCount - 1))
+            return [dealt[start:start + self.handCount] for start in range(0, len(dealt), self.handCount)]
+
+        for _ in range(attempts):
+            hands = [None] * self.playerCount
+            taken = 0
+            for seat in restricted:
+                possible = CardMask.toCards(self.possibleMask(seat) & ~taken)
+                if len(possible) < self.handCount:
+                    break
+                hands[seat] = rng.sample(possible, self.handCount)
+                taken |= CardMask.fromCards(hands[seat])
+            else:
+                rest = rng.sample(CardMask.toCards(self.unseenMask & ~taken), self.handCount * (self.playerCount - 1 - len(restricted)))
+                for seat in opponents:
+                    if hands[seat] is None:
+                        hands[seat] = rest[:self.handCount]
+                        rest = rest[self.handCount:]
+                return hands[1:]
+        raise ValueError("Couldn't find hands that fit everything that's been excluded")
@@ -0,0 +1,99 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# BoardAnalysis.py
+# A read-only summary of the rows, built once per turn by the game and shared by every seat
+# Most AIs want the same handful of facts every turn (where does this card go, how much is that row worth, how close is it to breaking).
+# Rather than have every seat at a full table work those out for themselves, the game works them out once and hands them around.
+
+import types
+from Game.CardMask import CardMask
+
+class BoardAnalysis:
+    """Everything here is worked out in the constructor, so every query is a lookup.
+    Rows are referred to by their index in the row list, the same as ChooseRow uses.
+    It's shared between every seat, so please don't modify it"""
+
+    def __init__(self, game):
+        """Analyzes the rows of the given game as they stand right now.
+        Anything with rows, seenMask, NUM_CARDS, ROW_SIZE and getTotalPoints will do in place of a game"""
+        rows = game.rows
+        self.numCards = game.NUM_CARDS
+        self.rowSize = game.ROW_SIZE
+        self.seenMask = game.seenMask
+        self.unseenMask = CardMask.full(self.numCards) & ~self.seenMask
+
+        self.tails = tuple(row[-1] for row in rows)
+        self.penalties = tuple(game.getTotalPoints(row) for row in rows)
+        self.slots = tuple(self.rowSize - len(row) for row in rows)
+        self.lowestTail = min(self.tails)
+
+        # Walk the rows from lowest tail to highest. Each row owns the cards from just above its tail, up to just below the next tail
+        order = sorted(range(len(rows)), key=lambda i: self.tails[i])
+        self.gaps = [None] * len(rows)
+        self.unseenInGaps = [0] * len(rows)
+        # Cards below the lowest tail don't go anywhere. The player has to pick a row instead
+        destinations = [-1] * self.lowestTail
+        for position, rowIndex in enumerate(order):
+            low = self.tails[rowIndex] + 1
+            if position + 1 < len(order):
+                high = self.tails[order[position + 1]] - 1
+            else:
+                high = self.numCards
+            self.gaps[rowIndex] = (low, high)
+            self.unseenInGaps[rowIndex] = CardMask.countInRange(self.unseenMask, low, high)
+            # A row's own tail is already on the table, so it can't be played, but it still needs a slot in the lookup
+            destinations += [rowIndex] * (high - low + 2)
+        self.gaps = tuple(self.gaps)
+        self.unseenInGaps = tuple(self.unseenInGaps)
+        self.destinations = tuple(destinations)
+        self.unseenBelowLowest = CardMask.countInRange(self.unseenMask, 1, self.lowestTail - 1)
+
+    @staticmethod
+    def fromRows(rows, seenMask=None, rules=None) -> BoardAnalysis:
+        """Analyzes some rows with no game to hand, for AIs that are being driven by something other than a game.
+        If seenMask isn't given, the cards in the rows are all that count as seen. The rules are the real game's unless given"""
+        # Imported here, since the game imports us
+        from Game.Game import Game
+        if seenMask is None:
+            seenMask = CardMask.fromCards(card for row in rows for card in row)
+        if rules is None:
+            rules = Game.RULES
+        return BoardAnalysis(types.SimpleNamespace(rows=rows, seenMask=seenMask, NUM_CARDS=rules.numCards, ROW_SIZE=rules.rowSize, getTotalPoints=Game.getTotalPoints))
+
+    def __copy__(self):
+        # It's read-only, so anyone holding a copy may as well hold the original
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def destination(self, card : int) -> int:
+        """The index of the row the card would land on if it were played right now, or -1 if it's too low for any row.
+        Cards already sitting at the end of a row map to that row"""
+        return self.destinations[card]
+
+    def penalty(self, rowIndex : int) -> int:
+        """The points you'd take for claiming the row"""
+        return self.penalties[rowIndex]
+
+    def slotsLeft(self, rowIndex : int) -> int:
+        """How many more cards the row can take before the next one breaks it"""
+        return self.slots[rowIndex]
+
+    def tail(self, rowIndex : int) -> int:
+        """The last card in the row"""
+        return self.tails[rowIndex]
+
+    def gap(self, rowIndex : int) -> tuple[int, int]:
+        """The lowest and highest cards (inclusive) that would land on the row"""
+        return self.gaps[rowIndex]
+
+    def unseenInGap(self, rowIndex : int) -> int:
+        """How many cards nobody has publicly played yet could land on the row.
+        Some of those might be in your hand, so subtract those yourself if you care"""
+        return self.unseenInGaps[rowIndex]
+
+    def unseenBetween(self, low : int, high : int) -> int:
+        """How many cards between low and high (inclusive) haven't been publicly played yet"""
+        return CardMask.countInRange(self.unseenMask, low, high)
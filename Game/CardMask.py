@@ -0,0 +1,78 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# CardMask.py
+# Helpers for treating a plain int as a set of cards, one bit per card
+# Card n lives in bit n - 1, so the whole 104 card deck fits in a 104 bit integer.
+# Membership, counting and "what's the next card above this one" all become a couple of bit operations instead of list scans.
+
+class CardMask:
+    """Static helpers for card bitmasks. Masks are plain ints, so they're cheap to copy, compare and combine with | & ^ ~"""
+
+    @staticmethod
+    def fromCards(cards) -> int:
+        """Builds a mask containing the given cards"""
+        mask = 0
+        for card in cards:
+            mask |= 1 << (card - 1)
+        return mask
+
+    @staticmethod
+    def toCards(mask : int) -> list[int]:
+        """Gets the cards in the mask as a list sorted in ascending order"""
+        return list(CardMask.iterate(mask))
+
+    @staticmethod
+    def iterate(mask : int):
+        """Iterates over the cards in the mask in ascending order"""
+        while mask:
+            lowestBit = mask & -mask
+            yield lowestBit.bit_length()
+            mask ^= lowestBit
+
+    @staticmethod
+    def full(numCards : int) -> int:
+        """A mask containing every card from 1 to numCards"""
+        return (1 << numCards) - 1
+
+    @staticmethod
+    def contains(mask : int, card : int) -> bool:
+        return card > 0 and (mask >> (card - 1)) & 1 == 1
+
+    @staticmethod
+    def add(mask : int, card : int) -> int:
+        return mask | (1 << (card - 1))
+
+    @staticmethod
+    def remove(mask : int, card : int) -> int:
+        return mask & ~(1 << (card - 1))
+
+    @staticmethod
+    def count(mask : int) -> int:
+        """Number of cards in the mask"""
+        return bin(mask).count("1")
+
+    @staticmethod
+    def rangeMask(low : int, high : int) -> int:
+        """A mask containing every card from low to high (inclusive). Empty if high < low"""
+        if high < low:
+            return 0
+        return ((1 << (high - low + 1)) - 1) << (low - 1)
+
+    @staticmethod
+    def countInRange(mask : int, low : int, high : int) -> int:
+        """Number of cards in the mask from low to high (inclusive)"""
+        return CardMask.count(mask & CardMask.rangeMask(low, high))
+
+    @staticmethod
+    def nextAbove(mask : int, card : int):
+        """The lowest card in the mask that is strictly higher than the given card, or None if there isn't one"""
+        above = mask >> card
+        if above == 0:
+            return None
+        return card + (above & -above).bit_length()
+
+    @staticmethod
+    def nextUnseenAbove(seenMask : int, card : int, numCards : int):
+        """The lowest card higher than the given card which is not in the seen mask, or None if every card above it has been seen"""
+        return CardMask.nextAbove(CardMask.full(numCards) & ~seenMask, card)
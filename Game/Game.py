@@ -6,18 +6,113 @@ from __future__ import annotations
 # By Thomas Albertine
 
 import random
+import time
 import copy
+import bisect
+import itertools
+from Game.CardMask import CardMask
+from Game.BoardAnalysis import BoardAnalysis
+from Game.Trace import ENGINE
+
+class Event:
+    """The kinds of event sent to the optional PostEvent hook, as they happen. Each event is a small tuple starting with one of these.
+    Seats are relative to whoever receives the event, so 0 is always you, 1 is the player after you, and so on.
+        (ROUND_DEALT, startingCards, hand): the card starting each row, and your new hand, as tuples
+        (CARD_PLACED, seat, card, row): seat's card went on the end of the row without breaking it
+        (ROW_BROKEN, seat, card, row, points): seat took the row for that many points, and their card starts it over
+        (TURN_RESOLVED, cardsPlayed): every card this turn has been placed. The cards are in seat order, starting with yours"""
+    ROUND_DEALT = 0
+    CARD_PLACED = 1
+    ROW_BROKEN = 2
+    TURN_RESOLVED = 3
+
+class Decision:
+    """The choices a game can be left waiting on. Game.playGameSteps yields lists of requests, which are tuples starting with one of these:
+        (PLAY_CARD, player, rows, scores, board)
+        (CHOOSE_ROW, player, card, rows, playedCards, scores, board, preview)
+    It expects the list of answers back in the same order, with each one already taken care of by its player, the way ask does it"""
+    PLAY_CARD = 0
+    CHOOSE_ROW = 1
+
+    @staticmethod
+    def ask(request):
+        """Asks the player to make the decision the ordinary way, one callback at a time"""
+        if request[0] == Decision.PLAY_CARD:
+            _, player, rows, scores, board = request
+            return player.playTurn(rows, scores, board)
+        _, player, card, rows, playedCards, scores, board, preview = request
+        return player.breakRow(rows, scores, card, playedCards, board, preview)
+
+class Rules:
+    """The numbers a game is played with. The defaults are the real game's.
+    Bigger decks, more rows and more players make variants for stress testing AIs and the engine.
+    A targetScore below 0 makes every game a single round, since the game ends as soon as anyone's score is over it"""
+
+    def __init__(self, numCards=104, handSize=10, numRows=4, rowSize=5, targetScore=66):
+        self.numCards = numCards
+        self.handSize = handSize
+        self.numRows = numRows
+        self.rowSize = rowSize
+        self.targetScore = targetScore
+
+    def _values(self):
+        return (self.numCards, self.handSize, self.numRows, self.rowSize, self.targetScore)
+
+    # Rules with the same numbers are the same rules, so they can be compared and used as keys, even after a trip to another process
+    def __eq__(self, other):
+        return isinstance(other, Rules) and self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
 
 class Game:
-    """Represents a single game of Take 5"""
+    """Represents a single game of Take 5
+    The class constants are the real game's rules. A game with different Rules has its own copies of them, so read them from the game, not the class"""
     NUM_CARDS = 104
     HAND_SIZE = 10
     NUM_ROWS = 4
     ROW_SIZE = 5
     TARGET_SCORE = 66
+    # The same numbers as a Rules, which is what AIs get handed as hand.rules
+    RULES = Rules()
 
-    def __init__(self, playerCount, seed=None, log=None):
+    def __init__(self, playerCount, seed=None, log=None, rules=None):
         """Take 5 Game constructor"""
+        if not rules is None:
+            self.RULES = rules
+            self.NUM_CARDS = rules.numCards
+            self.HAND_SIZE = rules.handSize
+            self.NUM_ROWS = rules.numRows
+            self.ROW_SIZE = rules.rowSize
+            self.TARGET_SCORE = rules.targetScore
+        if self.NUM_ROWS + playerCount * self.HAND_SIZE > self.NUM_CARDS:
+            raise ValueError(f"{self.NUM_CARDS} cards isn't enough for {self.NUM_ROWS} rows and {playerCount} hands of {self.HAND_SIZE}")
+        self.reseed(seed)
+
+        # Create a number of player slots
+        self.players = [Player() for _ in range(playerCount)]
+        for player in self.players:
+            player.rules = self.RULES
+
+        # Show that this exists, although we don't need to actually create it until the start of the game
+        self.rows = None
+        # The card on the end of every row in ascending order, and the row each one's on, so placing a card is a binary search
+        self.tails = []
+        self.tailRows = dict()
+        # Every card that everyone at the table has seen this round, as a CardMask
+        self.seenMask = 0
+        # A TraceBuffer to record when each part of the game happens in, or None. See Trace.py
+        self.trace = None
+        self.traceTrack = 0
+        # Something with startGame, recordCards, recordRow, endRound and endGame that wants to see every decision, like a DatasetWriter, or None
+        self.recorder = None
+        # (seat, player) for everyone who wants to hear about events as they happen
+        self.subscribers = []
+        self.turnsPlayed = 0
+        self.rowsChosen = [0] * playerCount
+
+    def reseed(self, seed=None):
+        """Sets up the random state the game deals from. Call it before playing the same game object again, if you want a different deal"""
         # stash the current random state while we set up the game's random state
         extState = random.getstate()
         # If we don't care about the seed, use the current time as the seed.
@@ -31,16 +126,15 @@ class Game:
         self.randomState = random.getstate()
         random.setstate(extState)
 
-        # Create a number of player slots
-        self.players = [Player() for _ in range(playerCount)]
-
-        # Show that this exists, although we don't need to actually create it until the start of the game
-        self.rows = None
-
     def prepareNewGame(self):
         # Initializes players
         for player in self.players:
             player.pregameSetup(len(self.players))
+        self.subscribers = [(seat, player) for seat, player in enumerate(self.players) if player.wantsEvents()]
+        # How many decisions this game has needed, for keeping track of throughput. Every turn everyone picks a card,
+        # and every so often someone has to pick a row
+        self.turnsPlayed = 0
+        self.rowsChosen = [0] * len(self.players)
 
         self.log = []
         self.appendLog("\nGame Begun")
@@ -68,30 +162,43 @@ class Game:
         random.setstate(self.randomState)
 
         # Create a deck of cards from 1 to 104, and shuffle it
-        self.deck = [x for x in range(1, Game.NUM_CARDS + 1)]
+        self.deck = [x for x in range(1, self.NUM_CARDS + 1)]
         random.shuffle(self.deck)
+        # Deal from the top of the deck, without copying what's left every time
+        cards = iter(self.deck)
         
-        # Create a structure for the four rows in which cards will be played
-        self.rows = [[] for _ in range(Game.NUM_ROWS)]
-        # Put a card at the start of the row
+        # Create a structure for the rows in which cards will be played, and put a card at the start of each
+        self.rows = [[next(cards)] for _ in range(self.NUM_ROWS)]
         self.appendLog("\nInitial Rows:")
-        for row in self.rows:
-            card = self.deck.pop(0)
-            row.append(card)
         self.appendLog(self._formatRows())
+        self.seenMask = CardMask.fromCards([row[0] for row in self.rows])
+        self.indexTails()
 
         # Deal out ten cards to everyone
         self.appendLog("\nPlayer Starting Hands:")
         for player in self.players:
-            hand = self.deck[:Game.HAND_SIZE]
-            self.deck = self.deck[Game.HAND_SIZE:]
+            hand = list(itertools.islice(cards, self.HAND_SIZE))
             player.setHand(hand)
+            player.seeCards(self.seenMask)
             self.appendLog("\n" + player.getName() + ": " + ", ".join(map(lambda x: Game._formatCard(x), hand)))
 
+        # Whatever's left over doesn't get played this round
+        self.deck = list(cards)
+
         # Revert to external random state
         self.randomState = random.getstate()
         random.setstate(extState)
 
+        if self.subscribers:
+            startingCards = tuple(row[0] for row in self.rows)
+            for _, player in self.subscribers:
+                player.notifyEvent((Event.ROUND_DEALT, startingCards, tuple(player.hand)))
+
+    def emitSeatEvent(self, kind, seat, *details):
+        """Sends an event about something a seat did to everyone listening, with the seat number made relative to each of them"""
+        for listenerSeat, player in self.subscribers:
+            player.notifyEvent((kind, (seat - listenerSeat) % len(self.players), *details))
+
     def getScoreList(self):
         """Gets a list of the player's scores, in player order"""
         scoreList = []
@@ -100,30 +207,67 @@ class Game:
         return scoreList
 
     def playGame(self):
+        """Plays a whole game, asking each player for their choices as they come up. Returns the final score list"""
+        steps = self.playGameSteps()
+        try:
+            requests = next(steps)
+            while True:
+                requests = steps.send([Decision.ask(request) for request in requests])
+        except StopIteration as finished:
+            return finished.value
+
+    def playGameSteps(self):
+        """Plays a whole game, but rather than asking the players for their choices, yields a list of Decision requests
+        each time it needs some, and waits for the answers to be sent back. The generator returns the final score list.
+        That lets someone else (like the BatchRunner) interleave lots of games and decide how the players get asked"""
+        trace = self.trace
+        if not trace is None:
+            gameStart = trace.now()
+            self.traceTrack = trace.startGame(None, [player.getName() for player in self.players])
+            for seat, player in enumerate(self.players):
+                player.trace = trace
+                player.traceTrack = self.traceTrack
+                player.traceSeat = seat
         self.prepareNewGame()
+        if not self.recorder is None:
+            self.recorder.startGame(self)
 
         while True:
+            if not trace is None:
+                start = trace.now()
             self.prepareRound()
-            for _ in range(Game.HAND_SIZE):
+            if not trace is None:
+                trace.span(self.traceTrack, ENGINE, "deal", start)
+            for _ in range(self.HAND_SIZE):
+                if not trace is None:
+                    turnStart = trace.now()
                 self.appendLog("\nHand Begun")
                 # prepare a list of scores for each player
                 scoreList = self.getScoreList()
+                # Work out the shared facts about the rows once, rather than once per seat
+                board = BoardAnalysis(self)
+                if not trace is None:
+                    trace.span(self.traceTrack, ENGINE, "analyse board", turnStart)
 
-                actions = []
-                cardsPlayed = []
+                requests = []
                 for player in self.players:
-                    # save each player's action and keep it associated with them
-                    card = player.playTurn(self.rows, scoreList)
-                    actions.append((card, player, copy.copy(scoreList)))
-                    cardsPlayed.append(card)
+                    requests.append((Decision.PLAY_CARD, player, self.rows, copy.copy(scoreList), board))
                     # Cycle the score list so that the first entry is always the current player's 
                     scoreList.append(scoreList.pop(0))
+                # Everyone plays at the same time, so ask everyone at once
+                cardsPlayed = list((yield requests))
+                if not trace is None:
+                    start = trace.now()
+                if not self.recorder is None:
+                    self.recorder.recordCards(self, requests, cardsPlayed)
+                # save each player's action and keep it associated with them
+                actions = [(card, request[1], request[3], seat) for seat, (card, request) in enumerate(zip(cardsPlayed, requests))]
 
                 # sort in ascending order, so that we know which goes first
                 actions.sort(key=lambda x: x[0])
 
                 #If a player played a card lower than all the ends of the rows, they get to clear a row of their choosing
-                lowestRow = min([row[-1] for row in self.rows])
+                lowestRow = self.tails[0]
                 if actions[0][0] < lowestRow:
                     card = actions[0][0]
                     player = actions[0][1]
@@ -131,41 +275,72 @@ class Game:
                     self.appendLog("\n" + player.getName() + " played " + Game._formatCard(card))
 
                     playedCards = list(map(lambda x: x[0], actions))
-                    rowToBreak = player.breakRow(self.rows,thisScoreList, card, playedCards)
+                    if not trace is None:
+                        trace.span(self.traceTrack, ENGINE, "resolve", start)
+                    preview = self.previewRowChoices(actions)
+                    rowToBreak = (yield [(Decision.CHOOSE_ROW, player, card, self.rows, playedCards, thisScoreList, board, preview)])[0]
+                    if not trace is None:
+                        start = trace.now()
+                    if not self.recorder is None:
+                        self.recorder.recordRow(self, actions[0][3], card, rowToBreak, thisScoreList)
+                    self.rowsChosen[actions[0][3]] += 1
                     self.appendLog("\n" + player.getName() + " chose row " + str(rowToBreak))
 
                     # Add those points to the player
                     for oldCard in self.rows[rowToBreak]:
                         self.appendLog("\n" + player.getName() + " scored " + Game._formatCard(oldCard))
                         player.addScore(Game.cardToPoints(oldCard))
+                    if self.subscribers:
+                        self.emitSeatEvent(Event.ROW_BROKEN, actions[0][3], card, rowToBreak, Game.getTotalPoints(self.rows[rowToBreak]))
 
                     # Restart the row
+                    self.moveTail(self.rows[rowToBreak][-1], card)
                     self.rows[rowToBreak] = [card]
                 
                     # Remove that action from the queue
                     actions.pop(0)
 
                 # Now handle the remaining player's actions
-                for card, player, _ in actions:
+                for card, player, _, seat in actions:
                     result = self.placeCard(card)
                     self.appendLog("\n" + player.getName() + " played " + Game._formatCard(card))
                     if not result is None:
                         # A row broke
-                        oldRow = self.rows[result][:Game.ROW_SIZE]
-                        self.rows[result] = self.rows[result][Game.ROW_SIZE:]
+                        oldRow = self.rows[result][:self.ROW_SIZE]
+                        self.rows[result] = self.rows[result][self.ROW_SIZE:]
                         for oldCard in oldRow:
                             self.appendLog("\n" + player.getName() + " scored " + Game._formatCard(oldCard))
                             player.addScore(Game.cardToPoints(oldCard))
+                        if self.subscribers:
+                            self.emitSeatEvent(Event.ROW_BROKEN, seat, card, result, Game.getTotalPoints(oldRow))
+                    elif self.subscribers:
+                        self.emitSeatEvent(Event.CARD_PLACED, seat, card, self.lastPlacedRow)
                 self.appendLog("\nTurn Ended")
+                self.turnsPlayed += 1
+                if not trace is None:
+                    trace.span(self.traceTrack, ENGINE, "resolve", start)
+                    start = trace.now()
                 # A hand has ended
+                playedMask = CardMask.fromCards(cardsPlayed)
+                self.seenMask |= playedMask
+                for listenerSeat, player in self.subscribers:
+                    player.notifyEvent((Event.TURN_RESOLVED, tuple(cardsPlayed[listenerSeat:] + cardsPlayed[:listenerSeat])))
                 scoreList = self.getScoreList()
                 for player in self.players:
                     # Notify each player of the results
+                    player.seeCards(playedMask)
                     player.endTurn(cardsPlayed, scoreList)
                     # Cycle the score list so that the first entry is always the current player's 
                     cardsPlayed.append(cardsPlayed.pop(0))
                     scoreList.append(scoreList.pop(0))
+                if not trace is None:
+                    trace.span(self.traceTrack, ENGINE, "notify", start)
+                    trace.span(self.traceTrack, ENGINE, "turn", turnStart)
+            if not trace is None:
+                start = trace.now()
             self.appendLog("\nRound Ended")
+            if not self.recorder is None:
+                self.recorder.endRound(self)
             # a round has ended
             scoreList = self.getScoreList()
             for player in self.players:
@@ -173,11 +348,15 @@ class Game:
                 player.endRound(scoreList)
                 # Cycle the score list so that the first entry is always the current player's 
                 scoreList.append(scoreList.pop(0))
+            if not trace is None:
+                trace.span(self.traceTrack, ENGINE, "end round", start)
             largestScore = max(map(lambda x: x.getScore(), self.players))
-            if (largestScore > Game.TARGET_SCORE):
+            if (largestScore > self.TARGET_SCORE):
                 # Somebody hit the target score, so the game is over
                 break
         self.appendLog("\nGame Ended")
+        if not self.recorder is None:
+            self.recorder.endGame(self)
         # The game is over
         scoreList = self.getScoreList()
         for player in self.players:
@@ -188,23 +367,68 @@ class Game:
         self.appendLog("\nFinal Scores:")
         for name, score in self.getScoreList():
             self.appendLog("\n" + name + ": " + str(score))
+        if not trace is None:
+            trace.span(self.traceTrack, ENGINE, "game", gameStart)
         return self.getScoreList()
 
+    def previewRowChoices(self, actions):
+        """Works out how the rest of the turn would go for each row the lowest card's player could take.
+        actions are (card, player, scores, seat) for every card this turn, lowest first.
+        Returns a tuple with an entry per row, each a tuple of the points every seat would take this turn, starting with the chooser's"""
+        card, _, _, chooser = actions[0]
+        playerCount = len(self.players)
+        lengths = [len(row) for row in self.rows]
+        points = [Game.getTotalPoints(row) for row in self.rows]
+        preview = []
+        for choice in range(len(self.rows)):
+            taken = [0] * playerCount
+            taken[0] = points[choice]
+            rowLengths = list(lengths)
+            rowPoints = list(points)
+            rowLengths[choice] = 1
+            rowPoints[choice] = Game.cardToPoints(card)
+            # The same sorted row ends as placeCard uses, but with our card on the chosen row
+            tailRows = dict(self.tailRows)
+            del tailRows[self.rows[choice][-1]]
+            tailRows[card] = choice
+            tails = sorted(tailRows)
+            for otherCard, _, _, seat in actions[1:]:
+                position = bisect.bisect_left(tails, otherCard) - 1
+                row = tailRows.pop(tails[position])
+                tails[position] = otherCard
+                tailRows[otherCard] = row
+                if rowLengths[row] == self.ROW_SIZE:
+                    taken[(seat - chooser) % playerCount] += rowPoints[row]
+                    rowLengths[row] = 1
+                    rowPoints[row] = Game.cardToPoints(otherCard)
+                else:
+                    rowLengths[row] += 1
+                    rowPoints[row] += Game.cardToPoints(otherCard)
+            preview.append(tuple(taken))
+        return tuple(preview)
+
+    def indexTails(self):
+        """Works out the sorted row ends from scratch"""
+        self.tails = sorted(row[-1] for row in self.rows)
+        self.tailRows = {row[-1]: i for i, row in enumerate(self.rows)}
+
+    def moveTail(self, oldTail, newTail):
+        """Keeps the sorted row ends up to date when the end of a row changes"""
+        del self.tails[bisect.bisect_left(self.tails, oldTail)]
+        bisect.insort(self.tails, newTail)
+        self.tailRows[newTail] = self.tailRows.pop(oldTail)
+
     def placeCard(self, card):
         """Places the card in it's appropriate row. Returns the row that broke, if any"""
-        bestRow = None
-        distance = Game.NUM_CARDS # larger than the largest possible distance
-        for i, row in enumerate(self.rows):
-            thisDist = card - row[-1]
-            if thisDist < 0:
-                # If the end of the row is bigger than the card, it can't go here
-                continue
-            if thisDist < distance:
-                # This is closer than the best one we've seen so far
-                bestRow = i
-                distance = thisDist
+        # The closest row end below the card. Every card is different, so none of them are the card itself
+        position = bisect.bisect_left(self.tails, card) - 1
+        bestRow = self.tailRows.pop(self.tails[position])
+        # The card lands between that row end and the next one up, so it takes the old end's place in the order
+        self.tails[position] = card
+        self.tailRows[card] = bestRow
         self.rows[bestRow].append(card)
-        if len(self.rows[bestRow]) > Game.ROW_SIZE:
+        self.lastPlacedRow = bestRow
+        if len(self.rows[bestRow]) > self.ROW_SIZE:
             # the row broke
             return bestRow
         return None
@@ -240,6 +464,26 @@ class Game:
         The list is a copy so you can't remove them, but the references to the players are real, so be careful"""
         return copy.copy(self.players)
 
+class Hand(list):
+    """The player's hand as it's handed to the AI callbacks
+    It's still just the list of cards sorted in ascending order, so AIs that treat it as a list don't need to change.
+    It also carries two CardMasks, so membership and range queries can be done with bit operations:
+        mask: the cards in the hand
+        seen: every card this player has seen this round (their dealt hand, the starting row cards, and everything played since)
+    The masks are a snapshot, so they won't follow along if you edit the list.
+    It also carries the BoardAnalysis for the current turn as board, which is shared by every seat (None outside of a game)
+    rules is the Rules the game is being played by, so AIs can cope with bigger decks and more rows (the real game's outside of a game).
+    In ChooseRow it carries preview too, which is how the rest of the turn would go for each row you could take. preview[row][seat] is
+    how many points the seat would take this turn, counting seats from you, so preview[row][0] is what the row costs you (None everywhere else)"""
+
+    def __init__(self, cards=(), mask=0, seen=0, board=None, preview=None, rules=None):
+        super().__init__(cards)
+        self.mask = mask
+        self.seen = seen
+        self.board = board
+        self.preview = preview
+        self.rules = Game.RULES if rules is None else rules
+
 class Player:
     """A player object
     Organizes and contains objects relevant to players.
@@ -249,7 +493,33 @@ class Player:
         """Player constructor"""
         self.resetCallbacks()
         self.aiState = None
+        # Whether aiState has been through a game already, and so can be reset rather than set up
+        self.hasPlayed = False
         self.name = ""
+        self.hand = []
+        self.handMask = 0
+        self.seenMask = 0
+        # The rules the player's game is played by, for handing to the AI and checking the rows they pick
+        self.rules = Game.RULES
+        # The game's TraceBuffer, and where in it to record this player's AI calls, if the game's being traced
+        self.trace = None
+        self.traceTrack = 0
+        self.traceSeat = 0
+        # With isTimed set, hookTime adds up the nanoseconds spent in this player's AI, for working out what a seat costs
+        self.isTimed = False
+        self.hookTime = 0
+
+    def hookStart(self):
+        return 0 if self.trace is None and not self.isTimed else time.perf_counter_ns()
+
+    def hookEnd(self, name, start):
+        if self.trace is None and not self.isTimed:
+            return
+        end = time.perf_counter_ns()
+        if self.isTimed:
+            self.hookTime += end - start
+        if not self.trace is None:
+            self.trace.span(self.traceTrack, self.traceSeat, name, start, end)
 
     def resetCallbacks(self):
         self.setupCallback = None
@@ -258,6 +528,11 @@ class Player:
         self.endRoundCallback = None
         self.endGameCallback = None
         self.endTurnCallback = None
+        self.eventCallback = None
+        self.turnBatchCallback = None
+        self.breakBatchCallback = None
+        self.resetCallback = None
+        self.hasPlayed = False
 
     def setName(self, name : str):
         """Allows the player to set the name"""
@@ -272,16 +547,41 @@ class Player:
         """Sets the player's hand"""
         self.hand = hand
         self.hand.sort()
+        self.handMask = CardMask.fromCards(hand)
+        # We've obviously seen our own hand
+        self.seenMask = self.handMask
+
+    def seeCards(self, mask : int):
+        """Records that this player has seen the cards in the mask"""
+        self.seenMask |= mask
+
+    def getHand(self, board=None, preview=None) -> Hand:
+        """Gets a copy of the player's hand, with the masks, the turn's board analysis, any row choice preview and the rules attached"""
+        return Hand(self.hand, self.handMask, self.seenMask, board, preview, self.rules)
 
     def setSetupCallback(self, callback):
         """Sets the optional callback which will happen at the start of the game, so that the AI modules can initialize their state
         Callback will receive only the number of players, and return an object containing any state needed during the player's turn"""
         self.setupCallback = callback
 
+    def setResetCallback(self, callback):
+        """Sets the optional callback which lets an AI reuse its state from the last game at this table, rather than being set up from scratch.
+        Callback will receive the AI state object, and can return a replacement for it. If it returns None, the same object is kept"""
+        self.resetCallback = callback
+
     def pregameSetup(self, numberOfPlayers):
         """Initializes anything that should happen at the start of the game """
-        if not self.setupCallback is None:
+        start = self.hookStart()
+        if self.hasPlayed and not self.resetCallback is None:
+            # Same table, same players, so the AI just needs to forget the last game
+            newState = self.resetCallback(self.aiState)
+            if not newState is None:
+                self.aiState = newState
+            self.hookEnd("Reset", start)
+        elif not self.setupCallback is None:
             self.aiState = self.setupCallback(numberOfPlayers)
+            self.hookEnd("Setup", start)
+        self.hasPlayed = True
         self.score = 0
 
     def getScore(self):
@@ -300,19 +600,35 @@ class Player:
         Callback should return the number on the card which is to be played"""
         self.turnCallback = callback
 
-    def playTurn(self, rows, scores):
+    def hasCard(self, card):
+        return CardMask.contains(self.handMask, card)
+
+    def commitCard(self, card):
+        """Takes a card the player has chosen to play out of their hand"""
+        self.hand.remove(card)
+        self.handMask = CardMask.remove(self.handMask, card)
+
+    def playTurn(self, rows, scores, board=None):
         """Allows the player to choose a card to play"""
+        card = self.chooseCard(rows, scores, board)
+        self.commitCard(card)
+        return card
+
+    def chooseCard(self, rows, scores, board=None):
+        """Asks the player which card they'll play, without taking it out of their hand yet. Call commitCard with it once it's played"""
         card = None
         while card is None:
             try:
-                card = int(self.turnCallback(self.aiState, copy.copy(self.hand), copy.deepcopy(rows), copy.deepcopy(scores)))
+                # Rows only hold cards, and scores are (name, score) tuples, so copying the lists is as good as a deep copy, and far quicker at a big table
+                start = self.hookStart()
+                card = int(self.turnCallback(self.aiState, self.getHand(board), [list(row) for row in rows], list(scores)))
+                self.hookEnd("PlayCard", start)
                 # Only allow cards in the player's hand
-                if not card in self.hand:
+                if not self.hasCard(card):
                     print(str(card) + " is not in your hand.")
                     card = None
             except ValueError:
                 print("Please enter your card of choice as an integer")
-        self.hand.remove(card)
         return card
 
     def setBreakCallback(self, callback):
@@ -327,14 +643,19 @@ class Player:
         Callback should return the index of the row to clear"""
         self.breakCallback = callback
 
-    def breakRow(self, rows, scores, card, playedCards):
+    def isValidRow(self, row):
+        return 0 <= row < self.rules.numRows
+
+    def breakRow(self, rows, scores, card, playedCards, board=None, preview=None):
         """Allows the player to choose which row to claim, if they play a card lower than all the ends of the rows"""
         row = None
         while row is None:
             try:
-                row = int(self.breakCallback(self.aiState, card, copy.copy(self.hand), copy.deepcopy(rows), copy.copy(playedCards), copy.copy(scores)))
-                if row < 0 or row > Game.NUM_ROWS - 1:
-                    print(str(row) + " is not a valid row. Please choose one between 0 and " + str(Game.NUM_ROWS - 1))
+                start = self.hookStart()
+                row = int(self.breakCallback(self.aiState, card, self.getHand(board, preview), [list(row) for row in rows], copy.copy(playedCards), copy.copy(scores)))
+                self.hookEnd("ChooseRow", start)
+                if not self.isValidRow(row):
+                    print(str(row) + " is not a valid row. Please choose one between 0 and " + str(self.rules.numRows - 1))
                     row = None
             except ValueError:
                 print("Please enter your row of choice as an integer")
@@ -349,7 +670,9 @@ class Player:
 
     def endGame(self, score):
         if not self.endGameCallback is None:
+            start = self.hookStart()
             self.endGameCallback(self.aiState, copy.deepcopy(score))
+            self.hookEnd("PostGame", start)
 
     def setEndRoundCallback(self, callback):
         """Sets an optional callback which will notify you when a round has ended. Useful if you're counting cards, for example.
@@ -361,7 +684,9 @@ class Player:
 
     def endRound(self, scores):
         if not self.endRoundCallback is None:
+            start = self.hookStart()
             self.endRoundCallback(self.aiState, copy.deepcopy(scores))
+            self.hookEnd("PostRound", start)
 
     def setEndTurnCallback(self, callback):
         """Sets an optional callback which will notify you when a hand has ended, and tell you what everyone ended up playing
@@ -373,6 +698,47 @@ class Player:
 
     def endTurn(self, playedCards, scoreList):
         if not self.endTurnCallback is None:
-            self.endTurnCallback(self.aiState, copy.copy(playedCards), copy.deepcopy(scoreList))
+            start = self.hookStart()
+            self.endTurnCallback(self.aiState, copy.copy(playedCards), list(scoreList))
+            self.hookEnd("PostTurn", start)
+
+    def setEventCallback(self, callback):
+        """Sets an optional callback which will hear about everything that happens at the table, as it happens.
+        Handy for AIs that keep a model of the game and want to update it bit by bit instead of rebuilding it every turn.
+        Callback will receive:
+            The AI state object
+            and an event tuple. See the Event class for what they look like"""
+        self.eventCallback = callback
+
+    def setTurnBatchCallback(self, callback):
+        """Sets the optional callback which answers the turn callback for lots of tables at once. Only the BatchRunner uses it.
+        Callback will receive lists, with one entry per table, of:
+            the AI state objects
+            copies of the player's hands
+            copies of the rows
+            and the score lists
+        Callback should return a list of the cards to play, in the same order"""
+        self.turnBatchCallback = callback
+
+    def setBreakBatchCallback(self, callback):
+        """Sets the optional callback which answers the break callback for lots of tables at once. Only the BatchRunner uses it.
+        Callback will receive lists, with one entry per table, of:
+            the AI state objects
+            the cards which were played
+            copies of the player's hands
+            copies of the rows
+            everyone's played cards
+            and the score lists
+        Callback should return a list of the row indices to clear, in the same order"""
+        self.breakBatchCallback = callback
+
+    def wantsEvents(self):
+        return not self.eventCallback is None
+
+    def notifyEvent(self, event):
+        # Events are tuples of ints and tuples, so there's nothing to copy
+        start = self.hookStart()
+        self.eventCallback(self.aiState, event)
+        self.hookEnd("PostEvent", start)
 
 
@@ -0,0 +1,172 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# PenaltyEvaluator.py
+# Works out exactly how many points each card in a hand could cost this turn, over every set of cards the other players could play
+# Only the opponents' cards that come before ours matter, and only in a couple of ways. Cards between our row's tail and our card
+# pile onto our row first. And if anyone goes below every row, the lowest of them takes a row, and everyone else below the rows
+# piles onto it. So the whole distribution comes down to how many opponent cards land in a few ranges of the unseen cards, and the
+# points on the last row's worth of them (five, in the real game). Those get counted with a small dynamic program over the unseen
+# cards, which numpy runs for every card in the hand at once.
+# It needs numpy, which the game itself doesn't, so only import it from AIs that want it.
+
+import math
+import numpy as np
+
+from Game.Game import Game
+from Game.CardMask import CardMask
+from Game.BoardAnalysis import BoardAnalysis
+
+class UniformOpponents:
+    """Every opponent plays one of their cards at random. Since hands are dealt at random too, every set of unseen cards
+    is just as likely as any other to be what they play, so the distribution is exact"""
+
+    def weights(self, unseenCards : list[int], handSize : int) -> np.ndarray:
+        """How likely each unseen card (in ascending order) is to be played, relative to the others.
+        A set of opponent cards is as likely as the product of its cards' weights"""
+        return np.ones(len(unseenCards))
+
+    def chooseRow(self, board : BoardAnalysis) -> int:
+        """Which row an opponent takes when their card is too low for any row"""
+        return board.penalties.index(min(board.penalties))
+
+class LowestCardOpponents(UniformOpponents):
+    """Every opponent plays the lowest card in their hand. Each card is weighted by the chance it's the lowest card in a random hand.
+    That treats the opponents as weighted independently of each other, so unlike UniformOpponents it's exact for the model, not the game"""
+
+    def weights(self, unseenCards : list[int], handSize : int) -> np.ndarray:
+        count = len(unseenCards)
+        hands = math.comb(count, handSize)
+        # For the card at each rank to be the lowest, the rest of the hand has to come from the cards above it
+        return np.array([math.comb(count - rank - 1, handSize - 1) / hands for rank in range(count)], dtype=float)
+
+class PenaltyEvaluator:
+    """Evaluates every card in a hand in one go. Any AI can make one in Setup and keep it, since it doesn't hold on to anything between calls"""
+
+    def __init__(self, opponentModel=None):
+        self.opponentModel = UniformOpponents() if opponentModel is None else opponentModel
+
+    def evaluate(self, hand : list[int], board : BoardAnalysis, numPlayers : int, seenMask=None) -> np.ndarray:
+        """Returns an array with a row for each card in the hand, where [i, p] is the chance that playing hand[i] costs exactly p points this turn.
+        seenMask is every card you know isn't in an opponent's hand, your own included. It defaults to hand.seen, or failing that the board's seen cards and your hand"""
+        if seenMask is None:
+            seenMask = getattr(hand, "seen", None)
+        if seenMask is None:
+            seenMask = board.seenMask | CardMask.fromCards(hand)
+        seenMask |= CardMask.fromCards(hand)
+        unseen = np.array(CardMask.toCards(CardMask.full(board.numCards) & ~seenMask), dtype=int)
+        opponents = numPlayers - 1
+        weights = np.asarray(self.opponentModel.weights(unseen.tolist(), len(hand)), dtype=float)
+        points = np.array([Game.cardToPoints(card) for card in unseen], dtype=int)
+        # Variants can have longer rows and bigger decks, so everything goes by the board's numbers rather than the real game's.
+        # The most a turn can cost is a row that's already on the table, topped up to full with the most expensive unseen cards
+        rowSize = board.rowSize
+        maxPenalty = max(board.penalties) + rowSize * int(points.max(initial=0))
+
+        # Each term says: count the sets where the opponents play m cards in statRange (with the last row's worth of them worth S points)
+        # and the rest of their cards in otherSet, and charge whatever that costs landing on a row with the given base
+        terms = [[] for _ in hand]
+        statRanges = dict()
+        otherSets = dict()
+        def inRange(low, high):
+            """Unseen cards strictly between low and high"""
+            return (unseen > low) & (unseen < high)
+        def addTerm(cardIndex, sign, statRange, otherSet, base):
+            statKey = statRanges.setdefault(statRange, len(statRanges))
+            otherKey = otherSets.setdefault(otherSet.tobytes(), (len(otherSets), otherSet))[0]
+            terms[cardIndex].append((sign, statKey, otherKey, base))
+
+        belowRows = inRange(0, board.lowestTail)
+        takenRow = self.opponentModel.chooseRow(board)
+        cheapest = min(board.penalties)
+        for i, card in enumerate(hand):
+            rowIndex = board.destination(card)
+            if rowIndex == -1:
+                # If nobody goes lower, we take the cheapest row. Otherwise someone else takes a row, and we pile on with them
+                addTerm(i, 1, (0, card), ~inRange(0, card), ("lowest", cheapest))
+                continue
+            tail = board.tail(rowIndex)
+            base = ("row", rowSize - board.slotsLeft(rowIndex), board.penalty(rowIndex))
+            if takenRow != rowIndex or not belowRows.any():
+                addTerm(i, 1, (tail, card), ~inRange(tail, card), base)
+                continue
+            # Our row goes if anyone plays below every row, so split on whether anyone does
+            addTerm(i, 1, (tail, card), ~inRange(tail, card) & ~belowRows, base)
+            lowerTails = [(board.tail(other), other) for other in range(len(board.tails)) if other != rowIndex and board.tail(other) < card]
+            if len(lowerTails) > 0:
+                # We land on the next row down instead, along with everything between its tail and our card
+                otherTail, other = max(lowerTails)
+                otherBase = ("row", rowSize - board.slotsLeft(other), board.penalty(other))
+                addTerm(i, 1, (otherTail, card), ~inRange(otherTail, card), otherBase)
+                addTerm(i, -1, (otherTail, card), ~inRange(otherTail, card) & ~belowRows, otherBase)
+            else:
+                # Ours was the lowest row, so we land on the new row with every opponent card below ours, as long as one was below every row
+                addTerm(i, 1, (0, card), ~inRange(0, card), ("row", 0, 0))
+                addTerm(i, -1, (tail, card), ~inRange(0, card), ("row", 0, 0))
+
+        statMasks = np.array([inRange(low, high) for low, high in statRanges], dtype=bool).reshape(len(statRanges), len(unseen))
+        otherMasks = np.array([mask for _, mask in sorted(otherSets.values(), key=lambda entry: entry[0])] + [np.ones(len(unseen), dtype=bool)], dtype=bool)
+        stats, counts = PenaltyEvaluator._countSets(statMasks, otherMasks, weights, points, opponents, rowSize, maxPenalty)
+        total = counts[-1, opponents]
+
+        distributions = np.zeros((len(hand), maxPenalty + 1))
+        played = np.arange(opponents + 1)[:, None]
+        lastRow = np.arange(maxPenalty + 1)[None, :]
+        for i, cardTerms in enumerate(terms):
+            for sign, statKey, otherKey, base in cardTerms:
+                # How many ways there are of the opponents playing m cards in the range, worth S, with the rest outside it
+                ways = stats[statKey] * counts[otherKey, opponents - played]
+                penalty = PenaltyEvaluator._penalties(base, played, lastRow, rowSize, maxPenalty)
+                distributions[i] += sign * np.bincount(penalty.ravel(), weights=ways.ravel(), minlength=maxPenalty + 1)
+        if total > 0:
+            distributions /= total
+        # Subtracting terms can leave a little rounding error below zero
+        return np.clip(distributions, 0.0, 1.0)
+
+    def expectedPenalties(self, hand : list[int], board : BoardAnalysis, numPlayers : int, seenMask=None) -> np.ndarray:
+        """The expected points each card in the hand costs this turn"""
+        distributions = self.evaluate(hand, board, numPlayers, seenMask)
+        return distributions @ np.arange(distributions.shape[1])
+
+    @staticmethod
+    def _countSets(statMasks, otherMasks, weights, points, opponents, rowSize, maxPenalty):
+        """stats[r, m, S] is the weighted number of ways of picking m of the unseen cards in statMasks[r], where the top rowSize picked are worth S.
+        counts[q, m] is the weighted number of ways of picking m of the unseen cards in otherMasks[q], ignoring points.
+        Cards are added from the top down, so the first rowSize picked are always the highest"""
+        stats = np.zeros((len(statMasks), opponents + 1, maxPenalty + 1))
+        stats[:, 0, 0] = 1.0
+        counts = np.zeros((len(otherMasks), opponents + 1))
+        counts[:, 0] = 1.0
+        counted = min(opponents, rowSize)
+        for index in range(len(weights) - 1, -1, -1):
+            weight = weights[index]
+            if weight == 0:
+                continue
+            cardPoints = points[index]
+            rows = statMasks[:, index]
+            if rows.any():
+                before = stats[rows]
+                picked = np.zeros_like(before)
+                picked[:, 1:counted + 1, cardPoints:] = before[:, :counted, :maxPenalty + 1 - cardPoints]
+                # Past a row's worth of cards the points don't count, since they're lower than the ones that would be taken
+                picked[:, counted + 1:, :] = before[:, counted:opponents, :]
+                stats[rows] = before + weight * picked
+            rows = otherMasks[:, index]
+            counts[rows, 1:] = counts[rows, 1:] + weight * counts[rows, :-1]
+        return stats, counts
+
+    @staticmethod
+    def _penalties(base, played, lastRow, rowSize, maxPenalty):
+        """The points we take for each (m opponent cards landing before us, last rowSize of them worth S), given where they land"""
+        if base[0] == "lowest":
+            # Nobody below us means we take the cheapest row. Otherwise the lowest opponent takes a row and we pile on
+            penalty = PenaltyEvaluator._penalties(("row", 0, 0), played, lastRow, rowSize, maxPenalty)
+            penalty[0, :] = base[1]
+            return penalty
+        _, length, rowPoints = base
+        cards = length + played
+        afterBreaking = (cards - rowSize - 1) % rowSize + 1
+        penalty = np.where(cards == rowSize, rowPoints + lastRow, 0)
+        penalty = np.where((cards > rowSize) & (afterBreaking == rowSize), lastRow, penalty)
+        # Only impossible combinations, which have no ways of happening, can go over the most a turn can cost
+        return np.broadcast_to(np.minimum(penalty, maxPenalty), (played.shape[0], lastRow.shape[1])).copy()
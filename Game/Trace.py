@@ -0,0 +1,109 @@
+# Trace.py
+# Records when each part of a game happens, seat by seat, for looking at a slow game on a timeline
+# Profiles say how much time went where in total, but not when. With a TraceBuffer set as a game's trace, the game records a span
+# for dealing, each turn, resolving the cards and telling everyone what happened, and each player records one for every call to
+# their AI. Spans go into arrays that are allocated up front and used as a ring, so a long run only ever keeps the latest ones,
+# and recording one is a handful of array writes.
+# write turns them into the Chrome trace format, which chrome://tracing and ui.perfetto.dev can open. Every game gets its own
+# process in the timeline, with a row for the engine and a row for each seat.
+
+import array
+import json
+import os
+import pathlib
+import time
+
+# The seat the engine's own spans are recorded against
+ENGINE = -1
+
+class TraceBuffer:
+    """Keeps the last capacity spans. A span is (game track, seat, name, start, end), with times from time.perf_counter_ns.
+    Each game played with the buffer gets a track of its own from startGame"""
+
+    def __init__(self, capacity : int = 262144):
+        self.capacity = capacity
+        self.tracks = array.array("q", bytes(8 * capacity))
+        self.seats = array.array("h", bytes(2 * capacity))
+        self.nameIds = array.array("h", bytes(2 * capacity))
+        self.starts = array.array("q", bytes(8 * capacity))
+        self.ends = array.array("q", bytes(8 * capacity))
+        # How many spans have ever been recorded. The latest is at (count - 1) % capacity
+        self.count = 0
+        self.names = []
+        self.nameIndices = dict()
+        # Track: (game label, a label for each seat)
+        self.labels = dict()
+        self.nextTrack = 0
+
+    now = staticmethod(time.perf_counter_ns)
+
+    def startGame(self, label, seatLabels) -> int:
+        """Starts a new track for a game, labelled "Game" and its track if label is None. Returns the track, to record the game's spans against"""
+        if len(self.labels) > self.capacity:
+            # Games whose spans have all been overwritten don't need their labels any more
+            kept = set(self.tracks) if self.count >= self.capacity else set(self.tracks[:self.count])
+            self.labels = {track: labels for track, labels in self.labels.items() if track in kept}
+        track = self.nextTrack
+        self.nextTrack += 1
+        self.labels[track] = (f"Game {track}" if label is None else label, list(seatLabels))
+        return track
+
+    def span(self, track : int, seat : int, name : str, start : int, end : int = None):
+        """Records a span, which ends now unless end is given"""
+        if end is None:
+            end = time.perf_counter_ns()
+        nameId = self.nameIndices.get(name)
+        if nameId is None:
+            nameId = len(self.names)
+            self.names.append(name)
+            self.nameIndices[name] = nameId
+        index = self.count % self.capacity
+        self.tracks[index] = track
+        self.seats[index] = seat
+        self.nameIds[index] = nameId
+        self.starts[index] = start
+        self.ends[index] = end
+        self.count += 1
+
+    def spans(self):
+        """Every span still in the buffer, oldest first, as (track, seat, name, start, end)"""
+        first = max(0, self.count - self.capacity)
+        for position in range(first, self.count):
+            index = position % self.capacity
+            yield (self.tracks[index], self.seats[index], self.names[self.nameIds[index]], self.starts[index], self.ends[index])
+
+    def drain(self):
+        """Hands over everything recorded so far, to merge into another process's buffer, and starts again from nothing"""
+        spans = list(self.spans())
+        used = set(span[0] for span in spans)
+        labels = {track: labels for track, labels in self.labels.items() if track in used}
+        self.count = 0
+        self.labels = dict()
+        return (os.getpid(), labels, spans)
+
+    def merge(self, drained):
+        """Adds in the spans drained from another buffer. Their games get new tracks here"""
+        process, labels, spans = drained
+        tracks = dict()
+        for track, (label, seatLabels) in labels.items():
+            tracks[track] = self.startGame(f"{label} (process {process})", seatLabels)
+        for track, seat, name, start, end in spans:
+            self.span(tracks[track], seat, name, start, end)
+
+    def write(self, path) -> pathlib.Path:
+        """Writes the spans out as a Chrome trace JSON file. Times are in microseconds from the first span"""
+        spans = list(self.spans())
+        origin = min((span[3] for span in spans), default=0)
+        events = []
+        for track in sorted(set(span[0] for span in spans)):
+            label, seatLabels = self.labels.get(track, ("Game", []))
+            events.append({"ph": "M", "name": "process_name", "pid": track, "args": {"name": label}})
+            events.append({"ph": "M", "name": "thread_name", "pid": track, "tid": 0, "args": {"name": "Engine"}})
+            for seat, seatLabel in enumerate(seatLabels):
+                events.append({"ph": "M", "name": "thread_name", "pid": track, "tid": seat + 1, "args": {"name": f"Seat {seat}: {seatLabel}"}})
+        for track, seat, name, start, end in spans:
+            events.append({"ph": "X", "name": name, "cat": "engine" if seat == ENGINE else "AI", "pid": track, "tid": seat + 1,
+                           "ts": (start - origin) / 1000, "dur": (end - start) / 1000})
+        path = pathlib.Path(path)
+        path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+        return path
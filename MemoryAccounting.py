@@ -0,0 +1,145 @@
+# MemoryAccounting.py
+# Works out how much memory each AI uses during a tournament, so a bot that keeps growing can actually be pinned down
+# It's opt in, and even then only one in every sampleEvery calls to each hook gets traced, since tracemalloc slows down
+# everything it watches. Tracing starts just before a sampled call and stops just after, so the untraced calls cost next
+# to nothing however many games are on the go. A sampled call tells us how much it allocated at its peak, and how much
+# of that it was still holding on to when it returned. One game in every sampleEvery also gets the AI state objects and
+# module globals of everyone at the table walked once it's over, to see how much they're keeping alive between calls.
+# Each process keeps its own totals, which can be drained and merged into another process's.
+
+import gc
+import sys
+import tracemalloc
+import types
+
+# Things we don't count towards an AI's retained size, since they're shared code rather than state
+SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.CodeType)
+
+def retainedSize(root) -> int:
+    """Roughly how many bytes are reachable from root, counting each object once"""
+    seen = set()
+    size = 0
+    pending = [root]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return size
+
+def moduleStateSize(module) -> int:
+    """How much the module's globals are holding on to, not counting its functions, classes and imports"""
+    return retainedSize([value for name, value in vars(module).items() if not name.startswith("__")])
+
+class MemoryAccounting:
+    """Collects memory stats per AI. Install wrapHook when attaching AIs, and call startGame and endGame around every game"""
+
+    def __init__(self, sampleEvery=100):
+        self.sampleEvery = max(1, sampleEvery)
+        self.gamesStarted = 0
+        self.stats = dict()
+        # (AI name, hook name): (hook, measured hook), so every player with the same AI gets the very same function.
+        # The BatchRunner groups batch hooks by which function they are
+        self.measuredHooks = dict()
+
+    def getStats(self, aiName):
+        if not aiName in self.stats:
+            self.stats[aiName] = {
+                "calls": 0,
+                # Bytes each sampled call still held when it returned, added up
+                "kept": 0,
+                # The most any single call had allocated at once
+                "callPeak": 0,
+                # Retained size of the AI state after a table's first game, and after later games, as (total, count)
+                "firstState": [0, 0],
+                "laterState": [0, 0],
+                "statePeak": 0,
+                "modulePeak": 0,
+            }
+        return self.stats[aiName]
+
+    def wrapHook(self, aiName, hookName, hook):
+        """Returns a version of the hook that traces one call in every sampleEvery"""
+        known = self.measuredHooks.get((aiName, hookName))
+        if not known is None and known[0] is hook:
+            return known[1]
+        # Calls so far, in a list so the closure can count them. The first call is always sampled
+        callCount = [0]
+        def measuredHook(*args):
+            isSampled = callCount[0] % self.sampleEvery == 0
+            callCount[0] += 1
+            if not isSampled:
+                return hook(*args)
+            wasTracing = tracemalloc.is_tracing()
+            if wasTracing:
+                # Somebody else is tracing too, so work from where they're at
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            else:
+                # Only the innermost frame, which is all we need for totals and keeps tracing as cheap as it gets
+                before = 0
+                tracemalloc.start(1)
+            try:
+                result = hook(*args)
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                if not wasTracing:
+                    tracemalloc.stop()
+            stats = self.getStats(aiName)
+            stats["calls"] += 1
+            stats["kept"] += current - before
+            stats["callPeak"] = max(stats["callPeak"], peak - before)
+            return result
+        self.measuredHooks[(aiName, hookName)] = (hook, measuredHook)
+        return measuredHook
+
+    def startGame(self) -> bool:
+        """Decides whether the AI states get measured once the next game is over. Pass the answer on to endGame"""
+        isSampled = self.gamesStarted % self.sampleEvery == 0
+        self.gamesStarted += 1
+        return isSampled
+
+    def endGame(self, isSampled, seats, isFirstGame):
+        """seats is a list of (AI name, player, AI module) for the table that just finished"""
+        if not isSampled:
+            return
+        for aiName, player, module in seats:
+            stats = self.getStats(aiName)
+            stateSize = retainedSize(player.aiState) if not player.aiState is None else 0
+            total = stats["firstState"] if isFirstGame else stats["laterState"]
+            total[0] += stateSize
+            total[1] += 1
+            stats["statePeak"] = max(stats["statePeak"], stateSize)
+            stats["modulePeak"] = max(stats["modulePeak"], moduleStateSize(module))
+
+    def drain(self):
+        """Hands over everything collected so far, and starts again from nothing"""
+        stats = self.stats
+        self.stats = dict()
+        return stats
+
+    def merge(self, otherStats):
+        """Adds in the stats drained from another MemoryAccounting"""
+        for aiName, other in otherStats.items():
+            stats = self.getStats(aiName)
+            stats["calls"] += other["calls"]
+            stats["kept"] += other["kept"]
+            for key in ("firstState", "laterState"):
+                stats[key][0] += other[key][0]
+                stats[key][1] += other[key][1]
+            for key in ("callPeak", "statePeak", "modulePeak"):
+                stats[key] = max(stats[key], other[key])
+
+    def report(self):
+        """Returns a list of (AI name, sampled hook calls, average bytes kept per call, peak bytes in one call,
+        average state size after the first game, steady state size after later games, peak state size, peak module globals size)"""
+        rows = []
+        for aiName, stats in sorted(self.stats.items()):
+            keptPerCall = stats["kept"] / stats["calls"] if stats["calls"] > 0 else 0
+            firstState = stats["firstState"][0] / stats["firstState"][1] if stats["firstState"][1] > 0 else 0
+            # Until a table has played a second traced game, the first game is the best idea we have of the steady state
+            laterState = stats["laterState"][0] / stats["laterState"][1] if stats["laterState"][1] > 0 else firstState
+            rows.append((aiName, stats["calls"], keptPerCall, stats["callPeak"], firstState, laterState, stats["statePeak"], stats["modulePeak"]))
+        return rows
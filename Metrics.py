@@ -0,0 +1,191 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# Metrics.py
+# Live throughput and progress numbers for long tournaments, for watching overnight runs that nobody's sitting in front of
+# The tournament only touches the counters once per finished game, never per decision, so the games themselves don't slow down.
+# The counters live in shared memory, with a row of them for each process. Only one process ever writes to a row,
+# so nothing needs locking, and whoever's reading just adds the rows up.
+# MetricsExporter reads them every so often in a background thread, and publishes them in the Prometheus text format,
+# both as a file that gets rewritten in place and on a small local HTTP endpoint.
+
+import http.server
+import multiprocessing
+import os
+import pathlib
+import threading
+import time
+
+from Game.Game import Game
+
+class Metrics:
+    """Tournament counters in shared memory. The process that makes it writes to row 0, and every worker process
+    that attaches claims a row of its own. Only the process that made it should set the planned number of games"""
+
+    # The columns of each row. The game count comes first, then these for each AI
+    AI_COLUMNS = ("games", "wins", "score", "decisions")
+
+    def __init__(self, aiNames, rows, _counters=None, _nextRow=None):
+        self.aiNames = list(aiNames)
+        self.aiIndices = {name: i for i, name in enumerate(self.aiNames)}
+        self.rowWidth = 1 + len(Metrics.AI_COLUMNS) * len(self.aiNames)
+        self.rows = rows
+        isOwner = _counters is None
+        self.counters = multiprocessing.RawArray("q", rows * self.rowWidth) if isOwner else _counters
+        # The next row for a worker process to claim
+        self.nextRow = multiprocessing.Value("i", 1) if isOwner else _nextRow
+        self.row = 0
+        self.plannedGames = 0
+        self.startTime = time.monotonic()
+
+    def getHandle(self):
+        """Everything a worker process needs to attach to these counters. Pass it in when starting the process"""
+        return (self.aiNames, self.rows, self.counters, self.nextRow)
+
+    @staticmethod
+    def attach(handle) -> Metrics:
+        aiNames, rows, counters, nextRow = handle
+        metrics = Metrics(aiNames, rows, counters, nextRow)
+        with nextRow.get_lock():
+            metrics.row = nextRow.value
+            nextRow.value += 1
+        if metrics.row >= rows:
+            raise ValueError("Ran out of rows for worker processes")
+        return metrics
+
+    def releaseWorkerRows(self):
+        """Lets the next lot of worker processes claim rows from the start again. Only call it once the last lot have all stopped.
+        Their counts stay where they are, and the new workers carry on adding to them"""
+        with self.nextRow.get_lock():
+            self.nextRow.value = 1
+
+    def addPlannedGames(self, games):
+        self.plannedGames += games
+
+    def recordGame(self, aiNames, scoreList, decisions):
+        """Counts a finished game. aiNames and decisions are per seat, and scoreList is the game's final score list"""
+        base = self.row * self.rowWidth
+        counters = self.counters
+        counters[base] += 1
+        scores = [score for _, score in scoreList]
+        winner = scores.index(min(scores))
+        for seat, aiName in enumerate(aiNames):
+            if not aiName in self.aiIndices:
+                # Like a sweep's variants, which are made after the counters are. They still count towards the games
+                continue
+            column = base + 1 + len(Metrics.AI_COLUMNS) * self.aiIndices[aiName]
+            counters[column] += 1
+            if seat == winner:
+                counters[column + 1] += 1
+            counters[column + 2] += scores[seat]
+            counters[column + 3] += decisions[seat]
+
+    def read(self):
+        """Adds up every process's row. Returns (games finished, {AI name: [games, wins, total score, decisions]})"""
+        values = self.counters[:]
+        totals = [sum(values[row * self.rowWidth + column] for row in range(self.rows)) for column in range(self.rowWidth)]
+        perAI = dict()
+        for i, name in enumerate(self.aiNames):
+            start = 1 + len(Metrics.AI_COLUMNS) * i
+            perAI[name] = totals[start:start + len(Metrics.AI_COLUMNS)]
+        return totals[0], perAI
+
+def countDecisions(game : Game):
+    """How many decisions each seat made in a finished game"""
+    return [game.turnsPlayed + rowsChosen for rowsChosen in game.rowsChosen]
+
+class MetricsExporter:
+    """Publishes a Metrics every interval seconds, to a Prometheus text file and/or an HTTP endpoint on localhost.
+    Either can be left as None. Call stop at the end to publish one last time and shut the endpoint down"""
+
+    def __init__(self, metrics : Metrics, path=None, port=None, interval=10.0):
+        self.metrics = metrics
+        self.path = None if path is None else pathlib.Path(path)
+        self.interval = interval
+        self.text = ""
+        # The last reading, as (time, games, decisions per AI), for working out the recent rates
+        self.lastReading = None
+        self.stopping = threading.Event()
+        self.server = None
+        if not port is None:
+            exporter = self
+            class Handler(http.server.BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = exporter.text.encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    # Scrapes every few seconds would drown out the tournament's own output
+                    pass
+            self.server = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.publish()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            self.publish()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+        self.publish()
+        if not self.server is None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def publish(self):
+        self.text = self.render()
+        if not self.path is None:
+            # Write it alongside and swap it in, so nobody ever reads half a file
+            temporaryPath = self.path.with_name(self.path.name + ".tmp")
+            temporaryPath.write_text(self.text)
+            os.replace(temporaryPath, self.path)
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text format"""
+        metrics = self.metrics
+        now = time.monotonic()
+        games, perAI = metrics.read()
+        decisions = {name: counts[3] for name, counts in perAI.items()}
+        elapsed = now - metrics.startTime
+        if self.lastReading is None or now <= self.lastReading[0]:
+            since, lastGames, lastDecisions = metrics.startTime, 0, {name: 0 for name in decisions}
+        else:
+            since, lastGames, lastDecisions = self.lastReading
+        self.lastReading = (now, games, decisions)
+        seconds = max(now - since, 1e-9)
+
+        lines = []
+        def add(name, kind, description, values):
+            lines.append(f"# HELP take5_{name} {description}")
+            lines.append(f"# TYPE take5_{name} {kind}")
+            for labels, value in values:
+                lines.append(f"take5_{name}{labels} {value}")
+
+        add("games_finished_total", "counter", "Games finished so far", [("", games)])
+        add("games_planned", "gauge", "Games the run is expected to play in total", [("", metrics.plannedGames)])
+        add("games_per_second", "gauge", "Games finished per second since the last update", [("", f"{(games - lastGames) / seconds:.3f}")])
+        add("elapsed_seconds", "gauge", "Seconds since the run started", [("", f"{elapsed:.1f}")])
+        if games > 0 and metrics.plannedGames >= games:
+            # The average over the whole run is steadier than the recent rate
+            add("eta_seconds", "gauge", "Estimated seconds until the run finishes", [("", f"{(metrics.plannedGames - games) * elapsed / games:.1f}")])
+
+        played = [(name, counts) for name, counts in perAI.items() if counts[0] > 0]
+        label = lambda name: '{ai="' + name + '"}'
+        add("decisions_total", "counter", "Decisions each AI has made", [(label(name), counts[3]) for name, counts in played])
+        add("decisions_per_second", "gauge", "Decisions each AI made per second since the last update",
+            [(label(name), f"{(counts[3] - lastDecisions.get(name, 0)) / seconds:.3f}") for name, counts in played])
+        add("ai_games_total", "counter", "Games each AI has played", [(label(name), counts[0]) for name, counts in played])
+        add("ai_wins_total", "counter", "Games each AI has won", [(label(name), counts[1]) for name, counts in played])
+        add("ai_win_rate", "gauge", "Fraction of its games each AI has won", [(label(name), f"{counts[1] / counts[0]:.4f}") for name, counts in played])
+        add("ai_average_score", "gauge", "Each AI's average score per game, lower is better", [(label(name), f"{counts[2] / counts[0]:.3f}") for name, counts in played])
+        leaderboard = sorted(played, key=lambda entry: entry[1][1] / entry[1][0], reverse=True)
+        add("ai_rank", "gauge", "Each AI's place on the leaderboard by win rate, starting from 1",
+            [(label(name), rank + 1) for rank, (name, _) in enumerate(leaderboard)])
+        return "\n".join(lines) + "\n"
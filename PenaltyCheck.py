@@ -0,0 +1,117 @@
+# PenaltyCheck.py
+# Checks Game/PenaltyEvaluator.py against the game engine, by brute force
+# The evaluator counts its way to the penalty distribution without ever playing a turn out, so it's easy for it to be subtly wrong
+# (a row that breaks twice in one turn, say, or a variant with longer rows). This makes up small positions, where only a dozen or
+# so cards are unseen, plays out every set of cards the opponents could play with the engine's own placeCard, and compares the
+# average points our card took with what the evaluator expected. Every position is made from a seed, so a broken one can be made
+# again. It checks the real game's rules and a couple of variants. Run it after touching the evaluator:
+#   python PenaltyCheck.py [--positions N] [--seed S]
+
+import argparse
+import itertools
+import random
+import sys
+
+from Game.Game import Game, Rules
+from Game.CardMask import CardMask
+from Game.BoardAnalysis import BoardAnalysis
+from Game.PenaltyEvaluator import PenaltyEvaluator
+
+# Short rows break more than once in a turn, and long rows on a big deck can cost more than any row in the real game
+CHECKED_RULES = (
+    Rules(),
+    Rules(rowSize=3),
+    Rules(numCards=250, numRows=8, rowSize=7),
+)
+
+class PenaltyPosition:
+    """A made up turn with only a few unseen cards, so every set of them the opponents could play can be tried"""
+
+    def __init__(self, seed, rules, unseenCount=12, handSize=3):
+        rng = random.Random(seed)
+        self.seed = seed
+        self.rules = rules
+        # Deal from a window of the deck, so the cards are close enough together to pile onto the same rows
+        window = rules.numRows * rules.rowSize + handSize + unseenCount
+        low = rng.randint(1, rules.numCards - window + 1)
+        deck = list(range(low, low + window))
+        rng.shuffle(deck)
+        self.rows = []
+        for _ in range(rules.numRows):
+            length = rng.randint(1, rules.rowSize)
+            self.rows.append(sorted(deck[:length]))
+            deck = deck[length:]
+        self.hand = sorted(deck[:handSize])
+        unseen = deck[handSize:handSize + unseenCount]
+        self.seenMask = CardMask.full(rules.numCards) & ~CardMask.fromCards(unseen)
+        self.playerCount = rng.randint(2, min(8, len(unseen) + 1))
+        self.board = BoardAnalysis.fromRows(self.rows, self.seenMask, rules)
+
+    def describe(self):
+        return f"seed {self.seed}, {self.playerCount} players, rows {self.rows}, hand {self.hand}"
+
+def playOut(game, rows, cards, ourCard, takenRow):
+    """The points ourCard takes when cards are played onto rows, going by the game's engine. takenRow is the row whoever plays under every row takes"""
+    game.rows = [list(row) for row in rows]
+    game.indexTails()
+    cards = sorted(cards)
+    taken = 0
+    if cards[0] < game.tails[0]:
+        # The same as the start of the engine's turn, when the lowest card is under every row
+        if cards[0] == ourCard:
+            taken += Game.getTotalPoints(game.rows[takenRow])
+        game.moveTail(game.rows[takenRow][-1], cards[0])
+        game.rows[takenRow] = [cards[0]]
+        cards = cards[1:]
+    for card in cards:
+        result = game.placeCard(card)
+        if not result is None:
+            oldRow = game.rows[result][:game.ROW_SIZE]
+            game.rows[result] = game.rows[result][game.ROW_SIZE:]
+            if card == ourCard:
+                taken += Game.getTotalPoints(oldRow)
+    return taken
+
+def bruteForce(position):
+    """The expected points for each card in the hand, averaged over every set of unseen cards the opponents could play"""
+    unseen = CardMask.toCards(CardMask.full(position.rules.numCards) & ~position.seenMask)
+    takenRow = position.board.penalties.index(min(position.board.penalties))
+    game = Game(2, rules=position.rules)
+    totals = [0] * len(position.hand)
+    sets = 0
+    for played in itertools.combinations(unseen, position.playerCount - 1):
+        sets += 1
+        for i, card in enumerate(position.hand):
+            totals[i] += playOut(game, position.rows, list(played) + [card], card, takenRow)
+    return [total / sets for total in totals]
+
+def checkRules(evaluator, rules, count, seed):
+    """Returns (positions checked, mismatches), where a mismatch is (position, brute force answer, evaluator answer)"""
+    mismatches = []
+    for index in range(count):
+        position = PenaltyPosition(seed + index, rules)
+        expected = bruteForce(position)
+        evaluated = evaluator.expectedPenalties(position.hand, position.board, position.playerCount, position.seenMask).tolist()
+        if any(abs(want - got) > 1e-9 for want, got in zip(expected, evaluated)):
+            mismatches.append((position, expected, evaluated))
+    return count, mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the penalty evaluator against every play the opponents could make, under the real rules and some variants")
+    parser.add_argument("--positions", help="set the number of positions checked for each set of rules", type=int, default=100)
+    parser.add_argument("--seed", help="set the seed of the first position", type=int, default=0)
+    args = parser.parse_args()
+
+    evaluator = PenaltyEvaluator()
+    isBroken = False
+    for rules in CHECKED_RULES:
+        count, mismatches = checkRules(evaluator, rules, args.positions, args.seed)
+        print(f"{rules.numCards} cards, {rules.numRows} rows of {rules.rowSize}: {count - len(mismatches)} of {count} positions match")
+        for position, expected, evaluated in mismatches[:10]:
+            print(f"\texpected {[round(value, 4) for value in expected]}, evaluated {[round(value, 4) for value in evaluated]}\t{position.describe()}")
+        if len(mismatches) > 0:
+            isBroken = True
+    sys.exit(1 if isBroken else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# Profiling.py
+# Profiles tournaments, including every worker process, so a slow run can be tracked down without wrapping things by hand
+# There are two ways of doing it. By default each process runs cProfile, which sees every call but slows things down.
+# Given an interval, a background thread instead takes a snapshot of the main thread's stack that often, which costs
+# next to nothing, and gives whole stacks that can be turned into a flame graph.
+# Each process keeps its own profile, which can be drained and merged into another process's, so the parent ends up with everything.
+
+import collections
+import cProfile
+import pathlib
+import pstats
+import sys
+import threading
+
+# Where the time goes, for the summary. AIs get one group each
+GROUP_ENGINE = "engine"
+GROUP_COPYING = "copying"
+GROUP_LOGGING = "logging"
+# The parent process sits here while worker processes do the playing
+GROUP_WAITING = "waiting"
+GROUP_OTHER = "other"
+
+def groupFunction(filename, functionName):
+    """Works out which group a function's time belongs to, from where it was defined"""
+    path = pathlib.PurePath(filename)
+    if path.parent.name == "AIs":
+        return "AI " + path.stem
+    if path.name == "copy.py" or (filename == "~" and "copy" in functionName):
+        # The game copies everything it hands to an AI, so that can add up
+        return GROUP_COPYING
+    if path.name == "Game.py" and ("Log" in functionName or "format" in functionName.lower()):
+        return GROUP_LOGGING
+    if path.parent.name == "logging":
+        return GROUP_LOGGING
+    if path.name in ("threading.py", "pool.py", "queues.py", "connection.py") or (filename == "~" and "acquire" in functionName):
+        return GROUP_WAITING
+    if path.parent.name == "Game":
+        return GROUP_ENGINE
+    return GROUP_OTHER
+
+class _RawStats:
+    """Lets pstats load a stats dictionary, like one drained from another process"""
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+class Profiler:
+    """With interval None, profiles with cProfile. Otherwise samples the main thread's stack every interval seconds.
+    Call start once, drain whenever the profile so far should be handed over, and stop at the end"""
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.isSampling = not interval is None
+        # What's been merged in from drains, here or in other processes
+        self.combined = pstats.Stats()
+        self.stacks = collections.Counter()
+        self.profile = None
+        self.sampler = None
+        self.isPaused = False
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.isSampling:
+            self.stopping.clear()
+            self.sampler = threading.Thread(target=self._sample, args=(threading.main_thread().ident,), daemon=True)
+            self.sampler.start()
+        else:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stop(self):
+        """Stops profiling, and keeps what was collected so far"""
+        if self.isSampling:
+            if not self.sampler is None:
+                self.stopping.set()
+                self.sampler.join()
+                self.sampler = None
+        elif not self.profile is None:
+            self.profile.disable()
+            self.merge(self._takeProfile())
+
+    def pause(self):
+        """Stops counting for a while, without handing anything over, until resume is called.
+        The parent pauses while it only waits on worker processes, or it'd fork them with the profiler running"""
+        if self.isPaused:
+            return
+        self.isPaused = True
+        if not self.profile is None:
+            self.profile.disable()
+
+    def resume(self):
+        if not self.isPaused:
+            return
+        self.isPaused = False
+        if not self.profile is None:
+            self.profile.enable()
+
+    def abandon(self):
+        """Stops profiling and throws away everything collected. For a worker process, which gets a copy of its parent's profiler when it's forked"""
+        if not self.profile is None:
+            self.profile.disable()
+            self.profile = None
+        # The sampling thread isn't copied into a forked process, so there's nothing to stop
+        self.sampler = None
+        self.combined = pstats.Stats()
+        self.stacks = collections.Counter()
+
+    def _sample(self, threadId):
+        while not self.stopping.wait(self.interval):
+            if self.isPaused:
+                continue
+            frame = sys._current_frames().get(threadId)
+            stack = []
+            while not frame is None:
+                code = frame.f_code
+                # (what to call it, the file it's from, the function's name)
+                label = code.co_name + " (" + pathlib.PurePath(code.co_filename).name + ":" + str(code.co_firstlineno) + ")"
+                stack.append((label, code.co_filename, code.co_name))
+                frame = frame.f_back
+            if len(stack) > 0:
+                with self.lock:
+                    self.stacks[tuple(reversed(stack))] += 1
+
+    def _takeProfile(self):
+        stats = pstats.Stats(self.profile).stats
+        self.profile = None
+        return stats
+
+    def drain(self):
+        """Hands over everything collected so far, and carries on profiling from nothing"""
+        if self.isSampling:
+            with self.lock:
+                stacks = self.stacks
+                self.stacks = collections.Counter()
+            return stacks
+        stats = self.combined
+        self.combined = pstats.Stats()
+        if not self.profile is None:
+            self.profile.disable()
+            stats.add(_RawStats(self._takeProfile()))
+            self.profile = cProfile.Profile()
+            if not self.isPaused:
+                self.profile.enable()
+        return stats.stats
+
+    def merge(self, drained):
+        """Adds in a profile drained from another Profiler with the same settings"""
+        if self.isSampling:
+            with self.lock:
+                self.stacks.update(drained)
+        elif len(drained) > 0:
+            self.combined.add(_RawStats(drained))
+
+    def write(self, path) -> list:
+        """Writes the profile out. cProfile profiles go to path as a pstats file, which snakeviz and friends can open.
+        Samples go to path as collapsed stacks, one line per stack, ready for flamegraph.pl or speedscope.
+        Returns the list of files written"""
+        path = pathlib.Path(path)
+        if self.isSampling:
+            with path.open("w") as output:
+                for stack, count in self.stacks.most_common():
+                    output.write(";".join(frame[0] for frame in stack) + " " + str(count) + "\n")
+        else:
+            self.combined.dump_stats(str(path))
+        return [path]
+
+    def summarize(self, top=15):
+        """Returns (the time in each group, the top functions) where the times are in seconds, or in samples when sampling.
+        The groups are a list of (group, own time) from the biggest down, and every bit of time is in exactly one group.
+        The top functions are a list of (group, function, own time, time including everything it called)"""
+        groups = collections.Counter()
+        functions = []
+        if self.isSampling:
+            ownSamples = collections.Counter()
+            allSamples = collections.Counter()
+            for stack, count in self.stacks.items():
+                ownSamples[stack[-1]] += count
+                for frame in set(stack):
+                    allSamples[frame] += count
+            for frame, count in allSamples.items():
+                label, filename, functionName = frame
+                functions.append((groupFunction(filename, functionName), label, ownSamples[frame], count))
+        else:
+            for (filename, line, functionName), (_, _, ownTime, totalTime, _) in self.combined.stats.items():
+                label = functionName + " (" + pathlib.PurePath(filename).name + ":" + str(line) + ")"
+                functions.append((groupFunction(filename, functionName), label, ownTime, totalTime))
+        for group, _, ownTime, _ in functions:
+            groups[group] += ownTime
+        functions.sort(key=lambda function: function[2], reverse=True)
+        return groups.most_common(), functions[:top]
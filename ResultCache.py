@@ -0,0 +1,70 @@
+# ResultCache.py
+# Remembers the results of seeded tournament games between runs, so a round robin only has to play the lineups that changed
+# Each lineup's results are keyed by a hash of every seated AI's source (in seat order), the seeds that were played, and the game
+# engine's source. Editing an AI changes its hash, so only the lineups it sits in get played again, and editing the engine
+# changes every key, so nothing stale ever gets reused. Old entries are simply never looked up again.
+
+import hashlib
+import json
+import os
+import pathlib
+
+# The engine files whose changes invalidate every result. Game.py runs the game, and the other two decide what AIs get told
+ENGINE_FILES = ("Game.py", "BoardAnalysis.py", "CardMask.py")
+
+def engineHash(path=pathlib.Path(__file__).parent / "Game"):
+    """A hash of the game engine's source"""
+    digest = hashlib.sha1()
+    for name in ENGINE_FILES:
+        digest.update((path / name).read_bytes())
+    return digest.hexdigest()
+
+class ResultCache:
+    """A JSON file of results, kept in memory while a tournament runs. Call save to write out what's been added"""
+
+    VERSION = 1
+
+    def __init__(self, path, engine=None):
+        self.path = pathlib.Path(path)
+        self.engine = engineHash() if engine is None else engine
+        self.hits = 0
+        self.misses = 0
+        self.isChanged = False
+        try:
+            contents = json.loads(self.path.read_text())
+            if contents.get("version") != ResultCache.VERSION:
+                contents = {}
+        except (OSError, ValueError):
+            contents = {}
+        self.entries = contents.get("entries", {})
+
+    def makeKey(self, ais, firstSeed, numberOfGames):
+        """The key for a lineup's results. ais are the wrappers of the AIs in each seat"""
+        sources = [ai.getSourceHash() for ai in ais]
+        return hashlib.sha1(json.dumps([self.engine, sources, firstSeed, numberOfGames]).encode()).hexdigest()
+
+    def get(self, key):
+        """The cached results for the key, or None. Results are a list per game of each seat's score"""
+        results = self.entries.get(key)
+        if results is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return results
+
+    def put(self, key, results):
+        self.entries[key] = results
+        self.isChanged = True
+
+    def save(self):
+        if not self.isChanged:
+            return
+        # Write it alongside and swap it in, so an interrupted run can't leave half a cache behind
+        temporaryPath = self.path.with_name(self.path.name + ".tmp")
+        try:
+            temporaryPath.write_text(json.dumps({"version": ResultCache.VERSION, "entries": self.entries}))
+            os.replace(temporaryPath, self.path)
+            self.isChanged = False
+        except OSError:
+            # Not being able to cache is no reason to stop
+            pass
@@ -2,21 +2,17 @@
 # A quick text based interface for my Take 5 game module
 # By Thomas Albertine
 
-from Game.Game import Game
-from Game.Game import Player
 import utils
 import traceback
 
 import sys
-import random
-import pathlib
-import itertools
+import time
 import copy
+import random
 import math
 
 import argparse
-import AIs
-from AIModuleWrapper import AiModuleWrapper
+import Tournament
 
 def printRanking(results, title, isAscending, isPercentage=False):
     results = copy.copy(results)
@@ -28,57 +24,116 @@ def printRanking(results, title, isAscending, isPercentage=False):
             score += "%"
         print("\n\t" + score + "\t" + str(name))
 
-def normalize(data, toPercentages=False):
-    result = []
-    percentageMultiplier = 1
-    if toPercentages:
-        percentageMultiplier = 100
-    for k,v in data.items():
-        result.append((k, percentageMultiplier * float(v[0]) / v[1]))
-    return result
-
-path = pathlib.Path("AIs")
-ais = {}
-for aiModule in filter(lambda x: x.stem != "__init__", path.glob("*.py")):
-    # Try to treat everything in the AIs folder as something that could 
-    #   potentially be an AI module, except the __init__ of course
-    # Yeah, executing strange code outside a sandbox is a massive security 
-    #   hole, but it's a toy project, so I'm not going to worry about it
-    tmp_module = AiModuleWrapper(aiModule)
-    ais[tmp_module.getName()] = tmp_module
-
-parser = argparse.ArgumentParser()      
-parser.add_argument("-v", "--verbose", help="enables additional print statements", action="store_true")      
-
-group = parser.add_mutually_exclusive_group()
-
-group.add_argument("--interactive", help="interactively build/play one table of Take5",
-                    action="store_true")
-group.add_argument("--autobattle-AI", help="chooses the AI to automatically battle against the other AIs", choices=[i for i in ais.keys() if i != "userInput"])
-group.add_argument("--round-robin", help="Make all AIs play against each other with varying numbers of players. Use -r to specify how many games each combination should play.", action="store_true")
-parser.add_argument("-n", "--autobattle-NumberOfTables", help="set the number of tables (random-unique configurations of AIs) for the autobattle", type=int, default=50)
-parser.add_argument("-r", "--autobattle-Rounds", help="set the number of rounds each table will play", type=int, default=100)
-parser.add_argument("-mp", "--autobattle-MaxPlayers", help="set the maximum number of players at each table", type=int, default=10)
-parser.add_argument("-np", "--autobattle-MinPlayers", help="set the minimum number of players at each table", type=int, default=2)
-args = parser.parse_args()
-
-assert args.autobattle_AI in [None, *ais.keys()]
-
-# See if TQDM is installed.
-try:
-    from tqdm.auto import trange
-    from tqdm.auto import tqdm
-    TQDM_FOUND = True
-except:
-    print("TQDM is not installed. Run `pip install tqdm` for a fancy progress bar. Continuing...")
-    TQDM_FOUND = False
-
-# Returns an iterator that, if TQDM is installed, will also spawn a progress bar.
-def crange(leng):
-    if TQDM_FOUND:
-        return trange(leng, unit=" tables")
+def formatBytes(size):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+def printMemoryReport(title):
+    print(title)
+    print("\n\tcalls\tkept/call\tpeak/call\tstate after 1st game\tsteady state\tpeak state\tmodule globals\tAI")
+    for name, calls, keptPerCall, callPeak, firstState, laterState, statePeak, modulePeak in Tournament.takeMemoryReport():
+        sizes = "\t".join(formatBytes(size) for size in (keptPerCall, callPeak, firstState, laterState, statePeak, modulePeak))
+        print(f"\n\t{calls}\t{sizes}\t{name}")
+
+def formatDuration(seconds):
+    for unit in ("s", "ms"):
+        if seconds >= 1 or unit == "ms" and seconds >= 0.001:
+            return f"{seconds:.1f} {unit}" if unit == "s" else f"{seconds * 1000:.2f} {unit}"
+    return f"{seconds * 1e6:.1f} us"
+
+def parseDuration(text):
+    """Reads a length of time like 90, 90s, 15m or 2h, as seconds"""
+    units = {"s": 1, "m": 60, "h": 3600}
+    multiplier = units.get(text[-1:].lower())
+    try:
+        seconds = float(text if multiplier is None else text[:-1]) * (1 if multiplier is None else multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text} isn't a length of time. Try something like 90, 15m or 2h")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError("The time has to be more than 0")
+    return seconds
+
+def printProfile(profiler, path):
+    groups, functions = profiler.summarize()
+    if profiler.isSampling:
+        unit = "samples"
+        formatTime = str
     else:
-        return range(leng)
+        unit = "seconds"
+        formatTime = lambda seconds: f"{seconds:.2f}"
+    total = sum(seconds for _, seconds in groups)
+    print("\nProfile (" + unit + " spent in each)")
+    for group, seconds in groups:
+        print(f"\n\t{formatTime(seconds)}\t{100 * seconds / max(total, 1e-9):.1f}%\t{group}")
+    print("\nTop functions (own " + unit + ", " + unit + " including calls)")
+    for group, function, ownTime, totalTime in functions:
+        print(f"\n\t{formatTime(ownTime)}\t{formatTime(totalTime)}\t{group}\t{function}")
+    for written in profiler.write(path):
+        print("\nWrote " + str(written))
+
+def parseArgs(ais):
+    parser = argparse.ArgumentParser()      
+    parser.add_argument("-v", "--verbose", help="enables additional print statements", action="store_true")      
+
+    group = parser.add_mutually_exclusive_group()
+
+    group.add_argument("--interactive", help="interactively build/play one table of Take5",
+                        action="store_true")
+    group.add_argument("--autobattle-AI", help="chooses the AI to automatically battle against the other AIs", choices=Tournament.getAutomaticAINames(ais))
+    group.add_argument("--round-robin", help="Make all AIs play against each other with varying numbers of players. Use -r to specify how many games each combination should play.", action="store_true")
+    group.add_argument("--duplicate", help="compare the given AIs on duplicate deals: every deal is replayed with the lineup rotated through every seat. Use -r to set the number of deals", nargs="+", choices=Tournament.getAutomaticAINames(ais), metavar="AI")
+    group.add_argument("--rounds", help="screen AIs on single rounds instead of whole games, which is much quicker: every deal is one round, replayed with the lineup rotated through every seat. Use -r to set the number of deals, and --calibrate to check rounds against whole games", nargs="+", choices=Tournament.getAutomaticAINames(ais), metavar="AI")
+    group.add_argument("--sweep", help="tune an AI's PARAMETERS, by playing variants of it on the same seeded deals and dropping the clear losers as it goes. Use --param to say what to try, and -r to set the most deals any variant plays", choices=Tournament.getAutomaticAINames(ais), metavar="AI")
+    group.add_argument("--benchmark", help="time the given AIs' (or every AI's) decisions on made up positions, and report any that crash or answer illegally. Use --positions and --difficulty to set them up", nargs="*", choices=Tournament.getAutomaticAINames(ais), metavar="AI")
+    group.add_argument("--scaling", help="time the game engine on bigger and bigger rule variants (more cards, rows and players), to check its cost per turn grows no faster than the game does, and time BestBot, ThomasBot and DemocracyBot playing them. Use -r to set the games played on each", action="store_true")
+    group.add_argument("--list-AIs", help="list the available AI modules and the hooks they implement, without loading any of them", action="store_true")
+    parser.add_argument("-n", "--autobattle-NumberOfTables", help="set the number of tables (random-unique configurations of AIs) for the autobattle", type=int, default=50)
+    parser.add_argument("-r", "--autobattle-Rounds", help="set the number of rounds each table will play", type=int, default=100)
+    parser.add_argument("-mp", "--autobattle-MaxPlayers", help="set the maximum number of players at each table", type=int, default=10)
+    parser.add_argument("-np", "--autobattle-MinPlayers", help="set the minimum number of players at each table", type=int, default=2)
+    parser.add_argument("--seed", help="set the seed for the first deal of a round robin, duplicate or sweep, so runs can be repeated", type=int, default=None)
+    parser.add_argument("--cache", help="keep round robin results in PATH (take5cache.json by default), and only play the lineups whose AIs have changed since. Deals are seeded from 0 unless --seed says otherwise", nargs="?", const="take5cache.json", default=None, metavar="PATH")
+    parser.add_argument("--time-budget", help="have --round-robin pick how many games every lineup plays at each table size, to finish in about DURATION (like 90, 15m or 2h), going by how long each AI takes. -r is ignored, and it can't be used with --cache", type=parseDuration, default=None, metavar="DURATION")
+    parser.add_argument("--costs", help="remember how long each AI takes per game in PATH (take5costs.json by default), so -j and --time-budget can share out the work well from the start of the next run", nargs="?", const="take5costs.json", default=None, metavar="PATH")
+    parser.add_argument("--positions", help="set how many positions --benchmark makes", type=int, default=1000, metavar="N")
+    parser.add_argument("--difficulty", help="set how hard the --benchmark positions are, from 0 (empty rows, early in the game) to 1 (full rows, low hands, close to the end)", type=float, default=0.5)
+    parser.add_argument("--calibrate", help="have --rounds also play N whole game deals, and report how well the rounds predicted the whole games' win rates, and how much quicker they got there", type=int, default=None, metavar="N")
+    parser.add_argument("--param", help="a parameter for --sweep to try, as name=a,b,c for a list of values or name=low:high for a range. Can be given more than once", action="append", default=[], metavar="NAME=VALUES")
+    parser.add_argument("--samples", help="have --sweep try this many random configs, instead of every combination", type=int, default=None, metavar="N")
+    parser.add_argument("--opponents", help="the AIs the --sweep variants play against (three of the AI itself, at its usual settings, by default)", nargs="+", choices=Tournament.getAutomaticAINames(ais), default=None, metavar="AI")
+    parser.add_argument("--memory", help="keep track of how much memory each AI uses, tracing one in every N calls to each AI hook (100 by default)", type=int, nargs="?", const=100, default=None, metavar="N")
+    parser.add_argument("--profile", help="profile every process the run uses, and write the combined profile to PATH (take5.prof by default)", nargs="?", const="take5.prof", default=None, metavar="PATH")
+    parser.add_argument("--profile-interval", help="instead of cProfile, sample the stack every this many milliseconds, and write collapsed stacks for a flame graph", type=float, default=None, metavar="MS")
+    parser.add_argument("--export", help="write every decision made in the tournament games to .npz shards in DIR, as training data. See DatasetExport.py for the columns. Needs numpy", default=None, metavar="DIR")
+    parser.add_argument("--trace", help="record a timeline of every game (the last 262144 spans of them in each process) and write it to PATH (take5trace.json by default), for chrome://tracing or ui.perfetto.dev", nargs="?", const="take5trace.json", default=None, metavar="PATH")
+    parser.add_argument("--metrics-file", help="keep a Prometheus text file of the run's progress, throughput and leaderboard up to date at PATH", default=None, metavar="PATH")
+    parser.add_argument("--metrics-port", help="serve the same metrics over HTTP on localhost:PORT, for Prometheus to scrape", type=int, default=None, metavar="PORT")
+    parser.add_argument("--metrics-interval", help="set how many seconds apart the metrics are updated", type=float, default=10.0)
+    parser.add_argument("-j", "--jobs", help="set the number of worker processes to spread the autobattle or round robin games over", type=int, default=1)
+    return parser.parse_args()
+
+# See if TQDM is installed. We only look once we actually need a progress bar, since importing it is slow
+TQDM_FOUND = None
+
+def findTqdm():
+    global TQDM_FOUND, tqdm
+    if TQDM_FOUND is None:
+        try:
+            from tqdm.auto import tqdm
+            TQDM_FOUND = True
+        except:
+            print("TQDM is not installed. Run `pip install tqdm` for a fancy progress bar. Continuing...")
+            TQDM_FOUND = False
+    return TQDM_FOUND
+
+# Returns a progress bar if TQDM is installed, otherwise None
+def progressBar(total, unit):
+    if findTqdm():
+        return tqdm(total=total, unit=unit)
+    return None
 
 # Prints to the console, but if using TQDM will use their write function.
 def rprint(*cargs, **kvargs):
@@ -87,52 +142,42 @@ def rprint(*cargs, **kvargs):
     else:
         print(*cargs, **kvargs)
 
-# Verbose print, only runs if verbose is set.
-def vprint(*cargs, **kvargs):
-    if args.verbose:
-        rprint(*cargs, **kvargs)
-
-if args.round_robin:
-    random.seed()
+def roundRobin(args, ais):
     # We can't play games with more players than we have AIs
-    ais = {k:v for k,v in ais.items() if k != "userInput"}
-    maxPlayerCount = min(len(ais), 10)
+    aiNames = Tournament.getAutomaticAINames(ais)
+    maxPlayerCount = min(len(aiNames), 10)
     aveWinRate = dict()
     aggAverageScore = dict()
-    for ai in ais.values():
-            # First is the relevant value, second is the number of games played, so that we can normalize between rounds
-            aveWinRate[ai.getName()] = 0
-            aggAverageScore[ai.getName()] = 0
+    for name in aiNames:
+            aveWinRate[name] = 0
+            aggAverageScore[name] = 0
     numRounds = maxPlayerCount + 1 - 2
-    for playerCount in range(2, maxPlayerCount + 1):
-        print(str(playerCount) + " Players")
-        subsets = list(itertools.combinations(ais.values(), playerCount))
-        subsets *= args.autobattle_Rounds
-        roundWins = dict()
-        scores = dict()
-        for ai in ais.values():
-            # First is the relevant value, second is the number of games played, so that we can normalize between rounds
-            roundWins[ai.getName()] = (0,0)
-            scores[ai.getName()] = (0,0)
-        for i in crange(len(subsets)):
-            subset = subsets[i]
-            game = Game(playerCount)
-            players = game.getPlayers()
-            for i, player in enumerate(players):
-                player.setName(subset[i].getName())
-                subset[i].attachToPlayer(player)
-            scoreList = game.playGame()
-            scoreList.sort(key=lambda x: x[1])
-            for j, result in enumerate(scoreList):
-                name, score = result
-                if j == 0:
-                    roundWins[name] = (roundWins[name][0] + 1, roundWins[name][1])
-                roundWins[name] = (roundWins[name][0], roundWins[name][1] + 1)
-                scores[name] = (scores[name][0] + score, scores[name][1] + 1)
-        winRate = normalize(roundWins, True)
-        aveScores = normalize(scores)
+    bars = {}
+    def showProgress(playerCount, played, total):
+        if not playerCount in bars:
+            print(str(playerCount) + " Players")
+            bars[playerCount] = progressBar(total, " games")
+        if not bars[playerCount] is None:
+            if bars[playerCount].total != total:
+                # With a time budget, the number of games isn't known until the new AIs have been timed
+                bars[playerCount].total = total
+                bars[playerCount].refresh()
+            bars[playerCount].update(played - bars[playerCount].n)
+    cache = None
+    if not args.cache is None:
+        if not args.time_budget is None:
+            print("--time-budget can't be used with --cache, since cached results are kept by how many games were played")
+            return
+        from ResultCache import ResultCache
+        cache = ResultCache(args.cache)
+    startTime = time.perf_counter()
+    for playerCount, winRate, aveScores in Tournament.runRoundRobin(aiNames, args.autobattle_Rounds, maxPlayerCount, args.jobs, showProgress, args.seed, cache, args.time_budget):
+        if not bars.get(playerCount) is None:
+            bars[playerCount].close()
         printRanking(winRate, "\nWin Rate (" + str(playerCount) + " Players)", False, True)
         printRanking(aveScores, "\nAverage Score (" + str(playerCount) + " Players)", True)
+        if not args.memory is None:
+            printMemoryReport("\nMemory (" + str(playerCount) + " Players)")
         # since we know how many rounds there will be, we can divide the results in advance
         for name, wins in winRate:
             aveWinRate[name] += wins / numRounds
@@ -140,19 +185,21 @@ if args.round_robin:
             aggAverageScore[name] += aveScore / numRounds
     printRanking(list(aveWinRate.items()), "\nWin Rate (Overall)", False, True)
     printRanking(list(aggAverageScore.items()), "\nAverage Score (Overall)", True)
-    sys.exit(0)
-        
+    if not args.time_budget is None:
+        print(f"\nTook {formatDuration(time.perf_counter() - startTime)} of the {formatDuration(args.time_budget)} budget")
+    if not cache is None:
+        print(f"\nReused {cache.hits} of {cache.hits + cache.misses} lineups from {args.cache}")
 
-if args.autobattle_AI is None and not args.interactive:
-    # We will fix that.
-    aiChoice = utils.choiceInput(list(ais.keys())[:-1], "Which AI module would you like to use for the autobattle AI:")
-    args.autobattle_AI = list(ais.keys())[aiChoice]
+def interactive(ais):
+    from Game.Game import Game
+    from Game.BackgroundRunner import BackgroundRunner
 
-if args.interactive:
     playerCount = utils.intInput("How many players would you like? ", 2, 10)
 
     game = Game(playerCount)
     players = game.getPlayers()
+    # The people at the table. Everyone else works out their card in the background while the people are still thinking
+    people = []
     for i,player in enumerate(players):
         player.setName(input("What would you like to name player " + str(i) + "? "))
         ai = None
@@ -161,6 +208,8 @@ if args.interactive:
             try: 
                 ai = ais[aiChoice]
                 ai.attachToPlayer(player)
+                if aiChoice in Tournament.NON_AUTOMATIC_AIS:
+                    people.append(player)
             except Exception as e:
                 player.resetCallbacks()
                 print("Sorry, that AI module failed to initialize")
@@ -168,54 +217,267 @@ if args.interactive:
                 print()
                 ai = None
 
-    scoreList = game.playGame()
+    scoreList = BackgroundRunner(people).run(game)
     scoreList.sort(key=lambda x: x[1])
     print("\nFinal Ranking: ")
     for i, score in enumerate(scoreList):
         print(str(i + 1) + "\t" + str(score[1]) + "\t" + score[0])
-else:
+
+def autobattle(args, ais):
     number_tables = args.autobattle_NumberOfTables
     sample_size_per_table = args.autobattle_Rounds
-    ais = {k:v for k,v in ais.items() if k != "userInput"}
-    intMapAIs = {i:k for i,k in zip(range(len(ais)), ais.keys())}
-    results = {i: [0, 0] for i in ais.keys()}
+    aiNames = Tournament.getAutomaticAINames(ais)
+    results = {i: [0, 0] for i in aiNames}
     tested_ai_results = [0,0]
-    random.seed()
-    for table in (pbar := crange(number_tables)):
-        number_players = random.randint(args.autobattle_MinPlayers, args.autobattle_MaxPlayers)
-        if TQDM_FOUND:
-            pbar.set_description(f"Table {table+1} ({number_players} players)")
+    tables = Tournament.chooseAutobattleTables(args.autobattle_AI, aiNames, number_tables, args.autobattle_MinPlayers, args.autobattle_MaxPlayers)
+    pbar = progressBar(number_tables, " tables")
+    for finished, (table, gameResults, best_results) in enumerate(Tournament.runAutobattle(args.autobattle_AI, aiNames, tables, sample_size_per_table, args.jobs)):
+        number_players = len(tables[table][0])
+        if pbar is None:
+            print(f"Table {finished+1}/{number_tables} with {number_players} players.")
         else:
-            print(f"Table {table+1}/{number_tables} with {number_players} players.")
-        player_ai_ids = [args.autobattle_AI, *[random.randint(0, len(intMapAIs)-1) for i in range(1, number_players)]]
-        gameResults = dict()
-        for iteration in range(sample_size_per_table):
-            game = Game(number_players)
-            players = game.getPlayers()
-            for i, player in enumerate(players):
-                if i == 0:
-                    player.setName(args.autobattle_AI)
-                    ais[args.autobattle_AI].attachToPlayer(player)
-                else:
-                    player.setName(f"AI_{intMapAIs[player_ai_ids[i]]}_{i}")
-                    ais[intMapAIs[player_ai_ids[i]]].attachToPlayer(player)
-            scoreList = game.playGame()
-            for name, score in scoreList:
-                gameResults[name] = gameResults.get(name, 0) + score
+            pbar.set_description(f"Table {table+1} ({number_players} players)")
+            pbar.update()
         tested_ai_results = [tested_ai_results[0] + gameResults[args.autobattle_AI], tested_ai_results[1] + sample_size_per_table]
-        best_results = {i: [0, 0] for i in ais.keys()}
-        for tk in gameResults.keys():
-            if tk != args.autobattle_AI:
-                k = tk.split("_")[1] 
-                if best_results[k][1] != 0 and best_results[k][0] > gameResults[tk]:
-                    best_results[k] = [gameResults[tk], sample_size_per_table]
-                elif best_results[k][1] == 0:
-                    best_results[k] = [gameResults[tk], sample_size_per_table]
         for k in best_results.keys():
             results[k] = [results[k][0] + best_results[k][0], results[k][1] + best_results[k][1]]
-            vprint(f"{k}: {float(best_results[k][0])/sample_size_per_table:.5f}",end='\t')
-        vprint()
+            if args.verbose:
+                rprint(f"{k}: {float(best_results[k][0])/sample_size_per_table:.5f}",end='\t')
+        if args.verbose:
+            rprint()
+    if not pbar is None:
+        pbar.close()
     print("--End testing--")
     print(f"Selected AI score average: {float(tested_ai_results[0])/tested_ai_results[1]:.5f} across {tested_ai_results[1]} games.")
     for ai_name in results.keys():
+        if results[ai_name][1] == 0:
+            # Small autobattles don't always give everyone a seat
+            print(f"{ai_name}:\t\tplayed 0 games")
+            continue
         print(f"{ai_name}:\t\tplayed {results[ai_name][1]} games, averaging {float(results[ai_name][0])/results[ai_name][1]:.5f}")
+    if not args.memory is None:
+        printMemoryReport("\nMemory")
+
+def duplicate(args, ais):
+    aiNames = args.duplicate
+    if len(set(aiNames)) != len(aiNames) or len(aiNames) < 2:
+        print("Duplicate mode needs at least two different AIs")
+        return
+    if args.autobattle_Rounds < 2:
+        print("Duplicate mode needs at least two deals to estimate its error")
+        return
+    pbar = progressBar(args.autobattle_Rounds, " deals")
+    def showProgress(finished, total):
+        if not pbar is None:
+            pbar.update(finished - pbar.n)
+    deals = Tournament.runDuplicate(aiNames, args.autobattle_Rounds, args.jobs, args.seed, showProgress)
+    if not pbar is None:
+        pbar.close()
+    averages = [(name, sum(sum(deal[i]) for deal in deals) / (len(deals) * len(aiNames))) for i, name in enumerate(aiNames)]
+    printRanking(averages, "\nAverage Score (" + str(len(deals)) + " deals, every AI in every seat)", True)
+    print("\nPaired Differences (first minus second, lower is better for the first)")
+    for first, second, difference, error, unpairedGames, gamesPlayed in Tournament.compareDuplicate(aiNames, deals):
+        print(f"\n\t{first} vs {second}:\t{difference:+.2f} +/- {error:.2f}\t(an unpaired run would need about {unpairedGames} games for this precision, this took {gamesPlayed})")
+    if not args.memory is None:
+        printMemoryReport("\nMemory")
+
+def printDealSummary(summary, title, scoreLabel):
+    print(title)
+    print("\n\t" + scoreLabel + "\tplace\twin rate\tAI")
+    for name, score, place, winRate in sorted(summary, key=lambda entry: entry[1]):
+        print(f"\n\t{score:.2f}\t{place:.2f}\t{100 * winRate:.1f}%\t{name}")
+
+def rounds(args, ais):
+    aiNames = args.rounds
+    if len(set(aiNames)) != len(aiNames) or len(aiNames) < 2:
+        print("Round screening needs at least two different AIs")
+        return
+    if args.autobattle_Rounds < 2:
+        print("Round screening needs at least two deals to estimate its error")
+        return
+    def playDeals(count, rules, unit):
+        pbar = progressBar(count, unit)
+        def showProgress(finished, total):
+            if not pbar is None:
+                pbar.update(finished - pbar.n)
+        deals, seconds = Tournament.runRotatedDeals(aiNames, count, rules, args.jobs, args.seed, showProgress)
+        if not pbar is None:
+            pbar.close()
+        return deals, seconds
+    roundDeals, roundTime = playDeals(args.autobattle_Rounds, Tournament.SINGLE_ROUND, " rounds")
+    printDealSummary(Tournament.summarizeDeals(aiNames, roundDeals), f"\nSingle Rounds ({len(roundDeals)} deals, every AI in every seat, {formatDuration(roundTime / len(roundDeals))} a deal)", "penalty")
+    if args.calibrate is None:
+        return
+    if args.calibrate < 2:
+        print("Calibrating needs at least two whole game deals")
+        return
+    gameDeals, gameTime = playDeals(args.calibrate, None, " games")
+    printDealSummary(Tournament.summarizeDeals(aiNames, gameDeals), f"\nWhole Games ({len(gameDeals)} deals, {formatDuration(gameTime / len(gameDeals))} a deal)", "score")
+    correlation, pairs = Tournament.calibrateRounds(aiNames, roundDeals, gameDeals, roundTime, gameTime)
+    print("\nCalibration")
+    if not correlation is None:
+        print(f"\n\tRank correlation between round penalty and whole game win rate: {correlation:+.2f}")
+    print("\n\tpenalty (z)\twin rate (z)\tagree\tspeedup\tpair")
+    for first, second, roundDifference, roundZ, gameDifference, gameZ, agrees, speedup in pairs:
+        agreement = "-" if agrees is None else ("yes" if agrees else "NO")
+        speedup = "-" if math.isinf(speedup) else f"{speedup:.1f}x"
+        print(f"\n\t{roundDifference:+.2f} ({roundZ:+.1f})\t{100 * gameDifference:+.1f}% ({gameZ:+.1f})\t{agreement}\t{speedup}\t{first} vs {second}")
+    print("\nThe speedup is how many times quicker rounds get as sure of which of the pair is better as whole games do. It's only meaningful for pairs that agree, and it's noisy unless both z's are well away from 0")
+
+def sweep(args, ais):
+    try:
+        space = dict(Tournament.parseParameterRange(text) for text in args.param)
+        if args.samples is None:
+            configs = Tournament.gridConfigs(space)
+        else:
+            configs = Tournament.randomConfigs(space, args.samples, random.Random(args.seed))
+        if not {} in configs:
+            # Always compare against the settings it already has
+            configs.insert(0, {})
+        for config in configs:
+            # Catch any misspelt parameters before playing anything
+            Tournament.registerVariant(args.sweep, config)
+    except ValueError as e:
+        print(e)
+        return
+    opponents = args.opponents
+    if opponents is None:
+        opponents = [args.sweep] * 3
+    print(f"Trying {len(configs)} configs of {args.sweep} against {', '.join(opponents)}, on up to {args.autobattle_Rounds} deals each")
+    bars = {}
+    def showProgress(stage, configCount, finished, total):
+        if not stage in bars:
+            for bar in bars.values():
+                if not bar is None:
+                    bar.close()
+            print(f"Stage {stage + 1}: {configCount} configs")
+            bars[stage] = progressBar(total, " games")
+        if not bars[stage] is None:
+            bars[stage].update(finished - bars[stage].n)
+    results = Tournament.runSweep(args.sweep, configs, opponents, args.autobattle_Rounds, args.jobs, args.seed, progress=showProgress)
+    for bar in bars.values():
+        if not bar is None:
+            bar.close()
+    print("\nBest Settings (lower is better)")
+    for parameters, meanScore, deals in results[:10]:
+        settings = ", ".join(f"{name}={value}" for name, value in sorted(parameters.items()))
+        print(f"\n\t{meanScore:.2f}\tover {deals} deals\t{settings if len(parameters) > 0 else '(defaults)'}")
+    if not args.memory is None:
+        printMemoryReport("\nMemory")
+
+def benchmark(args, ais):
+    import Benchmark
+    aiNames = args.benchmark or Tournament.getAutomaticAINames(ais)
+    seed = 0 if args.seed is None else args.seed
+    positions = Benchmark.makePositions(args.positions, seed, args.difficulty)
+    print(f"Benchmarking on {len(positions)} positions, difficulty {args.difficulty}, from seed {seed}")
+    print("\n\tcalls\tmean\tmedian\t90%\t99%\tslowest\tillegal\tcrashed\tAI")
+    results = []
+    for name in aiNames:
+        for hookName, result in Benchmark.benchmarkAI(ais[name], positions).items():
+            calls, mean, median, p90, p99, slowest, illegal, crashed = result.summary()
+            times = "\t".join(formatDuration(time) for time in (mean, median, p90, p99, slowest))
+            print(f"\n\t{calls}\t{times}\t{illegal}\t{crashed}\t{name} {hookName}")
+            results.append(result)
+    for result in results:
+        if len(result.slowest) > 0 and (args.verbose or result.percentile(0.99) < result.slowest[0][0] / 2):
+            # Only worth a look when the worst case is well out past the rest
+            print(f"\nSlowest {result.hookName} positions for {result.aiName}")
+            for seconds, position in result.slowest:
+                print(f"\n\t{formatDuration(seconds)}\t{position.describe()}")
+        if len(result.failures) > 0:
+            print(f"\nProblems with {result.aiName} {result.hookName}")
+            for position, problem in result.failures:
+                print(f"\n\t{problem}\t{position.describe()}")
+
+def scaling(args, ais):
+    import Benchmark
+    seed = 0 if args.seed is None else args.seed
+    aiNames = [aiName for aiName in Benchmark.SCALING_AIS if aiName in ais]
+    print("\n\tcards\trows\tplayers\tturns\tper turn\tper card\tper game with " + ", ".join(aiNames))
+    for rules, playerCount in Benchmark.SCALING_LADDER:
+        turns, perTurn, perCard = Benchmark.timeEngine(rules, playerCount, args.autobattle_Rounds, seed)
+        perGame = Benchmark.timeAIs(aiNames, rules, playerCount, args.autobattle_Rounds, seed) if len(aiNames) > 0 else 0.0
+        print(f"\n\t{rules.numCards}\t{rules.numRows}\t{playerCount}\t{turns}\t{formatDuration(perTurn)}\t{formatDuration(perCard)}\t{formatDuration(perGame)}")
+
+def listAIs(ais):
+    for name, ai in ais.items():
+        print(name + "\t" + ", ".join(ai.getHooks()))
+
+def runMode(args, ais):
+    if args.round_robin:
+        roundRobin(args, ais)
+        return
+
+    if not args.duplicate is None:
+        duplicate(args, ais)
+        return
+
+    if not args.sweep is None:
+        sweep(args, ais)
+        return
+
+    if not args.rounds is None:
+        rounds(args, ais)
+        return
+
+    if not args.benchmark is None:
+        benchmark(args, ais)
+        return
+
+    if args.scaling:
+        scaling(args, ais)
+        return
+
+    if args.autobattle_AI is None and not args.interactive:
+        # We will fix that.
+        choices = Tournament.getAutomaticAINames(ais)
+        aiChoice = utils.choiceInput(choices, "Which AI module would you like to use for the autobattle AI:")
+        args.autobattle_AI = choices[aiChoice]
+
+    if args.interactive:
+        interactive(ais)
+    else:
+        autobattle(args, ais)
+
+def main():
+    ais = Tournament.getAIs()
+    args = parseArgs(ais)
+
+    if args.list_AIs:
+        listAIs(ais)
+        return
+
+    if not args.memory is None:
+        Tournament.enableMemoryAccounting(args.memory)
+    if not args.profile is None:
+        Tournament.enableProfiling(None if args.profile_interval is None else args.profile_interval / 1000)
+    if not args.export is None:
+        Tournament.enableDatasetExport(args.export)
+    if not args.trace is None:
+        Tournament.enableTracing()
+    if not args.costs is None:
+        from CostModel import CostModel
+        Tournament.useCostModel(CostModel.load(args.costs))
+    exporter = None
+    if not args.metrics_file is None or not args.metrics_port is None:
+        from Metrics import MetricsExporter
+        metrics = Tournament.enableMetrics(Tournament.getAutomaticAINames(ais), args.jobs)
+        exporter = MetricsExporter(metrics, args.metrics_file, args.metrics_port, args.metrics_interval)
+    try:
+        runMode(args, ais)
+    finally:
+        if not exporter is None:
+            exporter.stop()
+        if not args.profile is None:
+            printProfile(Tournament.finishProfiling(), args.profile)
+        if not args.trace is None:
+            print("\nWrote " + str(Tournament.finishTracing().write(args.trace)))
+        if not args.export is None:
+            Tournament.finishDatasetExport()
+            print("\nWrote the decisions to " + args.export)
+        if not args.costs is None:
+            Tournament.getCostModel().save(args.costs)
+
+if __name__ == "__main__":
+    main()
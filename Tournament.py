@@ -0,0 +1,800 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# Tournament.py
+# The tournament logic behind Take5.py's round robin, autobattle, duplicate, sweep and round screening modes
+# Importing this has no side effects, so it can be used as a library, and worker processes can import it cheaply.
+# AI modules aren't imported until somebody actually sits down at a table with them.
+
+from Game.Game import Game, Rules
+from Game.BatchRunner import BatchRunner
+from Game.Trace import TraceBuffer
+from AIModuleWrapper import discoverAIs, AiVariant
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    # Only for the type hints. The real imports wait until they're needed
+    from Profiling import Profiler
+    from Metrics import Metrics
+    from CostModel import CostModel
+
+import itertools
+import math
+import multiprocessing
+import pathlib
+import random
+import statistics
+import time
+
+AI_PATH = pathlib.Path("AIs")
+# How many games of a lineup to keep going at once when some of its AIs can answer for lots of tables in one call
+BATCH_TABLES = 64
+# The fewest games a piece of a lineup like that gets split into. Batching a quarter as many tables at once is only about 10% slower
+BATCH_PIECE_GAMES = 16
+# How many pieces of about the same cost to split a tournament into for each worker process, so they all finish at about the same time
+PIECES_PER_WORKER = 4
+# Only one in this many games at each table is timed for the cost model (always including its first), since timing every hook call
+# adds up for cheap AIs that get told about every event
+COST_SAMPLE_EVERY = 8
+# How many lineups' worth of tables each process keeps around for reuse
+TABLE_CACHE_SIZE = 64
+# AIs that can't play unattended
+NON_AUTOMATIC_AIS = {"userInput"}
+# The real game, cut down to one round. Rounds are over far quicker than whole games, so they're good for screening AIs
+SINGLE_ROUND = Rules(targetScore=-1)
+
+# The AI wrappers for this process. Each worker process has its own, since loaded modules don't travel between processes
+_ais = None
+# Tables kept around for reuse in this process, by lineup. The most recently used lineup is last
+_tables = dict()
+# The MemoryAccounting for this process, if we're keeping track of how much memory the AIs use
+_memory = None
+# The Profiler for this process, if we're profiling
+_profiler = None
+# The Metrics for this process, if anyone's watching the run's progress, and Metrics.countDecisions to go with it
+_metrics = None
+_countDecisions = None
+# The TraceBuffer for this process, if games are being traced
+_trace = None
+# The DatasetWriter for this process, if every decision is being exported as training data
+_dataset = None
+# (directory, shard size) for worker processes to set up their own DatasetWriter, if we're exporting
+_datasetSettings = None
+# Variant name: (original AI name, parameters) for every variant registered in this process, so worker processes can register them too
+_variants = dict()
+# What every game played at a table in this process has cost so far, for sharing the work out and sizing runs to a time budget.
+# Made the first time it's wanted, which is once a game has been timed
+_costs = None
+
+def getAIs(path=None):
+    """Gets the AI wrappers for this process, discovering them the first time"""
+    global _ais
+    if _ais is None:
+        _ais = discoverAIs(AI_PATH if path is None else path)
+    return _ais
+
+def getAutomaticAINames(ais=None):
+    """The names of all the AIs that can play without a human"""
+    if ais is None:
+        ais = getAIs()
+    return [name for name in ais.keys() if not name in NON_AUTOMATIC_AIS]
+
+def registerVariant(baseName, parameters, name=None) -> str:
+    """Makes an in-memory copy of an AI with some of its PARAMETERS changed, which can then be seated like any other AI.
+    Worker processes started from now on get it too. Returns the variant's name, which by default describes its settings"""
+    if name is None:
+        settings = ",".join(f"{key}={value}" for key, value in sorted(parameters.items()))
+        name = baseName + "[" + (settings if len(parameters) > 0 else "defaults") + "]"
+    ais = getAIs()
+    variant = AiVariant(ais[baseName], name, parameters)
+    # Check the settings now, rather than halfway through a tournament
+    variant.getSettings()
+    ais[name] = variant
+    _variants[name] = (baseName, dict(parameters))
+    return name
+
+def _initWorker(path, memorySampleEvery=None, isProfiling=False, profileInterval=None, metricsHandle=None, variants=None, datasetSettings=None, traceCapacity=None):
+    global _ais, _metrics, _countDecisions, _profiler
+    _ais = discoverAIs(path)
+    for name, (baseName, parameters) in (variants or {}).items():
+        registerVariant(baseName, parameters, name)
+    if not metricsHandle is None:
+        from Metrics import Metrics, countDecisions
+        _metrics = Metrics.attach(metricsHandle)
+        _countDecisions = countDecisions
+    if not memorySampleEvery is None:
+        enableMemoryAccounting(memorySampleEvery)
+    if not _profiler is None:
+        # Forked from a profiled parent. Its profile is the parent's business, and a second one can't start while it's running
+        _profiler.abandon()
+        _profiler = None
+    if isProfiling:
+        enableProfiling(profileInterval)
+    if not datasetSettings is None:
+        enableDatasetExport(*datasetSettings)
+    if not traceCapacity is None:
+        enableTracing(traceCapacity)
+
+def enableMemoryAccounting(sampleEvery=100):
+    """Starts keeping track of how much memory each AI uses, tracing one call to each hook in every sampleEvery. See MemoryAccounting.py"""
+    global _memory
+    # Only imported now, since tracemalloc and friends aren't needed unless somebody asks
+    from MemoryAccounting import MemoryAccounting
+    _memory = MemoryAccounting(sampleEvery)
+    # Tables from before now don't have their hooks measured
+    _tables.clear()
+
+def enableProfiling(interval=None):
+    """Starts profiling this process, and any worker processes started from now on. See Profiling.py"""
+    global _profiler
+    # Only imported now, since pstats is slow to import and most runs aren't profiled
+    from Profiling import Profiler
+    _profiler = Profiler(interval)
+    _profiler.start()
+
+def finishProfiling() -> Profiler:
+    """Stops profiling, and returns the Profiler with everything from every process in it"""
+    global _profiler
+    profiler = _profiler
+    profiler.stop()
+    _profiler = None
+    return profiler
+
+def enableMetrics(aiNames, jobCount=1) -> Metrics:
+    """Starts counting games, wins and decisions for every AI in the list, across this process and up to jobCount workers.
+    Returns the Metrics, to hand to a MetricsExporter. See Metrics.py"""
+    global _metrics, _countDecisions
+    # Only imported now, since it brings http.server with it
+    from Metrics import Metrics, countDecisions
+    _metrics = Metrics(aiNames, max(1, jobCount) + 1)
+    _countDecisions = countDecisions
+    return _metrics
+
+def enableTracing(capacity=262144):
+    """Starts recording a timeline of every game played from now on, in this process and any worker processes started from now on.
+    Only the last capacity spans are kept in each process. See Game/Trace.py"""
+    global _trace
+    _trace = TraceBuffer(capacity)
+    # Tables from before now aren't traced
+    _tables.clear()
+
+def finishTracing() -> TraceBuffer:
+    """Stops tracing, and returns the TraceBuffer with every process's spans in it"""
+    global _trace
+    trace = _trace
+    _trace = None
+    _tables.clear()
+    return trace
+
+def enableDatasetExport(directory, shardSize=65536):
+    """Starts writing every decision from every game played from now on to shards in directory, in this process and any worker processes
+    started from now on. Call finishDatasetExport at the end to write out what's left. See DatasetExport.py"""
+    global _dataset, _datasetSettings
+    # Only imported now, since it needs numpy
+    from DatasetExport import DatasetWriter
+    _datasetSettings = (directory, shardSize)
+    _dataset = DatasetWriter(directory, Game(2), shardSize)
+    # Tables from before now aren't recording
+    _tables.clear()
+
+def finishDatasetExport() -> int:
+    """Writes out whatever this process still has buffered, and stops exporting. Returns how many decisions this process wrote"""
+    global _dataset, _datasetSettings
+    _dataset.flush()
+    written = _dataset.recordsWritten
+    _dataset = None
+    _datasetSettings = None
+    _tables.clear()
+    return written
+
+def getCostModel() -> CostModel:
+    """The CostModel with every game this process and its workers have played in it"""
+    global _costs
+    if _costs is None:
+        from CostModel import CostModel
+        _costs = CostModel()
+    return _costs
+
+def useCostModel(model : CostModel):
+    """Swaps in a CostModel, say one loaded from a previous run, to schedule with and keep learning in"""
+    global _costs
+    _costs = model
+
+def _planGames(games):
+    if not _metrics is None:
+        _metrics.addPlannedGames(games)
+
+def _drainMeasurements():
+    """Everything this process has measured since last time, to send back to the parent"""
+    return (None if _memory is None else _memory.drain(),
+            None if _profiler is None else _profiler.drain(),
+            None if _trace is None else _trace.drain(),
+            None if _costs is None else _costs.drain())
+
+def _mergeMeasurements(measurements):
+    memoryStats, profile, spans, costs = measurements
+    if not costs is None:
+        getCostModel().merge(costs)
+    if not memoryStats is None:
+        _memory.merge(memoryStats)
+    if not profile is None:
+        _profiler.merge(profile)
+    if not spans is None:
+        _trace.merge(spans)
+
+def takeMemoryReport():
+    """Gets the memory report for every game since the last one was taken, from every process. See MemoryAccounting.report"""
+    report = _memory.report()
+    _memory.drain()
+    return report
+
+def playLineup(job):
+    """Plays a batch of games with one lineup.
+    job is a tuple of (AI name for each seat, player name for each seat, number of games)
+    Returns a list of the final score lists, one per game"""
+    aiNames, playerNames, numberOfGames = job
+    return playGames(aiNames, playerNames, [None] * numberOfGames)
+
+class Table:
+    """A table with AIs sat at it, which can play game after game.
+    The game, the players and the AI states are all kept between games. Every game still starts with prepareNewGame,
+    but AIs with a Reset hook get reset there instead of set up from scratch, so setting up is paid for once per table rather than once per game"""
+
+    def __init__(self, aiNames, playerNames, rules=None):
+        ais = getAIs()
+        self.game = Game(len(aiNames), rules=rules)
+        self.aiNames = tuple(aiNames)
+        # (AI name, player, AI module) for every seat
+        self.seats = []
+        wrapHook = None if _memory is None else _memory.wrapHook
+        for player, aiName, playerName in zip(self.game.getPlayers(), aiNames, playerNames):
+            player.setName(playerName)
+            ais[aiName].attachToPlayer(player, wrapHook)
+            self.seats.append((aiName, player, ais[aiName].module))
+        self.game.recorder = _dataset
+        self.game.trace = _trace
+        self.gamesPlayed = 0
+        self.isSampled = False
+        # Whether this game is being timed for the cost model, and when it started
+        self.isTimed = False
+        self.startTime = None
+
+    def prepareGame(self, seed=None, isInterleaved=False) -> Game:
+        """Gets the table's game ready to play again, with a new deal (or the same deal every time for the same seed).
+        Call finishGame once it's over. Interleaved games share their time with each other, so only their AIs get timed"""
+        self.game.reseed(seed)
+        if not _memory is None:
+            self.isSampled = _memory.startGame()
+        self.isTimed = self.gamesPlayed % COST_SAMPLE_EVERY == 0
+        for _, player, _ in self.seats:
+            player.isTimed = self.isTimed
+            player.hookTime = 0
+        self.startTime = None if isInterleaved else time.perf_counter_ns()
+        return self.game
+
+    def finishGame(self):
+        if self.isTimed:
+            seatSeconds = [player.hookTime / 1e9 for _, player, _ in self.seats]
+            engineSeconds = None if self.startTime is None else (time.perf_counter_ns() - self.startTime) / 1e9 - sum(seatSeconds)
+            getCostModel().addGame(self.aiNames, seatSeconds, engineSeconds)
+        if not _memory is None:
+            _memory.endGame(self.isSampled, self.seats, self.gamesPlayed == 0)
+        if not _metrics is None:
+            _metrics.recordGame(self.aiNames, self.game.getScoreList(), _countDecisions(self.game))
+        self.gamesPlayed += 1
+
+    def playGame(self, seed=None):
+        scores = self.prepareGame(seed).playGame()
+        self.finishGame()
+        return scores
+
+def getTables(aiNames, playerNames, count=1, rules=None) -> list[Table]:
+    """Gets count tables with the given lineup, reusing ones from earlier games in this process where we can"""
+    key = (tuple(aiNames), tuple(playerNames), rules)
+    tables = _tables.pop(key, [])
+    while len(tables) < count:
+        tables.append(Table(aiNames, playerNames, rules))
+    _tables[key] = tables
+    while len(_tables) > TABLE_CACHE_SIZE:
+        # Forget the lineup we used longest ago
+        del _tables[next(iter(_tables))]
+    return tables[:count]
+
+def playGames(aiNames, playerNames, seeds, rules=None):
+    """Plays one game with the lineup for each seed in the list (None for a random deal), by the real rules unless told otherwise.
+    Returns the final score lists in order"""
+    ais = getAIs()
+    if any(ais[aiName].hasBatchHooks() for aiName in aiNames):
+        # Interleave the games, so the batch hooks get lots of tables to answer for at once.
+        # A table can only play one game at a time, so each game borrows a free one and gives it back when it's done
+        freeTables = getTables(aiNames, playerNames, min(len(seeds), BATCH_TABLES), rules)
+        tablesInUse = dict()
+        def borrowTables():
+            for seed in seeds:
+                table = freeTables.pop()
+                tablesInUse[id(table.game)] = table
+                yield table.prepareGame(seed, isInterleaved=True)
+        def returnTable(game):
+            table = tablesInUse.pop(id(game))
+            table.finishGame()
+            freeTables.append(table)
+        return BatchRunner(BATCH_TABLES).run(borrowTables(), returnTable)
+    table = getTables(aiNames, playerNames, rules=rules)[0]
+    return [table.playGame(seed) for seed in seeds]
+
+def runJobs(worker, jobs, jobCount=1):
+    """Runs worker(job) for every job, yielding (job, result) as each one finishes.
+    With a jobCount above 1 the jobs are spread over that many worker processes, so they may finish out of order"""
+    if jobCount <= 1:
+        for job in jobs:
+            yield job, worker(job)
+        return
+    memorySampleEvery = None if _memory is None else _memory.sampleEvery
+    profileInterval = None if _profiler is None else _profiler.interval
+    metricsHandle = None
+    if not _metrics is None:
+        # Any workers from an earlier pool are gone by now, so the new ones can have their rows
+        _metrics.releaseWorkerRows()
+        metricsHandle = _metrics.getHandle()
+    initArgs = (AI_PATH, memorySampleEvery, not _profiler is None, profileInterval, metricsHandle, _variants, _datasetSettings, None if _trace is None else _trace.capacity)
+    profiler = _profiler
+    if not profiler is None:
+        # The parent's profile should only have its own work in it, not starting the workers, waiting on them, or merging what they measured
+        profiler.pause()
+    try:
+        with multiprocessing.Pool(jobCount, initializer=_initWorker, initargs=initArgs) as pool:
+            for job, result, measurements in pool.imap_unordered(_JobRunner(worker), jobs):
+                _mergeMeasurements(measurements)
+                if not profiler is None:
+                    profiler.resume()
+                yield job, result
+                if not profiler is None:
+                    profiler.pause()
+    finally:
+        if not profiler is None:
+            profiler.resume()
+
+class _JobRunner:
+    """Pairs each result with its job, since results from a pool come back in whatever order they finish.
+    Anything the worker process measured while doing the job comes back with it too"""
+    def __init__(self, worker):
+        self.worker = worker
+
+    def __call__(self, job):
+        result = self.worker(job)
+        if not _dataset is None:
+            # Worker processes get stopped without warning once the jobs run out, so nothing can be left buffered between jobs
+            _dataset.flush()
+        return job, result, _drainMeasurements()
+
+def balanceLineupJobs(jobs, jobCount=1):
+    """Shares lineup jobs (for playLineup or playSeededLineup) out evenly between jobCount worker processes.
+    Lineups can cost wildly different amounts, so a few slow ones left until last would keep one worker busy while the rest sit idle.
+    So going by the cost model, jobs are split into pieces of about the same cost, and handed out most expensive first.
+    A piece is a job with fewer games, and seeded pieces start from their own first seed. Returns the pieces"""
+    if jobCount <= 1:
+        return list(jobs)
+    ais = getAIs()
+    costModel = getCostModel()
+    costs = [costModel.gameCost(job[0]) * job[-1] for job in jobs]
+    pieceCost = sum(costs) / (jobCount * PIECES_PER_WORKER)
+    pieces = []
+    for job, cost in zip(jobs, costs):
+        games = job[-1]
+        # Batch hooks want lots of tables at once, so their lineups aren't cut up too small
+        mostPieces = games // BATCH_PIECE_GAMES if any(ais[aiName].hasBatchHooks() for aiName in job[0]) else games
+        count = max(1, min(mostPieces, math.ceil(cost / pieceCost))) if pieceCost > 0 else 1
+        for i in range(count):
+            first = games * i // count
+            size = games * (i + 1) // count - first
+            if len(job) == 4:
+                piece = (job[0], job[1], job[2] + first, size)
+            else:
+                piece = (job[0], job[1], size)
+            pieces.append((cost * size / max(1, games), piece))
+    pieces.sort(key=lambda piece: -piece[0])
+    return [piece for _, piece in pieces]
+
+def normalize(data, toPercentages=False):
+    """Turns a dictionary of name: (total, count) into a list of (name, total / count)"""
+    result = []
+    percentageMultiplier = 1
+    if toPercentages:
+        percentageMultiplier = 100
+    for k,v in data.items():
+        result.append((k, percentageMultiplier * float(v[0]) / v[1]))
+    return result
+
+def playSeededLineup(job):
+    """Plays a batch of games with one lineup, on seeded deals.
+    job is a tuple of (AI name for each seat, player name for each seat, first seed, number of games)
+    Returns a list of the final score lists, one per game"""
+    aiNames, playerNames, firstSeed, numberOfGames = job
+    return playGames(aiNames, playerNames, list(range(firstSeed, firstSeed + numberOfGames)))
+
+def runRoundRobin(aiNames, gamesPerLineup, maxPlayers=10, jobCount=1, progress=None, seed=None, cache=None, timeBudget=None):
+    """Makes every combination of the AIs play each other gamesPerLineup times, for every table size from 2 players up.
+    Yields (playerCount, win rates, average scores) for each table size as it finishes.
+    progress is optionally called with (playerCount, games finished, games in total) as games finish.
+    With a seed, every lineup plays the same deals, seed, seed + 1 and so on. With a ResultCache too, lineups whose AIs
+    haven't changed since they were cached aren't played again. Results can only be reused for the same deals, so a cache
+    means seeded deals, starting from 0 unless told otherwise.
+    With a timeBudget in seconds instead, gamesPerLineup is ignored. Each table size gets an equal share of whatever's left of
+    the budget, and the cost model picks how many games every lineup can play in it. Lineups with AIs the model has never seen
+    play one game first, to measure them"""
+    ais = getAIs()
+    if not timeBudget is None and not cache is None:
+        raise ValueError("A time budget can't be used with a cache, since cached results are kept by how many games were played")
+    if not cache is None and seed is None:
+        seed = 0
+    deadline = None if timeBudget is None else time.perf_counter() + timeBudget
+    maxPlayerCount = min(len(aiNames), maxPlayers)
+    lineups = {playerCount: list(itertools.combinations(aiNames, playerCount)) for playerCount in range(2, maxPlayerCount + 1)}
+    cached = dict()
+    if not cache is None:
+        for subsets in lineups.values():
+            for subset in subsets:
+                key = cache.makeKey([ais[name] for name in subset], seed, gamesPerLineup)
+                results = cache.get(key)
+                if not results is None:
+                    cached[subset] = results
+    if deadline is None:
+        _planGames(sum(len(subsets) - sum(subset in cached for subset in subsets) for subsets in lineups.values()) * gamesPerLineup)
+    for bracket, (playerCount, subsets) in enumerate(lineups.items()):
+        roundWins = dict()
+        scores = dict()
+        for name in aiNames:
+            # First is the relevant value, second is the number of games played, so that we can normalize between rounds
+            roundWins[name] = (0,0)
+            scores[name] = (0,0)
+        def countResults(results):
+            for scoreList in results:
+                scoreList.sort(key=lambda x: x[1])
+                for j, result in enumerate(scoreList):
+                    name, score = result
+                    if j == 0:
+                        roundWins[name] = (roundWins[name][0] + 1, roundWins[name][1])
+                    roundWins[name] = (roundWins[name][0], roundWins[name][1] + 1)
+                    scores[name] = (scores[name][0] + score, scores[name][1] + 1)
+        gamesPlayed = 0
+        for subset in subsets:
+            if subset in cached:
+                # Cached results are each seat's score, in seat order, the same as a fresh score list
+                countResults([list(zip(subset, seatScores)) for seatScores in cached[subset]])
+                gamesPlayed += gamesPerLineup
+        # Every lineup's seat scores so far, as (first seed, seat scores for each game) for each piece it was played in
+        pieceResults = {subset: [] for subset in subsets}
+        gamesEach = 0
+        def playLineups(games, total):
+            nonlocal gamesPlayed, gamesEach
+            if seed is None:
+                jobs = [(subset, subset, games) for subset in subsets]
+            else:
+                jobs = [(subset, subset, seed + gamesEach, games) for subset in subsets if not subset in cached]
+            gamesEach += games
+            for job, results in runJobs(playLineup if seed is None else playSeededLineup, balanceLineupJobs(jobs, jobCount), jobCount):
+                if not cache is None:
+                    # Counting sorts the score lists, and the cache wants them in seat order
+                    pieceResults[job[0]].append((job[2], [[score for _, score in scoreList] for scoreList in results]))
+                countResults(results)
+                gamesPlayed += len(results)
+                if not progress is None:
+                    progress(playerCount, gamesPlayed, total)
+
+        if deadline is None:
+            if not progress is None:
+                progress(playerCount, gamesPlayed, len(subsets) * gamesPerLineup)
+            playLineups(gamesPerLineup, len(subsets) * gamesPerLineup)
+        else:
+            if not all(getCostModel().isKnown(name) for name in set(itertools.chain(*subsets))):
+                _planGames(len(subsets))
+                playLineups(1, len(subsets))
+            share = (deadline - time.perf_counter()) / (len(lineups) - bracket)
+            # Spread over the workers, a game of every lineup takes
+            roundCost = sum(getCostModel().gameCost(subset) for subset in subsets) / max(1, jobCount)
+            # Always at least one game each, or there'd be nothing to report
+            games = max(1 - gamesEach, int(share / roundCost))
+            _planGames(len(subsets) * games)
+            if not progress is None:
+                progress(playerCount, gamesPlayed, len(subsets) * (gamesEach + games))
+            if games > 0:
+                playLineups(games, len(subsets) * (gamesEach + games))
+        if not cache is None:
+            for subset, pieces in pieceResults.items():
+                if len(pieces) > 0:
+                    seatScores = list(itertools.chain(*(piece for _, piece in sorted(pieces, key=lambda piece: piece[0]))))
+                    cache.put(cache.makeKey([ais[name] for name in subset], seed, gamesPerLineup), seatScores)
+            # Save as we go, so an interrupted run still keeps what it played
+            cache.save()
+        yield playerCount, normalize(roundWins, True), normalize(scores)
+
+def chooseAutobattleTables(testedAI, aiNames, numberOfTables, minPlayers, maxPlayers):
+    """Picks a random table size and random opponents for every autobattle table. The tested AI always sits in the first seat.
+    Returns a list of (AI name for each seat, player name for each seat)"""
+    tables = []
+    for _ in range(numberOfTables):
+        numberOfPlayers = random.randint(minPlayers, maxPlayers)
+        seats = [testedAI, *[aiNames[random.randint(0, len(aiNames) - 1)] for _ in range(1, numberOfPlayers)]]
+        playerNames = [testedAI, *[f"AI_{seats[i]}_{i}" for i in range(1, numberOfPlayers)]]
+        tables.append((seats, playerNames))
+    return tables
+
+def runAutobattle(testedAI, aiNames, tables, gamesPerTable, jobCount=1):
+    """Plays every table gamesPerTable times.
+    Yields (table index, total score for each player name, best total for each opponent AI) as each table finishes.
+    An opponent AI's best total is the lowest total of any seat it had at that table, or 0 if it wasn't at the table"""
+    jobs = [(tuple(seats), tuple(playerNames), gamesPerTable) for seats, playerNames in tables]
+    _planGames(len(jobs) * gamesPerTable)
+    tableIndices = {job[:2]: [] for job in jobs}
+    for i, job in enumerate(jobs):
+        tableIndices[job[:2]].append(i)
+    # Tables can be split into pieces, so each one's games are kept until there's a whole table's worth
+    finishedGames = {lineup: [] for lineup in tableIndices}
+    for job, results in runJobs(playLineup, balanceLineupJobs(jobs, jobCount), jobCount):
+        seats, playerNames, _ = job
+        games = finishedGames[(seats, playerNames)]
+        games.extend(results)
+        if len(games) < gamesPerTable:
+            continue
+        # The same table may well have been drawn more than once, so there could be more than one table's worth
+        finishedGames[(seats, playerNames)] = games[gamesPerTable:]
+        gameResults = dict()
+        for scoreList in games[:gamesPerTable]:
+            for name, score in scoreList:
+                gameResults[name] = gameResults.get(name, 0) + score
+        bestResults = {name: [0, 0] for name in aiNames}
+        for aiName, playerName in zip(seats[1:], playerNames[1:]):
+            if bestResults[aiName][1] == 0 or bestResults[aiName][0] > gameResults[playerName]:
+                bestResults[aiName] = [gameResults[playerName], gamesPerTable]
+        yield tableIndices[(seats, playerNames)].pop(0), gameResults, bestResults
+
+def playDuplicateDeal(job):
+    """Plays the same deal once for every seat, rotating the lineup one seat along each time, so every AI gets dealt every hand.
+    The game's random state is seeded and kept away from the AIs, so the same seed deals exactly the same cards every time.
+    job is a tuple of (AI names, seed). The names need to be different, since they're used as the player names too
+    Returns the score each AI got in each rotation, as a list per AI in lineup order"""
+    aiNames, seed = job
+    playerCount = len(aiNames)
+    scores = [[] for _ in aiNames]
+    for rotation in range(playerCount):
+        # AI i sits in seat i + rotation
+        seats = [aiNames[(seat - rotation) % playerCount] for seat in range(playerCount)]
+        scoreList = playGames(seats, seats, [seed])[0]
+        for i in range(playerCount):
+            scores[i].append(scoreList[(i + rotation) % playerCount][1])
+    return scores
+
+def runDuplicate(aiNames, numberOfDeals, jobCount=1, seed=None, progress=None):
+    """Plays numberOfDeals duplicate deals with the lineup. See playDuplicateDeal.
+    Returns a list with one entry per deal, each being the score each AI got in each rotation.
+    progress is optionally called with (deals finished, deals in total) as deals finish"""
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    jobs = [(tuple(aiNames), seed + deal) for deal in range(numberOfDeals)]
+    _planGames(len(jobs) * len(aiNames))
+    results = dict()
+    for job, scores in runJobs(playDuplicateDeal, jobs, jobCount):
+        results[job[1]] = scores
+        if not progress is None:
+            progress(len(results), len(jobs))
+    return [results[job[1]] for job in jobs]
+
+def compareDuplicate(aiNames, deals):
+    """Compares every pair of AIs on their paired results from runDuplicate.
+    Returns a list of (first AI, second AI, mean score difference per deal, standard error of that difference,
+    games an unpaired run would have needed for the same standard error, games the duplicate run actually played)"""
+    gamesPlayed = len(deals) * len(aiNames)
+    # Each AI's average over the rotations of each deal, and every individual game score
+    dealMeans = [[statistics.mean(deal[i]) for deal in deals] for i in range(len(aiNames))]
+    gameScores = [[score for deal in deals for score in deal[i]] for i in range(len(aiNames))]
+    comparisons = []
+    for first, second in itertools.combinations(range(len(aiNames)), 2):
+        differences = [a - b for a, b in zip(dealMeans[first], dealMeans[second])]
+        meanDifference = statistics.mean(differences)
+        standardError = statistics.stdev(differences) / math.sqrt(len(differences))
+        # Without pairing, every game adds the full variance of both AIs' scores
+        unpairedVariance = statistics.variance(gameScores[first]) + statistics.variance(gameScores[second])
+        if standardError > 0:
+            unpairedGames = math.ceil(unpairedVariance / standardError ** 2)
+        else:
+            unpairedGames = math.inf
+        comparisons.append((aiNames[first], aiNames[second], meanDifference, standardError, unpairedGames, gamesPlayed))
+    return comparisons
+
+def rankScores(scores):
+    """Each seat's place, from 1 for the lowest score. Tied seats share the places they'd cover, so two tied for first both get 1.5"""
+    return [1 + sum(other < score for other in scores) + (sum(other == score for other in scores) - 1) / 2 for score in scores]
+
+def winShares(scores):
+    """How much of a win each seat gets. Whoever has the lowest score wins, and a tie splits the win"""
+    lowest = min(scores)
+    winners = scores.count(lowest)
+    return [1 / winners if score == lowest else 0.0 for score in scores]
+
+def playRotatedDeal(job):
+    """Like playDuplicateDeal, but for any rules, and keeping each AI's place as well as its score.
+    job is a tuple of (AI names, seed, rules). Returns a list per AI in lineup order, of (score, place, win share) for each rotation"""
+    aiNames, seed, rules = job
+    playerCount = len(aiNames)
+    results = [[] for _ in aiNames]
+    for rotation in range(playerCount):
+        seats = [aiNames[(seat - rotation) % playerCount] for seat in range(playerCount)]
+        scores = [score for _, score in playGames(seats, seats, [seed], rules)[0]]
+        places = rankScores(scores)
+        wins = winShares(scores)
+        for i in range(playerCount):
+            seat = (i + rotation) % playerCount
+            results[i].append((scores[seat], places[seat], wins[seat]))
+    return results
+
+def runRotatedDeals(aiNames, numberOfDeals, rules=None, jobCount=1, seed=None, progress=None):
+    """Plays numberOfDeals deals with the lineup rotated through every seat, by the given rules (the real ones if None).
+    Returns (a list per deal of playRotatedDeal's results, seconds it took).
+    progress is optionally called with (deals finished, deals in total) as deals finish"""
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    jobs = [(tuple(aiNames), seed + deal, rules) for deal in range(numberOfDeals)]
+    _planGames(len(jobs) * len(aiNames))
+    results = dict()
+    start = time.perf_counter()
+    for job, dealResults in runJobs(playRotatedDeal, jobs, jobCount):
+        results[job[1]] = dealResults
+        if not progress is None:
+            progress(len(results), len(jobs))
+    return [results[job[1]] for job in jobs], time.perf_counter() - start
+
+def summarizeDeals(aiNames, deals):
+    """Each AI's (mean score, mean place, win rate) over every game in the deals from runRotatedDeals"""
+    summary = []
+    for i, name in enumerate(aiNames):
+        games = [game for deal in deals for game in deal[i]]
+        summary.append((name, statistics.mean(game[0] for game in games), statistics.mean(game[1] for game in games), statistics.mean(game[2] for game in games)))
+    return summary
+
+def _pairedSignal(deals, first, second, measure):
+    """The mean difference between two AIs in a measure (0 score, 1 place, 2 win share) averaged over each deal's rotations,
+    and how many standard errors from nothing that is"""
+    differences = [statistics.mean(game[measure] for game in deal[first]) - statistics.mean(game[measure] for game in deal[second]) for deal in deals]
+    meanDifference = statistics.mean(differences)
+    standardError = statistics.stdev(differences) / math.sqrt(len(differences)) if len(differences) > 1 else math.inf
+    return meanDifference, meanDifference / standardError if standardError > 0 else math.inf
+
+def _spearman(first, second):
+    """Spearman's rank correlation of two lists of numbers, or None when either doesn't vary"""
+    firstRanks = rankScores(first)
+    secondRanks = rankScores(second)
+    if len(set(firstRanks)) < 2 or len(set(secondRanks)) < 2:
+        return None
+    # statistics.correlation would do, but it's newer than the Python we support
+    firstMean = statistics.mean(firstRanks)
+    secondMean = statistics.mean(secondRanks)
+    covariance = sum((a - firstMean) * (b - secondMean) for a, b in zip(firstRanks, secondRanks))
+    return covariance / math.sqrt(sum((a - firstMean) ** 2 for a in firstRanks) * sum((b - secondMean) ** 2 for b in secondRanks))
+
+def calibrateRounds(aiNames, roundDeals, gameDeals, roundTime, gameTime):
+    """How well single rounds stand in for whole games, from runRotatedDeals of the same lineup by SINGLE_ROUND and by the real rules.
+    Returns (Spearman correlation across the AIs between mean round penalty and whole game win rate, or None with too few AIs,
+    a list per pair of AIs of (first, second, round penalty difference, its z, game win rate difference, its z, whether they agree,
+    how many times quicker rounds are at telling the pair apart to the same confidence, or inf if the games can't tell them apart))"""
+    roundSummary = summarizeDeals(aiNames, roundDeals)
+    gameSummary = summarizeDeals(aiNames, gameDeals)
+    # Lower penalties should go with higher win rates, so flip one of them
+    correlation = _spearman([-penalty for _, penalty, _, _ in roundSummary], [winRate for _, _, _, winRate in gameSummary]) if len(aiNames) > 2 else None
+    pairs = []
+    for first, second in itertools.combinations(range(len(aiNames)), 2):
+        roundDifference, roundZ = _pairedSignal(roundDeals, first, second, 0)
+        gameDifference, gameZ = _pairedSignal(gameDeals, first, second, 2)
+        # None when the whole games can't tell them apart at all
+        agrees = None if gameDifference == 0 else (roundDifference < 0) == (gameDifference > 0)
+        # z grows with the square root of the number of deals, so z squared per second is how fast each one builds up confidence
+        if gameZ != 0 and math.isfinite(roundZ) and math.isfinite(gameZ):
+            speedup = (roundZ ** 2 / roundTime) / (gameZ ** 2 / gameTime)
+        else:
+            speedup = math.inf
+        pairs.append((aiNames[first], aiNames[second], roundDifference, roundZ, gameDifference, gameZ, agrees, speedup))
+    return correlation, pairs
+
+def parseParameterRange(text):
+    """Turns "name=1,2,3" into (name, [1, 2, 3]), and "name=low:high" into (name, (low, high)) for anything in between.
+    Values that look like whole numbers become ints, and the rest floats"""
+    name, separator, values = text.partition("=")
+    if separator == "" or name == "" or values == "":
+        raise ValueError("Expected name=a,b,c or name=low:high, not " + text)
+    def number(value):
+        return float(value) if any(character in value for character in ".eE") else int(value)
+    if ":" in values:
+        low, high = values.split(":")
+        return name, (number(low), number(high))
+    return name, [number(value) for value in values.split(",")]
+
+def gridConfigs(space):
+    """Every combination of the values in space, which is a dictionary of parameter name: list of values.
+    A (low, high) range of whole numbers counts as every number in it. Returns a list of parameter dictionaries"""
+    names = list(space.keys())
+    valueLists = []
+    for name in names:
+        values = space[name]
+        if isinstance(values, tuple):
+            low, high = values
+            if not (isinstance(low, int) and isinstance(high, int)):
+                raise ValueError("Can't make a grid out of " + name + "'s range. List the values, or search it at random")
+            values = list(range(low, high + 1))
+        valueLists.append(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*valueLists)]
+
+def randomConfigs(space, count, rng=None):
+    """count random configs from space, which is like gridConfigs' but any (low, high) range is sampled uniformly.
+    Returns a list of parameter dictionaries, without repeats"""
+    if rng is None:
+        rng = random.Random()
+    configs = []
+    seen = set()
+    # Small spaces may not have count different configs in them
+    for _ in range(count * 20):
+        if len(configs) == count:
+            break
+        config = dict()
+        for name, values in space.items():
+            if not isinstance(values, tuple):
+                config[name] = rng.choice(values)
+            elif isinstance(values[0], int) and isinstance(values[1], int):
+                config[name] = rng.randint(values[0], values[1])
+            else:
+                config[name] = round(rng.uniform(values[0], values[1]), 3)
+        key = tuple(sorted(config.items()))
+        if not key in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+def playSweepGames(job):
+    """Plays the first AI in the lineup on each of the seeded deals.
+    job is a tuple of (AI name for each seat, seeds). Returns the first seat's score on each deal, in order"""
+    aiNames, seeds = job
+    return [scoreList[0][1] for scoreList in playGames(aiNames, aiNames, seeds)]
+
+def runSweep(baseName, configs, opponents, maxDeals, jobCount=1, seed=None, firstStage=16, pruneZ=2.0, progress=None):
+    """Looks for the best PARAMETERS for an AI. Every config in the list gets a variant, which plays in the first seat against the opponents.
+    Every variant plays the same seeded deals, so they can be compared deal by deal, which cancels out most of the luck of the draw.
+    It goes in stages. The first plays firstStage deals, and each one after that doubles the deals, up to maxDeals. After each stage,
+    any config whose paired mean score is more than pruneZ standard errors worse than the best one so far is dropped.
+    progress is optionally called with (stage, configs still in, deals finished, deals in the stage in total) as jobs finish.
+    Returns a list of (parameters, mean score, deals played) from the best down, where the configs that lasted longest come first"""
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    names = [registerVariant(baseName, config) for config in configs]
+    parameters = dict(zip(names, configs))
+    scores = {name: [] for name in names}
+    surviving = list(names)
+    dealsPlayed = 0
+    stage = 0
+    while dealsPlayed < maxDeals and len(surviving) > 0:
+        stageDeals = min(maxDeals, max(firstStage, dealsPlayed * 2)) - dealsPlayed
+        seeds = [seed + deal for deal in range(dealsPlayed, dealsPlayed + stageDeals)]
+        # Split each config's deals into a few jobs, so the workers stay busy even when there aren't many configs left
+        chunkSize = max(1, math.ceil(stageDeals * len(surviving) / (max(1, jobCount) * 4)))
+        jobs = [((name,) + tuple(opponents), tuple(seeds[start:start + chunkSize])) for name in surviving for start in range(0, stageDeals, chunkSize)]
+        _planGames(len(surviving) * stageDeals)
+        stageScores = {name: dict() for name in surviving}
+        finished = 0
+        for (aiNames, jobSeeds), results in runJobs(playSweepGames, jobs, jobCount):
+            stageScores[aiNames[0]].update(zip(jobSeeds, results))
+            finished += len(jobSeeds)
+            if not progress is None:
+                progress(stage, len(surviving), finished, len(surviving) * stageDeals)
+        for name in surviving:
+            scores[name] += [stageScores[name][dealSeed] for dealSeed in seeds]
+        dealsPlayed += stageDeals
+        stage += 1
+        if dealsPlayed >= maxDeals or dealsPlayed < 2:
+            continue
+        best = min(surviving, key=lambda name: statistics.mean(scores[name]))
+        def isClearlyWorse(name):
+            differences = [a - b for a, b in zip(scores[name], scores[best])]
+            meanDifference = statistics.mean(differences)
+            standardError = statistics.stdev(differences) / math.sqrt(len(differences))
+            return meanDifference > pruneZ * standardError and meanDifference > 0
+        surviving = [name for name in surviving if name == best or not isClearlyWorse(name)]
+    results = [(parameters[name], statistics.mean(scores[name]), len(scores[name])) for name in names if len(scores[name]) > 0]
+    results.sort(key=lambda result: (-result[2], result[1]))
+    return results
@@ -0,0 +1,109 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# Policy.py
+# A small learnable policy for playing cards, used by the self-play trainer and by the AI modules it writes out
+# Each card in the hand gets described by a handful of features, a linear model predicts how many points
+# we'll take from here on if we play it, and we play whichever card looks cheapest.
+# It's plain python, so the AI modules it writes don't need anything installed to run.
+
+import random
+from Game.BoardAnalysis import BoardAnalysis
+from Game.CardMask import CardMask
+
+class LinearPolicy:
+    """Plays the card with the lowest predicted penalty, and claims the cheapest row when it has to"""
+
+    FEATURE_NAMES = (
+        "bias",
+        "too low for any row",
+        "cheapest row penalty, if too low",
+        "row is already full",
+        "unseen cards between the row and the card",
+        "other players beyond the row's free slots",
+        "row penalty",
+        "crowding x unseen cards between",
+        "crowding x row penalty",
+        "card value",
+    )
+    NUM_FEATURES = len(FEATURE_NAMES)
+    # A sensible place to start from, so early self-play isn't completely random
+    DEFAULT_WEIGHTS = (0.0, 0.0, 1.0, 4.0, 0.2, 0.5, 0.2, 0.5, 1.0, 0.0)
+
+    def __init__(self, weights=None, exploration=0.0, rng=None):
+        """exploration is the chance of playing a random card instead, which is only useful while training"""
+        self.weights = list(LinearPolicy.DEFAULT_WEIGHTS if weights is None else weights)
+        self.exploration = exploration
+        self.rng = random.Random() if rng is None else rng
+
+    def setWeights(self, weights):
+        self.weights = list(weights)
+
+    def describeCard(self, card : int, seenMask : int, board : BoardAnalysis, numPlayers : int) -> list[float]:
+        """The features for playing the card. See FEATURE_NAMES"""
+        cardValue = card / board.numCards
+        rowIndex = board.destination(card)
+        if rowIndex == -1:
+            return [1.0, 1.0, min(board.penalties) / 10, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, cardValue]
+        tail = board.tail(rowIndex)
+        slots = board.slotsLeft(rowIndex)
+        # Anything between the end of the row and our card that we haven't seen could get there first
+        unseenBetween = ((card - tail - 1) - CardMask.countInRange(seenMask, tail + 1, card - 1)) / 10
+        others = numPlayers - 1
+        crowding = max(0, others - slots) / max(1, others)
+        penalty = board.penalty(rowIndex) / 10
+        return [1.0, 0.0, 0.0, 1.0 if slots == 0 else 0.0, unseenBetween, crowding, penalty, crowding * unseenBetween, crowding * penalty, cardValue]
+
+    def predict(self, features : list[float]) -> float:
+        return sum(w * f for w, f in zip(self.weights, features))
+
+    def chooseCard(self, hand : list[int], rows : list[list[int]], numPlayers : int):
+        """Picks a card to play. Returns (card, the features of that card)"""
+        board = getattr(hand, "board", None)
+        seenMask = getattr(hand, "seen", None)
+        if seenMask is None:
+            seenMask = CardMask.fromCards(hand) | CardMask.fromCards(card for row in rows for card in row)
+        if board is None:
+            board = BoardAnalysis.fromRows(rows, seenMask)
+        options = [(card, self.describeCard(card, seenMask, board, numPlayers)) for card in hand]
+        if self.exploration > 0 and self.rng.random() < self.exploration:
+            return self.rng.choice(options)
+        # Ties go to the lower card, since hand is sorted
+        return min(options, key=lambda option: self.predict(option[1]))
+
+    def chooseRow(self, rows : list[list[int]], board=None) -> int:
+        """Claims the cheapest row. Not learned, since there's rarely anything cleverer to do"""
+        if board is None:
+            board = BoardAnalysis.fromRows(rows)
+        return board.penalties.index(min(board.penalties))
+
+def writePolicyModule(path, weights, description="A linear policy trained by self-play"):
+    """Freezes a set of weights into an AI module, which can go straight into the AIs folder"""
+    source = f'''# {path.name}
+# {description}
+# Written by Training/SelfPlay.py. Train again rather than editing the weights by hand
+from Training.Policy import LinearPolicy
+
+WEIGHTS = {[float(w) for w in weights]!r}
+
+# Setup()
+#   Used to initialize an AI state required later. Optional.
+# Takes arguments:
+#   Number of players
+# Returns optionally an object containing the AI's state
+def Setup(playerCount):
+    return LinearPolicy(WEIGHTS)
+
+# PlayCard()
+#   Determines which card from the player's hand they should play
+# Returns a card in the player's hand that they intend to play
+def PlayCard(ai, hand, rows, scores):
+    return ai.chooseCard(hand, rows, len(scores))[0]
+
+# ChooseRow()
+#   If the player plays a card lower than the lowest of the cards on row ends, this function is called to choose which row
+# Returns the index of the row the player has chosen
+def ChooseRow(ai, card, hand, rows, cardsPlayed, scores):
+    return ai.chooseRow(rows, getattr(hand, "board", None))
+'''
+    path.write_text(source)
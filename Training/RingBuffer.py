@@ -0,0 +1,61 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# RingBuffer.py
+# A fixed size buffer of experience records that lives in shared memory, so rollout workers can stream into it and the learner can read from it
+# Records are fixed width rows of floats. Once the buffer is full, the oldest records get written over.
+
+import array
+import multiprocessing
+from multiprocessing import shared_memory
+
+class RingBuffer:
+    """Create one in the learner, then hand getHandle() to the workers so they can attach to the same memory.
+    Only the process that created it should unlink it"""
+
+    def __init__(self, capacity : int, width : int, _name=None, _written=None):
+        self.capacity = capacity
+        self.width = width
+        isOwner = _name is None
+        self.memory = shared_memory.SharedMemory(name=_name, create=isOwner, size=capacity * width * 8)
+        self.values = self.memory.buf.cast("d")
+        # How many records have ever been pushed. Its lock also guards the buffer itself
+        self.written = multiprocessing.Value("q", 0) if isOwner else _written
+
+    def getHandle(self):
+        """Everything a worker process needs to attach to this buffer. Pass it in when starting the process"""
+        return (self.capacity, self.width, self.memory.name, self.written)
+
+    @staticmethod
+    def attach(handle) -> RingBuffer:
+        capacity, width, name, written = handle
+        return RingBuffer(capacity, width, name, written)
+
+    def __len__(self):
+        """How many records are available to sample"""
+        return min(self.written.value, self.capacity)
+
+    def push(self, records):
+        """Adds some records. Each one should be a sequence of exactly width floats"""
+        with self.written.get_lock():
+            start = self.written.value
+            for i, record in enumerate(records):
+                slot = (start + i) % self.capacity
+                self.values[slot * self.width:(slot + 1) * self.width] = array.array("d", record)
+            self.written.value = start + len(records)
+
+    def sample(self, count : int, rng) -> list[list[float]]:
+        """Picks count records at random (with replacement) using the given random.Random"""
+        with self.written.get_lock():
+            available = min(self.written.value, self.capacity)
+            if available == 0:
+                return []
+            slots = [rng.randrange(available) for _ in range(count)]
+            return [self.values[slot * self.width:(slot + 1) * self.width].tolist() for slot in slots]
+
+    def close(self):
+        self.values.release()
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
@@ -0,0 +1,165 @@
+# Fixes the type hinting for 'list[int]'.
+from __future__ import annotations
+
+# SelfPlay.py
+# Trains a LinearPolicy by self-play, with the rollouts spread over several processes
+# Rollout workers play headless games with the latest weights, and stream what happened into a shared memory ring buffer.
+# Each record is the features of a card that was played, and the points that player went on to take for the rest of the game.
+# The learner pulls random batches out of the buffer, nudges the weights towards predicting those points, and pushes the new weights back out.
+# When it's done, the weights are frozen into an ordinary AI module.
+#
+# Run it from the root of the project, like Take5.py:
+#   python -m Training.SelfPlay --workers 4 --updates 5000 --output AIs/learnedBot.py
+
+import argparse
+import multiprocessing
+import pathlib
+import random
+import time
+
+import Tournament
+from Game.Game import Game
+from AIModuleWrapper import discoverAIs
+from Training.Policy import LinearPolicy, writePolicyModule
+from Training.RingBuffer import RingBuffer
+
+# Each record is the features, then the points taken from that decision to the end of the game
+RECORD_WIDTH = LinearPolicy.NUM_FEATURES + 1
+
+class SelfPlaySeat:
+    """Plays one seat with the shared policy, and remembers what it did so it can be turned into records once the game is over"""
+
+    def __init__(self, policy : LinearPolicy, player):
+        self.policy = policy
+        self.player = player
+        self.decisions = []
+        player.setTurnCallback(self.PlayCard)
+        player.setBreakCallback(self.ChooseRow)
+
+    def PlayCard(self, ai, hand, rows, scores):
+        card, features = self.policy.chooseCard(hand, rows, len(scores))
+        self.decisions.append((features, scores[0][1]))
+        return card
+
+    def ChooseRow(self, ai, card, hand, rows, cardsPlayed, scores):
+        return self.policy.chooseRow(rows, hand.board)
+
+    def getRecords(self):
+        finalScore = self.player.getScore()
+        return [features + [finalScore - scoreThen] for features, scoreThen in self.decisions]
+
+def rolloutWorker(bufferHandle, weights, weightsVersion, stop, seed, minPlayers, maxPlayers, opponents, exploration):
+    """Plays games until told to stop, pushing every decision the policy made into the buffer"""
+    buffer = RingBuffer.attach(bufferHandle)
+    rng = random.Random(seed)
+    policy = LinearPolicy(None, exploration, rng)
+    seenVersion = -1
+    ais = discoverAIs() if opponents else {}
+    try:
+        while not stop.is_set():
+            if weightsVersion.value != seenVersion:
+                with weights.get_lock():
+                    policy.setWeights(weights[:])
+                    seenVersion = weightsVersion.value
+            game = Game(rng.randint(minPlayers, maxPlayers), seed=rng.getrandbits(64))
+            seats = []
+            for i, player in enumerate(game.getPlayers()):
+                # Keep at least one seat learning, and mix in some opponents if we were given any
+                if i > 0 and opponents and rng.random() < 0.5:
+                    opponent = rng.choice(opponents)
+                    player.setName(opponent + "_" + str(i))
+                    ais[opponent].attachToPlayer(player)
+                else:
+                    player.setName("SelfPlay_" + str(i))
+                    seats.append(SelfPlaySeat(policy, player))
+            game.playGame()
+            records = []
+            for seat in seats:
+                records += seat.getRecords()
+            buffer.push(records)
+    finally:
+        buffer.close()
+
+def learnFromBatch(weights : list[float], batch : list[list[float]], learningRate : float) -> float:
+    """One step of gradient descent on the squared error of the predicted points. Returns the mean squared error before the step"""
+    gradient = [0.0] * len(weights)
+    totalError = 0.0
+    for record in batch:
+        features, target = record[:-1], record[-1]
+        error = sum(w * f for w, f in zip(weights, features)) - target
+        totalError += error * error
+        for i, f in enumerate(features):
+            gradient[i] += error * f
+    for i in range(len(weights)):
+        weights[i] -= learningRate * gradient[i] / len(batch)
+    return totalError / len(batch)
+
+def train(workers=4, updates=5000, batchSize=256, learningRate=0.01, exploration=0.1, minPlayers=2, maxPlayers=10,
+          opponents=(), capacity=200000, publishEvery=50, seed=None, log=print):
+    """Runs the whole pipeline. Returns the trained weights"""
+    if opponents:
+        # Check now, rather than have every worker fall over trying to seat them, or sit waiting on input() for a human opponent
+        automaticAINames = Tournament.getAutomaticAINames()
+        unknown = [name for name in opponents if not name in automaticAINames]
+        if len(unknown) > 0:
+            raise ValueError(", ".join(unknown) + " isn't an AI that can play without a human. Try " + ", ".join(automaticAINames))
+    rng = random.Random(seed)
+    buffer = RingBuffer(capacity, RECORD_WIDTH)
+    weights = multiprocessing.Array("d", LinearPolicy.DEFAULT_WEIGHTS)
+    weightsVersion = multiprocessing.Value("i", 0)
+    stop = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=rolloutWorker, daemon=True,
+                                         args=(buffer.getHandle(), weights, weightsVersion, stop, rng.getrandbits(64),
+                                               minPlayers, maxPlayers, list(opponents), exploration))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    learned = list(LinearPolicy.DEFAULT_WEIGHTS)
+    recentError = None
+    try:
+        for update in range(updates):
+            while len(buffer) < batchSize:
+                if not any(process.is_alive() for process in processes):
+                    raise RuntimeError("Every rollout worker has stopped (exit codes " + ", ".join(str(process.exitcode) for process in processes) + ")")
+                # Give the workers a chance to fill things up
+                time.sleep(0.05)
+            error = learnFromBatch(learned, buffer.sample(batchSize, rng), learningRate)
+            recentError = error if recentError is None else 0.99 * recentError + 0.01 * error
+            if (update + 1) % publishEvery == 0:
+                with weights.get_lock():
+                    weights[:] = learned
+                    weightsVersion.value += 1
+            if (update + 1) % 1000 == 0:
+                log(f"Update {update + 1}/{updates}: {buffer.written.value} decisions collected, recent squared error {recentError:.2f}")
+    finally:
+        stop.set()
+        for process in processes:
+            process.join()
+        buffer.close()
+        buffer.unlink()
+    return learned
+
+def main():
+    ais = Tournament.getAIs()
+    parser = argparse.ArgumentParser(description="Train a policy by self-play, and write it out as an AI module")
+    parser.add_argument("-w", "--workers", help="set the number of rollout processes", type=int, default=max(1, multiprocessing.cpu_count() - 1))
+    parser.add_argument("-u", "--updates", help="set the number of learner updates", type=int, default=5000)
+    parser.add_argument("-b", "--batch-size", help="set the number of decisions in each learner update", type=int, default=256)
+    parser.add_argument("-lr", "--learning-rate", help="set the learner's step size", type=float, default=0.01)
+    parser.add_argument("-e", "--exploration", help="set the chance of the rollouts playing a random card", type=float, default=0.1)
+    parser.add_argument("-mp", "--max-players", help="set the maximum number of players at each rollout table", type=int, default=10)
+    parser.add_argument("-np", "--min-players", help="set the minimum number of players at each rollout table", type=int, default=2)
+    parser.add_argument("--opponents", help="AI modules to mix into the rollout tables, instead of pure self-play", nargs="+", choices=Tournament.getAutomaticAINames(ais), default=[], metavar="AI")
+    parser.add_argument("-o", "--output", help="where to write the trained AI module", type=pathlib.Path, default=pathlib.Path("AIs") / "learnedBot.py")
+    args = parser.parse_args()
+
+    learned = train(args.workers, args.updates, args.batch_size, args.learning_rate, args.exploration,
+                    args.min_players, args.max_players, args.opponents)
+    writePolicyModule(args.output, learned)
+    print("Wrote " + str(args.output))
+    for name, weight in zip(LinearPolicy.FEATURE_NAMES, learned):
+        print(f"\t{weight:8.3f}\t{name}")
+
+if __name__ == "__main__":
+    main()